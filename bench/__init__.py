@@ -0,0 +1,2 @@
+# Замеры производительности горячих путей бота.
+# Запуск отдельного замера: python -m bench.<модуль>
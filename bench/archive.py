@@ -0,0 +1,85 @@
+"""
+Архив старых дней: размер горячей части asal.db и задержка типичных
+запросов до и после archive_before на годовой истории.
+
+Горячая часть — то, что читают и пишут обработчики каждый день (plan, его
+индексы, plan_stats); после архива она помещается в кэш страниц SQLite
+целиком. Запросы: загрузка плана дня (sync_day), /report (счётчики без
+кэша дней), отметка номера, а также статистика архивного дня — она должна
+остаться такой же дешёвой (plan_rollup).
+
+    python -m bench.archive [days] [rooms] [keep_days] [repeat]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import storage
+from bench.hotel import Hotel, _mark_done
+
+
+def _hot_pages(conn):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    cache = conn.execute("PRAGMA cache_size").fetchone()[0]
+    cache_pages = cache if cache > 0 else -cache * 1024 // page_size
+    return pages, pages * page_size, cache_pages
+
+
+async def measure(hotel, repeat):
+    s = storage.store()
+    today, old = hotel.today, hotel.day_list[0]
+    plan = hotel.plan(today, variant=1)
+    timings = {"sync_day": [], "report": [], "mark": [], "old_stats": []}
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        await storage.sync_day(today, plan if i % 2 else hotel.plan(today))
+        t1 = time.perf_counter()
+        s.cache.invalidate(today)
+        await storage.get_stats(today)
+        await storage.get_maid_counts(today)
+        t2 = time.perf_counter()
+        await s.acall(_mark_done, today, [hotel.room_numbers[i % hotel.rooms]])
+        t3 = time.perf_counter()
+        s.cache.invalidate(old)
+        await storage.get_stats(old)
+        t4 = time.perf_counter()
+        for key, dt in zip(timings, (t1 - t0, t2 - t1, t3 - t2, t4 - t3)):
+            timings[key].append(dt * 1000)
+    return {k: statistics.median(v) for k, v in timings.items()}
+
+
+async def run(hotel, keep_days, repeat):
+    await hotel.populate_storage()
+    rows = {}
+    pages, size, cache_pages = await storage.store().acall(_hot_pages)
+    rows["before"] = (pages, size, await measure(hotel, repeat))
+    t0 = time.perf_counter()
+    days, moved = await storage.archive_before(hotel.day_list[-keep_days])
+    archived_in = time.perf_counter() - t0
+    freed = await storage.incremental_vacuum()
+    pages, size, _ = await storage.store().acall(_hot_pages)
+    rows["after"] = (pages, size, await measure(hotel, repeat))
+    print(f"archived days={days} rows={moved} in {archived_in:.2f}s, freed pages={freed}, "
+          f"page cache={cache_pages} pages")
+    for name, (pages, size, t) in rows.items():
+        fit = "fits" if pages <= cache_pages else "exceeds"
+        print(f"{name:<7} hot {size / 1024:8.0f} KB ({pages} pages, {fit} cache)  "
+              + "  ".join(f"{k} {v:6.2f}ms" for k, v in t.items()))
+
+
+def main(days=365, rooms=300, keep_days=30, repeat=20):
+    hotel = Hotel(rooms=rooms, days=days)
+    print(f"days={days} rooms={rooms} keep={keep_days}")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "asal.db")
+        storage.init_db()
+        asyncio.run(run(hotel, keep_days, repeat))
+        storage.close()
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:5]])
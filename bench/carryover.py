@@ -0,0 +1,51 @@
+"""
+Время переноса неубранных номеров при растущей истории.
+
+    python -m bench.carryover [rooms_per_day] [days ...]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import migrations
+import storage
+from daycache import DayCache
+
+
+def main(rooms=2000, days_list=(30, 365, 1095)):
+    print(f"rooms/day={rooms}")
+    for days in days_list:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "plan.db")
+            conn = sqlite3.connect(path, factory=storage.ShardConnection)
+            conn.row_factory = sqlite3.Row
+            conn.cache = DayCache()
+            conn.archive_path = storage.archive_path(path)
+            migrations.migrate(conn, migrations.PLAN_MIGRATIONS)
+            start = date(2023, 1, 1)
+            with conn:
+                for d in range(days):
+                    day = (start + timedelta(days=d)).isoformat()
+                    conn.executemany(
+                        "INSERT INTO plan(day, room_no, maid, ctype, status) VALUES (?,?,?,?,?)",
+                        [(day, 100 + r, f"maid{r % 30}", "Текущая", "Готово" if r % 4 else "Не убрано")
+                         for r in range(rooms)],
+                    )
+            src = (start + timedelta(days=days - 1)).isoformat()
+            dst = (start + timedelta(days=days)).isoformat()
+            t = time.perf_counter()
+            moved = storage._carry_over(conn, src, dst)
+            first = (time.perf_counter() - t) * 1000
+            t = time.perf_counter()
+            again = storage._carry_over(conn, src, dst)
+            rerun = (time.perf_counter() - t) * 1000
+            print(f"days={days:>5}  moved={moved:>5} in {first:7.2f} ms  rerun moved={again} in {rerun:7.2f} ms")
+            conn.close()
+
+
+if __name__ == "__main__":
+    args = [int(x) for x in sys.argv[1:]]
+    main(*(args[:1] or [2000]), *([args[1:]] if len(args) > 1 else []))
@@ -0,0 +1,92 @@
+"""
+Холодный старт: время от запуска процесса до первого ответа бота.
+
+Каждый прогон — новый процесс Python (импорты не закэшированы в памяти
+интерпретатора) на уже заполненной asal.db. До старта в очереди Telegram
+лежит /report — как у бота, который перезапустили во время работы. Сеть —
+FakeTelegram из bench.webhook_load с заданным RTT. Печатается медиана
+«процесс → первый ответ» и разбивка старта из main.STARTUP.
+
+    python -m bench.cold_start [--runs 5] [--rtt 0.05]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def child(db_path, rtt):
+    import asyncio
+
+    import storage
+
+    storage.DB_PATH = db_path
+    os.environ["BOT_TOKEN"] = "123456:bench"
+    import main   # первым — как при настоящем запуске (python main.py)
+    from bench.webhook_load import FakeTelegram, make_update
+
+    async def run():
+        fake = FakeTelegram(rtt)
+        app = main.build_app(request=fake, updates_request=fake)
+        fake.feed(make_update(1, 1000, "/report", 1))
+        # та же последовательность, что в Application.run_polling
+        await app.initialize()
+        await app.post_init(app)
+        await app.updater.start_polling(poll_interval=0, timeout=10)
+        await app.start()
+        while 1 not in fake.replied:
+            await asyncio.sleep(0.001)
+        replied = time.time()
+        await asyncio.sleep(0.2)   # дать прогреву закончиться — для разбивки
+        return replied
+
+    replied = asyncio.run(run())
+    print(json.dumps({"replied": replied, "startup": getattr(main, "STARTUP", [])}), flush=True)
+    os._exit(0)   # штатная остановка не входит в замер
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--rtt", type=float, default=0.05)
+    ap.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    if args.child:
+        return child(args.child[0], float(args.child[1]))
+
+    import asyncio
+
+    import storage
+    from bench.hotel import Hotel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "asal.db")
+        storage.DB_PATH = db_path
+        asyncio.run(Hotel(rooms=300, days=30).populate_storage())
+        storage.close()
+
+        results = []
+        for _ in range(args.runs):
+            started = time.time()
+            out = subprocess.run([sys.executable, "-m", "bench.cold_start", "--child", db_path, str(args.rtt)],
+                                 capture_output=True, text=True, check=True)
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            results.append(((r["replied"] - started) * 1000, r["startup"]))
+
+    first = statistics.median(ms for ms, _ in results)
+    print(f"runs={args.runs} rtt={args.rtt * 1000:.0f}ms  process start → first reply: median {first:.0f}ms "
+          f"(min {min(ms for ms, _ in results):.0f}ms)")
+    phases = {}
+    for _, startup in results:
+        for phase, sec in startup:
+            phases.setdefault(phase, []).append(sec * 1000)
+    if phases:
+        print("startup: " + " · ".join(f"{p} {statistics.median(v):.0f}ms" for p, v in phases.items()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Поиск по комментариям: FTS5 (storage.find_comments, /find) против
+LIKE '%…%' по всей таблице plan, на истории в сотни тысяч строк.
+Комментарий есть примерно у каждой десятой строки, как в жизни.
+
+    python -m bench.comment_search [repeat] [rows ...]   # по умолчанию 50k 200k 500k
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import storage
+
+ROOMS = 500
+NOTES = ["Сломан чайник", "Пятно на ковре", "Гость забыл зарядку", "Не работает кондиционер",
+         "Жалоба на шум", "Разбит стакан", "Протекает кран в ванной", "Нет полотенец",
+         "Перегорела лампа у кровати", "Поздний выезд, просили не беспокоить"]
+# частые (тысячи совпадений за годы) и редкие запросы
+QUERIES = ["чайник", "кран ванной", "забыл заряд", "шум", "кондиционер 777", "лампа 13"]
+SQL_LIKE = (
+    "SELECT day, room_no, maid, comment FROM plan WHERE comment LIKE ? "
+    "ORDER BY day DESC LIMIT 10"
+)
+
+
+def fill(conn, rows):
+    rnd = random.Random(1)
+    start = date(2024, 1, 1)
+    batch = []
+    for i in range(rows):
+        day = (start + timedelta(days=i // ROOMS)).isoformat()
+        note = f"{rnd.choice(NOTES)} ({rnd.randint(1, 999)})" if rnd.random() < 0.1 else None
+        batch.append((day, 100 + i % ROOMS, f"Горничная {i % 12}", "Текущая", "Готово", note))
+    with conn:
+        conn.executemany("INSERT INTO plan(day, room_no, maid, ctype, status, comment) "
+                         "VALUES (?,?,?,?,?,?)", batch)
+
+
+def like(conn, text):
+    return conn.execute(SQL_LIKE, ("%" + "%".join(text.split()) + "%",)).fetchall()
+
+
+async def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+async def run(rows, repeat):
+    s = storage.store()
+    await s.acall(fill, rows)
+    fts = [await timed(lambda q=q: storage.find_comments(q), repeat) for q in QUERIES]
+    page = await timed(lambda: storage.find_comments("чайник", offset=500), repeat)
+    scan = [await timed(lambda q=q: s.acall(like, q), repeat) for q in QUERIES]
+    return max(fts), page, max(scan)
+
+
+def main(repeat=20, *sizes):
+    print(f"{'rows':>8} {'fts5 worst':>11} {'page 51':>9} {'LIKE worst':>11}")
+    for rows in sizes or (50_000, 200_000, 500_000):
+        with tempfile.TemporaryDirectory() as tmp:
+            storage.DB_PATH = os.path.join(tmp, "asal.db")
+            storage.init_db()
+            fts, page, scan = asyncio.run(run(rows, repeat))
+            storage.close()
+        print(f"{rows:>8} {fts:>9.2f}ms {page:>7.2f}ms {scan:>9.2f}ms")
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
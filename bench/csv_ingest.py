@@ -0,0 +1,83 @@
+"""
+Пропускная способность и пиковая память загрузки CSV-плана:
+старый путь (весь файл в строку + re.split + один executemany) против
+потокового PlanReader + storage.replace_day порциями.
+
+    python -m bench.csv_ingest [rows ...]      # по умолчанию 1k 10k 100k 1M
+"""
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import storage
+from plan_import import PlanReader
+
+DAY = "2026-01-01"
+
+
+def write_csv(path, rows, encoding="utf-8", delimiter=","):
+    with open(path, "w", encoding=encoding, newline="") as f:
+        f.write(delimiter.join(["room_no", "maid", "cleaning_type"]) + "\n")
+        for i in range(rows):
+            ctype = "Полная" if i % 5 == 0 else "Текущая"
+            f.write(f"{1000 + i}{delimiter}Горничная {i % 40}{delimiter}{ctype}\n")
+
+
+def legacy_parse(b):
+    try:
+        txt = b.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        txt = b.decode("cp1251")
+    rows = []
+    for raw in txt.splitlines():
+        parts = [p.strip() for p in re.split(r"[;,]", raw.strip()) if p.strip() != ""]
+        if len(parts) < 3 or not parts[0].isdigit():
+            continue
+        rows.append((int(parts[0]), parts[1], parts[2]))
+    return rows
+
+
+def run_legacy(path):
+    with open(path, "rb") as f:
+        rows = legacy_parse(f.read())
+    storage.store().call(storage._clear_day, DAY)
+    storage.store().call(storage._insert_rows, DAY, rows)
+    return len(rows)
+
+
+def run_streaming(path):
+    with open(path, "rb") as f:
+        return asyncio.run(storage.replace_day(DAY, PlanReader(f)))
+
+
+def measure(fn, path):
+    t = time.perf_counter()
+    n = fn(path)
+    elapsed = time.perf_counter() - t
+    tracemalloc.start()
+    fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return n, n / elapsed, peak / 1024 / 1024
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "bench.db")
+        storage.init_db()
+        csv_path = os.path.join(tmp, "plan.csv")
+        print(f"{'rows':>9} {'path':<10} {'rows/s':>12} {'peak MiB':>10}")
+        for size in sizes:
+            write_csv(csv_path, size)
+            for name, fn in (("legacy", run_legacy), ("streaming", run_streaming)):
+                n, rate, peak = measure(fn, csv_path)
+                print(f"{n:>9} {name:<10} {rate:>12,.0f} {peak:>10.2f}")
+        storage.close()
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [1_000, 10_000, 100_000, 1_000_000])
@@ -0,0 +1,71 @@
+"""
+Поток изменений плана: «/report после каждого изменения» (новое сообщение
+и чтение БД каждый раз) против живой сводки с debounce и хэшами страниц.
+
+    python -m bench.dashboard_burst [rooms] [changes] [bursts]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import storage
+from bench.fakes import FakeBot
+from dashboard import Dashboards
+
+DAY = "2026-01-01"
+CHAT = -100
+
+
+async def run(rooms, changes, bursts):
+    rows = [(100 + i, f"Горничная {i % 25}", "Текущая") for i in range(rooms)]
+    await storage.sync_day(DAY, rows)
+
+    def mark_done(room_no):
+        conn = storage.store()._connection()
+        storage.plan_cache.invalidate(DAY)
+        with conn:
+            conn.execute("UPDATE plan SET status='Готово' WHERE day=? AND room_no=?", (DAY, room_no))
+
+    # 1) /report на каждое изменение
+    bot = FakeBot(latency=0, group_per_minute=10 ** 9, global_rate=10 ** 9)
+    before = storage.plan_cache.stats()["misses"]
+    for i in range(changes):
+        await storage.store().acall(lambda c, n=100 + i: mark_done(n))
+        await storage.get_stats(DAY)
+        await storage.get_maid_counts(DAY)
+        await bot.send_message(chat_id=CHAT, text="report")
+    report_reads = storage.plan_cache.stats()["misses"] - before
+    report_calls = sum(bot.calls.values())
+
+    # 2) живая сводка: те же изменения пачками
+    bot = FakeBot(latency=0, group_per_minute=10 ** 9, global_rate=10 ** 9)
+    boards = Dashboards(bot, lambda: DAY, debounce=0.05)
+    await boards.load()
+    boards.watch()
+    await boards.create(CHAT)
+    before = storage.plan_cache.stats()["misses"]
+    per_burst = max(1, changes // bursts)
+    for i in range(changes):
+        await storage.store().acall(lambda c, n=100 + changes + i: mark_done(n))
+        if (i + 1) % per_burst == 0:
+            await asyncio.sleep(0.1)   # пауза между пачками нажатий
+    await asyncio.sleep(0.2)
+    dash_reads = storage.plan_cache.stats()["misses"] - before
+    dash_calls = sum(bot.calls.values())
+    print(f"rooms={rooms} changes={changes} bursts={bursts}")
+    print(f"/report each change:  API calls={report_calls:<6} DB reads={report_reads}")
+    print(f"live dashboard:       API calls={dash_calls:<6} DB reads={dash_reads}  "
+          f"(edits={boards.edits}, unchanged pages skipped={boards.skipped})")
+
+
+def main(rooms=3000, changes=1000, bursts=20):
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "bench.db")
+        storage.init_db()
+        asyncio.run(run(rooms, changes, bursts))
+        storage.close()
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:4]])
@@ -0,0 +1,76 @@
+"""
+Выгрузка истории: исходный путь (всё в StringIO / обычная книга openpyxl
+в памяти) против потоковой выгрузки export.export_range во временный файл.
+
+    python -m bench.export_range [rooms_per_day] [days]
+"""
+import asyncio
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import export
+import storage
+
+
+def legacy_csv(d_from, d_to):
+    buff = io.StringIO()
+    w = csv.writer(buff)
+    w.writerow(export.HEADER)
+    for r in storage.iter_range(d_from, d_to):
+        w.writerow(export._row(r))
+    return io.BytesIO(buff.getvalue().encode("utf-8"))
+
+
+def legacy_xlsx(d_from, d_to):
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    ws.append(export.HEADER)
+    for r in storage.iter_range(d_from, d_to):
+        ws.append(export._row(r))
+    bio = io.BytesIO()
+    wb.save(bio)
+    return bio
+
+
+def measure(fn):
+    tracemalloc.start()
+    t = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main(rooms=200, days=365):
+    start = date(2025, 1, 1)
+    d_from, d_to = start.isoformat(), (start + timedelta(days=days - 1)).isoformat()
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "bench.db")
+        storage.init_db()
+        for d in range(days):
+            day = (start + timedelta(days=d)).isoformat()
+            asyncio.run(storage.insert_rows(day, [(100 + i, f"maid{i % 15}", "Текущая") for i in range(rooms)]))
+        print(f"rows={rooms * days}")
+        cases = [
+            ("csv legacy", lambda: legacy_csv(d_from, d_to)),
+            ("csv stream", lambda: export.export_range("csv", d_from, d_to, tmp)),
+            ("csv.gz stream", lambda: export.export_range("csv", d_from, d_to, tmp, compress=True)),
+            ("xlsx legacy", lambda: legacy_xlsx(d_from, d_to)),
+            ("xlsx stream", lambda: export.export_range("xlsx", d_from, d_to, tmp)),
+        ]
+        for name, fn in cases:
+            elapsed, peak = measure(fn)
+            print(f"{name:<14} {elapsed:8.2f} s  peak {peak:8.2f} MiB")
+        storage.close()
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -0,0 +1,134 @@
+"""
+Подделки Telegram для замеров без сети.
+
+FakeBot повторяет лимиты Telegram локально: общий ~30 сообщений/сек,
+~1 сообщение/сек в личный чат и ~20 сообщений/мин в группу. При превышении
+бросает RetryAfter, как настоящий API.
+
+FakeUpdate/FakeContext/FakeMessage позволяют вызывать обработчики main.py
+напрямую: ответы и отправленные документы копятся в сообщении.
+"""
+import asyncio
+import itertools
+from collections import defaultdict, deque
+
+from telegram.error import BadRequest, RetryAfter
+
+TOLERANCE = 0.95   # чуть мягче реальных окон, чтобы не ловить дрожание таймеров
+
+
+class FakeBot:
+    def __init__(self, latency=0.02, global_rate=30, chat_interval=1.0, group_per_minute=20):
+        self.latency = latency
+        self.global_rate = global_rate
+        self.chat_interval = chat_interval
+        self.group_per_minute = group_per_minute
+        self.delivered = defaultdict(list)   # chat_id -> [text]
+        self.messages = {}                   # (chat_id, message_id) -> текущий текст
+        self.calls = defaultdict(int)        # имя метода API -> число вызовов
+        self.pinned = {}
+        self.flood_errors = 0
+        self._global = deque()
+        self._chats = defaultdict(deque)
+        self._ids = itertools.count(1)
+
+    def _check_limits(self, chat_id, now):
+        while self._global and now - self._global[0] > 1.0 * TOLERANCE:
+            self._global.popleft()
+        if len(self._global) >= self.global_rate:
+            self.flood_errors += 1
+            raise RetryAfter(1)
+        sent = self._chats[chat_id]
+        window, limit = (60.0, self.group_per_minute) if chat_id < 0 else (self.chat_interval, 1)
+        while sent and now - sent[0] > window * TOLERANCE:
+            sent.popleft()
+        if len(sent) >= limit:
+            self.flood_errors += 1
+            raise RetryAfter(max(1, round(window - (now - sent[0]))))
+        self._global.append(now)
+        sent.append(now)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls["send_message"] += 1
+        self._check_limits(chat_id, asyncio.get_running_loop().time())
+        await asyncio.sleep(self.latency)
+        self.delivered[chat_id].append(text)
+        message_id = next(self._ids)
+        self.messages[(chat_id, message_id)] = text
+        return type("Message", (), {"message_id": message_id, "chat_id": chat_id, "text": text})()
+
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        self.calls["edit_message_text"] += 1
+        await asyncio.sleep(self.latency)
+        if (chat_id, message_id) not in self.messages:
+            raise BadRequest("Message to edit not found")
+        if self.messages[(chat_id, message_id)] == text:
+            raise BadRequest("Message is not modified")
+        self.messages[(chat_id, message_id)] = text
+        return True
+
+    async def delete_message(self, chat_id, message_id, **kwargs):
+        self.calls["delete_message"] += 1
+        self.messages.pop((chat_id, message_id), None)
+        return True
+
+    async def pin_chat_message(self, chat_id, message_id, **kwargs):
+        self.calls["pin_chat_message"] += 1
+        self.pinned[chat_id] = message_id
+        return True
+
+
+# ── Update / Context для вызова обработчиков main.py напрямую ─────────────────
+class FakeFile:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def download_to_memory(self, out, **kwargs):
+        out.write(self.data)
+
+    async def download_as_bytearray(self, **kwargs):
+        return bytearray(self.data)
+
+
+class FakeDocument:
+    def __init__(self, file_name: str, data: bytes):
+        self.file_name = file_name
+        self.file_size = len(data)
+        self._data = data
+
+    async def get_file(self, **kwargs):
+        return FakeFile(self._data)
+
+
+class FakeMessage:
+    """Сообщение, на которое отвечает обработчик; ответы копятся в replies."""
+
+    def __init__(self, chat_id=1, text="", document=None):
+        self.chat_id = chat_id
+        self.text = text
+        self.document = document
+        self.replies = []     # тексты ответов
+        self.documents = []   # (имя файла, размер) отправленных документов
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+    async def reply_document(self, document, **kwargs):
+        # InputFile уже прочитал файл целиком — как перед настоящей отправкой
+        self.documents.append((document.filename, len(document.input_file_content)))
+
+
+class FakeUpdate:
+    def __init__(self, message: FakeMessage, user_id=1):
+        self.message = self.effective_message = message
+        self.effective_user = type("User", (), {"id": user_id, "full_name": "bench"})()
+        self.effective_chat = type("Chat", (), {"id": message.chat_id})()
+
+
+class FakeContext:
+    def __init__(self, args=(), bot=None, bot_data=None):
+        self.args = list(args)
+        self.bot = bot
+        self.bot_data = bot_data if bot_data is not None else {}
+        self.user_data = {}
+        self.chat_data = {}
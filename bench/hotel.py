@@ -0,0 +1,113 @@
+"""
+Генератор синтетического отеля для замеров: N номеров, M горничных,
+D дней истории. Всё детерминировано по seed — прогоны сравнимы между собой.
+
+План отдаётся как CSV-байты в разных кодировках и с разными разделителями
+(как его присылают администраторы) или книгой XLSX, а история раскладывается и в asal.db
+(storage.py), и в data.db (db.py).
+"""
+import io
+import random
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+import db
+import storage
+
+# варианты файла плана: (кодировка, разделитель, заголовок)
+CSV_VARIANTS = [
+    ("utf-8", ",", False),
+    ("utf-8-sig", ";", True),
+    ("cp1251", ";", False),
+    ("cp1251", ",", True),
+]
+NAMES = ["Севара", "Гульноз", "Дильноза", "Мадина", "Нигора", "Шахноза", "Феруза", "Зарина",
+         "Камола", "Лола", "Малика", "Нодира", "Озода", "Сабина", "Тамила", "Умида"]
+
+
+class Hotel:
+    def __init__(self, rooms: int = 300, maids: int = 12, days: int = 30, seed: int = 1,
+                 start: str = "2026-01-01"):
+        self.rooms = rooms
+        self.maids = maids
+        self.days = days
+        self.seed = seed
+        self.start = date.fromisoformat(start)
+        # номера по этажам: 101..1xx, 201..2xx — как в настоящем отеле
+        per_floor = 40
+        self.room_numbers = [(i // per_floor + 1) * 100 + i % per_floor + 1 for i in range(rooms)]
+        self.maid_names = [f"{NAMES[i % len(NAMES)]} {i // len(NAMES) + 1}" if i >= len(NAMES)
+                           else NAMES[i] for i in range(maids)]
+        self.maid_tg_ids = {name: 10_000 + i for i, name in enumerate(self.maid_names)}
+
+    @property
+    def day_list(self) -> List[str]:
+        return [(self.start + timedelta(days=i)).isoformat() for i in range(self.days)]
+
+    @property
+    def today(self) -> str:
+        return self.day_list[-1]
+
+    def plan(self, day: str, variant: int = 0) -> List[Tuple[int, str, str]]:
+        """План дня: номер закреплён за горничной по этажу, тип уборки — случайный."""
+        rnd = random.Random(f"{self.seed}:{day}:{variant}")
+        rows = []
+        for i, room in enumerate(self.room_numbers):
+            maid = self.maid_names[(i + variant * 7) % self.maids]
+            ctype = "Полная" if rnd.random() < 0.2 else "Текущая"
+            rows.append((room, maid, ctype))
+        return rows
+
+    def csv_bytes(self, day: str, encoding: str = "utf-8", delimiter: str = ",",
+                  header: bool = False, variant: int = 0) -> bytes:
+        lines = [delimiter.join(("room_no", "maid", "cleaning_type"))] if header else []
+        lines += [delimiter.join((str(r), m, c)) for r, m, c in self.plan(day, variant)]
+        return ("\r\n".join(lines) + "\r\n").encode(encoding)
+
+    def xlsx_bytes(self, days: List[str], header: bool = True, variant: int = 0) -> bytes:
+        """Книга XLSX: по листу на день, лист назван датой (как для /upload_plan)."""
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        for day in days:
+            ws = wb.create_sheet(day)
+            if header:
+                ws.append(["Номер", "Горничная", "Тип уборки"])
+            for row in self.plan(day, variant):
+                ws.append(list(row))
+        out = io.BytesIO()
+        wb.save(out)
+        return out.getvalue()
+
+    def done_rooms(self, day: str) -> List[int]:
+        """Какие номера к концу дня убраны (в прошлых днях — почти все)."""
+        rnd = random.Random(f"{self.seed}:done:{day}")
+        share = 0.4 if day == self.today else 0.95
+        return [r for r in self.room_numbers if rnd.random() < share]
+
+    # ── заполнение баз ────────────────────────────────────────────────────────
+    async def populate_storage(self):
+        for day in self.day_list:
+            await storage.replace_day(day, self.plan(day))
+            await storage.store().acall(_mark_done, day, self.done_rooms(day))
+
+    def populate_db(self):
+        db.init_db()
+        for day in self.day_list:
+            db.add_plan_rows([
+                {"work_date": day, "room_no": r, "maid": m, "maid_tg_id": self.maid_tg_ids[m],
+                 "cleaning_type": c}
+                for r, m, c in self.plan(day)
+            ])
+            # в data.db room_no — TEXT
+            ids: Dict[str, int] = {row[1]: row[0] for row in db.get_rooms(day)}
+            for room in self.done_rooms(day):
+                db.set_status(ids[str(room)], "Убрано", "bench")
+        db.flush()
+
+
+def _mark_done(conn, day, rooms):
+    conn.cache.invalidate(day)
+    with conn:
+        conn.executemany("UPDATE plan SET status='Готово' WHERE day=? AND room_no=?",
+                         [(day, r) for r in rooms])
@@ -0,0 +1,70 @@
+"""
+Время запросов дня при растущей истории: схема без индексов (версия 1)
+против актуальной (ux/idx по дню, номеру и горничной).
+
+    python -m bench.index_scaling [rooms_per_day] [days ...]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import migrations
+import storage
+
+MAIDS = 12
+# исходный запрос статистики (до счётчиков plan_stats) — меряем именно выборку по plan
+SQL_SCAN_STATS = (
+    "SELECT COUNT(*) as total, "
+    "SUM(CASE WHEN status='Готово' THEN 1 ELSE 0 END) as done, "
+    "SUM(CASE WHEN status!='Готово' THEN 1 ELSE 0 END) as left "
+    "FROM plan WHERE day=?"
+)
+
+
+def build(path, days, rooms, version):
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn, migrations.PLAN_MIGRATIONS, target=1)
+    start = date(2023, 1, 1)
+    with conn:
+        for d in range(days):
+            day = (start + timedelta(days=d)).isoformat()
+            conn.executemany(
+                "INSERT INTO plan(day, room_no, maid, ctype, status) VALUES (?,?,?,?,?)",
+                [(day, 100 + r, f"maid{r % MAIDS}", "Текущая", "Готово" if r % 3 else "Назначено")
+                 for r in range(rooms)],
+            )
+    migrations.migrate(conn, migrations.PLAN_MIGRATIONS, target=version)   # 2 — индексы
+    conn.execute("ANALYZE")
+    return conn, (start + timedelta(days=days - 1)).isoformat()
+
+
+def timeit(fn, repeat=50):
+    t = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t) / repeat * 1000
+
+
+def main(rooms=200, days_list=(30, 365, 1095)):
+    print(f"rooms/day={rooms}")
+    print(f"{'days':>6} {'schema':<8} {'get_rooms':>10} {'get_stats':>10} {'by maid':>10}  (ms)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for days in days_list:
+            for version in (1, 2):
+                path = os.path.join(tmp, f"plan_{days}_{version}.db")
+                conn, day = build(path, days, rooms, version)
+                q_rooms = timeit(lambda: conn.execute(storage.SQL_GET_ROOMS, (day,)).fetchall())
+                q_stats = timeit(lambda: conn.execute(SQL_SCAN_STATS, (day,)).fetchone())
+                q_maid = timeit(lambda: conn.execute(
+                    "SELECT room_no, status FROM plan WHERE day=? AND maid=?", (day, "maid3")).fetchall())
+                label = "no idx" if version == 1 else f"v{version}"
+                print(f"{days:>6} {label:<8} {q_rooms:>10.3f} {q_stats:>10.3f} {q_maid:>10.3f}")
+                conn.close()
+
+
+if __name__ == "__main__":
+    args = [int(x) for x in sys.argv[1:]]
+    main(*(args[:1] or [200]), *([args[1:]] if len(args) > 1 else []))
@@ -0,0 +1,58 @@
+"""
+Рассылка отчётов во много чатов на FakeBot с лимитами Telegram:
+исходный путь (send_message подряд, ошибки глотаются) против outbox.Outbox.
+
+    python -m bench.outbox_flood [chats] [updates_per_chat]
+"""
+import asyncio
+import sys
+import time
+
+from bench.fakes import FakeBot
+from outbox import Outbox
+
+
+async def legacy(chats, updates):
+    bot = FakeBot()
+    t = time.perf_counter()
+    for u in range(updates):
+        for chat_id in chats:
+            try:
+                await bot.send_message(chat_id=chat_id, text=f"update {u}")
+            except Exception:
+                pass
+    return bot, time.perf_counter() - t
+
+
+async def dispatched(chats, updates):
+    bot = FakeBot()
+    outbox = Outbox(bot)
+    outbox.start()
+    t = time.perf_counter()
+    for u in range(updates):
+        for chat_id in chats:
+            outbox.send(chat_id, f"update {u}")
+    await outbox.stop(drain=True, timeout=None)
+    return bot, time.perf_counter() - t, outbox
+
+
+def _report(name, bot, elapsed, expected):
+    texts = sum(len(t.split("\n\n")) for msgs in bot.delivered.values() for t in msgs)
+    messages = sum(len(m) for m in bot.delivered.values())
+    print(f"{name:<10} {elapsed:7.2f} s  messages={messages:<5} updates delivered={texts}/{expected}"
+          f"  429s={bot.flood_errors}")
+
+
+def main(n_chats=200, updates=3):
+    # половина — группы (отрицательные id), половина — личные чаты
+    chats = [-(1000 + i) if i % 2 else 1000 + i for i in range(n_chats)]
+    expected = n_chats * updates
+    bot, elapsed = asyncio.run(legacy(chats, updates))
+    _report("legacy", bot, elapsed, expected)
+    bot, elapsed, outbox = asyncio.run(dispatched(chats, updates))
+    _report("outbox", bot, elapsed, expected)
+    print(f"outbox: sent={outbox.sent} merged={outbox.merged} retried={outbox.retried} failed={outbox.failed}")
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -0,0 +1,62 @@
+"""
+/stats за год: выработка по счётчикам (storage.range_stats) против
+группировки сырых строк plan. Время по счётчикам зависит только от числа
+дней × горничных × типов уборки, а не от числа номеров.
+
+    python -m bench.range_stats [days] [repeat] [rooms ...]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import storage
+from bench.hotel import Hotel
+
+SQL_RAW = (
+    "SELECT maid, ctype, COUNT(DISTINCT day), COUNT(*), SUM(status='Готово') "
+    "FROM plan WHERE day BETWEEN ? AND ? GROUP BY maid, ctype"
+)
+
+
+def _raw(conn, d_from, d_to):
+    return conn.execute(SQL_RAW, (d_from, d_to)).fetchall()
+
+
+async def _median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+async def run(hotel, repeat):
+    await hotel.populate_storage()
+    d_from, d_to = hotel.day_list[0], hotel.today
+    maid = hotel.maid_names[0]
+    s = storage.store()
+    return (
+        await _median_ms(lambda: storage.range_stats(d_from, d_to), repeat),
+        await _median_ms(lambda: storage.range_stats(d_from, d_to, maid), repeat),
+        await _median_ms(lambda: s.acall(_raw, d_from, d_to), repeat),
+    )
+
+
+def main(days=365, repeat=20, *rooms_list):
+    print(f"days={days}")
+    for rooms in rooms_list or (100, 300, 1000):
+        with tempfile.TemporaryDirectory() as tmp:
+            storage.DB_PATH = os.path.join(tmp, "asal.db")
+            storage.init_db()
+            by_maid, by_week, raw = asyncio.run(run(Hotel(rooms=rooms, days=days), repeat))
+            storage.close()
+        print(f"rooms={rooms:<5} rows={rooms * days:<7} rollup {by_maid:6.2f}ms  "
+              f"one maid by week {by_week:6.2f}ms  raw plan scan {raw:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
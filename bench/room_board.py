@@ -0,0 +1,130 @@
+"""
+Доска номеров (roomboard.py) против прежних SQL-путей db.py: память на
+номера дня и задержка выборок, которые бот делает на каждое нажатие
+(get_room, toggle_type) и на каждое открытие «Мои номера»
+(get_rooms_for_maid по maid_tg_id и по имени).
+
+Память — tracemalloc: доска дня против тех же строк кортежами, как их
+раньше держал снимок дня в rooms_cache.
+
+    python -m bench.room_board [repeat] [rooms ...]
+"""
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import closing
+
+import db
+from roomboard import DayBoard
+
+DAY = "2026-01-01"
+MAIDS = 40
+
+# прежние запросы db.get_room / db.get_rooms_for_maid
+SQL_ROOM = ("SELECT id, work_date, room_no, maid, maid_tg_id, cleaning_type, status, COALESCE(comment,''), "
+            "updated_by FROM rooms WHERE id=?")
+SQL_BY_TG = ("SELECT id, room_no, maid, maid_tg_id, cleaning_type, status, COALESCE(comment,'') "
+             "FROM rooms WHERE work_date=? AND maid_tg_id=? ORDER BY room_no;")
+SQL_BY_NAME = ("SELECT id, room_no, maid, maid_tg_id, cleaning_type, status, COALESCE(comment,'') "
+               "FROM rooms WHERE work_date=? AND maid=? ORDER BY room_no;")
+
+
+def _sql(query, params):
+    with closing(sqlite3.connect(db.DB_PATH)) as con:
+        return con.execute(query, params).fetchall()
+
+
+def _toggle_sql(room_id):
+    # прежний db.toggle_type: get_room из SQLite, затем запись в очередь
+    room = _sql(SQL_ROOM, (room_id,))[0]
+    new_type = 'Полная' if room[5] == 'Текущая' else 'Текущая'
+    db.updates.put(room_id, {'cleaning_type': new_type})
+    db.board.update(room_id, {'cleaning_type': new_type})
+    return new_type
+
+
+def _median_us(fn, args, repeat):
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args[i % len(args)])
+        times.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(times)
+
+
+def _traced_mib(fn):
+    tracemalloc.start()
+    keep = fn()
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return mem / 1024 / 1024
+
+
+def populate(rooms):
+    db.init_db()
+    db.add_plan_rows([{"work_date": DAY, "room_no": str(1000 + i), "maid": f"Горничная {i % MAIDS}",
+                       "maid_tg_id": 500 + i % MAIDS, "cleaning_type": "Полная" if i % 5 == 0 else "Текущая"}
+                      for i in range(rooms)])
+    ids = [r[0] for r in db.get_rooms(DAY)]
+    for room_id in random.Random(1).sample(ids, rooms // 3):
+        db.set_status(room_id, "Убрано", "bench")
+        if room_id % 7 == 0:
+            db.set_comment(room_id, "нет полотенец", "bench")
+    db.flush()
+    return ids
+
+
+def run(rooms, repeat):
+    ids = populate(rooms)
+    rnd = random.Random(2)
+    room_args = [(rnd.choice(ids),) for _ in range(repeat)]
+    tg_args = [(500 + rnd.randrange(MAIDS),) for _ in range(repeat)]
+    name_args = [(f"Горничная {rnd.randrange(MAIDS)}",) for _ in range(repeat)]
+
+    mem_tuples = _traced_mib(lambda: _sql("SELECT id, room_no, maid, maid_tg_id, cleaning_type, status, "
+                                          "COALESCE(comment,'') FROM rooms WHERE work_date=? ORDER BY room_no",
+                                          (DAY,)))
+    # строки из SQLite живут только на время загрузки: в памяти остаётся доска
+    mem_board = _traced_mib(lambda: DayBoard(DAY, db._load_board(DAY)))
+
+    db.board.invalidate()
+    t0 = time.perf_counter()
+    db.board.get(DAY)
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    results = {
+        "get_room": (_median_us(lambda i: _sql(SQL_ROOM, (i,)), room_args, repeat),
+                     _median_us(db.get_room, room_args, repeat)),
+        "for_maid[tg]": (_median_us(lambda t: _sql(SQL_BY_TG, (DAY, t)), tg_args, repeat),
+                         _median_us(lambda t: db.get_rooms_for_maid(DAY, maid_tg_id=t), tg_args, repeat)),
+        "for_maid[name]": (_median_us(lambda n: _sql(SQL_BY_NAME, (DAY, n)), name_args, repeat),
+                           _median_us(lambda n: db.get_rooms_for_maid(DAY, maid_name=n), name_args, repeat)),
+        "toggle_type": (_median_us(_toggle_sql, room_args, repeat),
+                        _median_us(db.toggle_type, room_args, repeat)),
+    }
+    db.flush()
+    return mem_tuples, mem_board, load_ms, results
+
+
+def main(repeat=2000, *room_counts):
+    for rooms in room_counts or (1000, 10000, 50000):
+        with tempfile.TemporaryDirectory() as tmp:
+            db.DB_PATH = os.path.join(tmp, "data.db")
+            db.board.invalidate()
+            mem_tuples, mem_board, load_ms, results = run(rooms, repeat)
+            db.board.invalidate()
+        per10k = 10000 / rooms
+        print(f"rooms={rooms}: board {mem_board * per10k:.2f} MiB/10k rooms "
+              f"(tuples {mem_tuples * per10k:.2f}), load {load_ms:.1f}ms")
+        for name, (sql_us, board_us) in results.items():
+            print(f"  {name:<15} sql {sql_us:8.1f}us   board {board_us:6.1f}us   x{sql_us / board_us:.0f}")
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:]])
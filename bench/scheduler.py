@@ -0,0 +1,148 @@
+"""
+Автоотчёты многих чатов: одна куча DailyScheduler против задачи на каждый
+чат в JobQueue (APScheduler, CronTrigger — то же, что run_daily).
+
+1) Постановка N чатов со случайным временем и часовым поясом: время и
+   память (tracemalloc, отдельным прогоном).
+2) Сутки на симулированных часах: сколько тиков (пробуждений) и сколько
+   отчётов ушло, время CPU на пересчёт следующих срабатываний.
+3) Переходы на летнее/зимнее время (Europe/Berlin, 2026-03-29 и 2026-10-25):
+   каждый чат должен получить ровно один отчёт за местный день в своё время;
+   для сравнения — старая схема «первый запуск + каждые 86400 с».
+
+    python -m bench.scheduler [chats]
+"""
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+
+import scheduler
+
+ZONES = ["Asia/Tashkent", "Europe/Moscow", "Europe/Berlin", "Europe/London", "America/New_York",
+         "Asia/Dubai", "Asia/Almaty", "Europe/Istanbul", "Asia/Kolkata", "Australia/Sydney"]
+DST_ZONE = "Europe/Berlin"
+DST_DAYS = [("2026-03-27", "2026-04-01"), ("2026-10-23", "2026-10-28")]
+
+
+def _chats(n, seed=1):
+    rnd = random.Random(seed)
+    return [(-1000000 - i, rnd.randrange(24), rnd.randrange(60), rnd.choice(ZONES)) for i in range(n)]
+
+
+async def _noop(*_):
+    pass
+
+
+async def setup_heap(chats):
+    s = scheduler.DailyScheduler(_noop)
+    for chat_id, hh, mm, tz_name in chats:
+        s.set(chat_id, hh, mm, tz_name)
+    return s
+
+
+async def setup_jobs(chats):
+    s = AsyncIOScheduler()
+    s.start(paused=True)
+    for chat_id, hh, mm, tz_name in chats:
+        s.add_job(_noop, CronTrigger(hour=hh, minute=mm, timezone=tz_name), args=[chat_id])
+    return s
+
+
+async def measure(setup, chats):
+    # время — без tracemalloc (он замедляет в разы), память — отдельным прогоном
+    results = []
+    for traced in (False, True):
+        if traced:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        s = await setup(chats)
+        results.append((time.perf_counter() - t0) * 1000 if not traced
+                       else tracemalloc.get_traced_memory()[0] / 1024 / 1024)
+        if traced:
+            tracemalloc.stop()
+        if isinstance(s, AsyncIOScheduler):
+            s.shutdown(wait=False)
+    return results
+
+
+async def simulate_day(chats):
+    clock = [time.time()]
+    sent = []
+
+    async def fire(keys):
+        sent.extend(keys)
+
+    s = scheduler.DailyScheduler(fire, clock=lambda: clock[0])
+    for chat_id, hh, mm, tz_name in chats:
+        s.set(chat_id, hh, mm, tz_name)
+    end = clock[0] + 86400
+    cpu = 0.0
+    while clock[0] < end:
+        # как _run: спим до вершины кучи (не дольше MAX_SLEEP) и тикаем
+        clock[0] = min(s._heap[0][0], clock[0] + scheduler.MAX_SLEEP, end)
+        t0 = time.perf_counter()
+        await s.tick()
+        cpu += time.perf_counter() - t0
+    return s.ticks, len(sent), len(set(sent)), cpu * 1000
+
+
+def _ts(day, tz_name):
+    return scheduler.zone(tz_name).localize(datetime.strptime(day, "%Y-%m-%d")).timestamp()
+
+
+async def dst_check(chats):
+    zone = scheduler.zone(DST_ZONE)
+    bad_heap = bad_fixed = total = 0
+    for d_from, d_to in DST_DAYS:
+        start, end = _ts(d_from, DST_ZONE), _ts(d_to, DST_ZONE)
+        clock = [start]
+        fired = {}
+
+        async def fire(keys):
+            for key in keys:
+                fired.setdefault(key, []).append(clock[0])
+
+        s = scheduler.DailyScheduler(fire, clock=lambda: clock[0])
+        for chat_id, hh, mm, _ in chats:
+            s.set(chat_id, hh, mm, DST_ZONE)
+        while clock[0] < end:
+            clock[0] = min(s._heap[0][0], end)
+            await s.tick()
+        for chat_id, hh, mm, _ in chats:
+            runs = [datetime.fromtimestamp(ts, zone) for ts in fired.get(chat_id, [])]
+            days = [r.date() for r in runs]
+            total += len(runs)
+            # ровно один раз в каждый местный день; время — hh:mm, кроме
+            # несуществующего часа весной (тогда на час позже)
+            ok = len(days) == len(set(days)) == (len(runs) and (days[-1] - days[0]).days + 1)
+            ok = ok and all((r.hour, r.minute) == (hh, mm)
+                            or (hh == 2 and str(r.date()) == "2026-03-29" and (r.hour, r.minute) == (3, mm))
+                            for r in runs)
+            bad_heap += not ok
+            # старая схема: первое срабатывание верно, дальше +86400 с
+            first = scheduler.next_fire(hh, mm, DST_ZONE, start)
+            fixed = [datetime.fromtimestamp(first + i * 86400, zone) for i in range(len(runs))]
+            bad_fixed += any((r.hour, r.minute) != (hh, mm) for r in fixed)
+    return total, bad_heap, bad_fixed
+
+
+def main(n=10000):
+    chats = _chats(n)
+    print(f"chats={n}")
+    for name, setup in (("heap", setup_heap), ("jobqueue", setup_jobs)):
+        ms, mib = asyncio.run(measure(setup, chats))
+        print(f"setup {name:<9} {ms:9.1f}ms   {mib:7.2f} MiB   timers: {1 if name == 'heap' else n}")
+    ticks, sent, uniq, cpu = asyncio.run(simulate_day(chats))
+    print(f"24h   heap      ticks={ticks} reports={sent} chats={uniq} cpu {cpu:.1f}ms")
+    total, bad_heap, bad_fixed = asyncio.run(dst_check(chats[:1000]))
+    print(f"DST   {DST_ZONE}: reports={total}  wrong-time chats: heap={bad_heap}  fixed-86400={bad_fixed}")
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:2]])
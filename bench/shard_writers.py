@@ -0,0 +1,65 @@
+"""
+Параллельные писатели разных объектов: один общий asal.db против шардов
+(свой файл, поток и соединение у каждого объекта).
+
+Каждый объект независимо шлёт поток мелких записей — отметки «Готово»
+по одному номеру (как нажатия горничных). В режиме single все объекты
+живут в одном файле (различаются днём плана) и ждут один поток записи.
+
+    python -m bench.shard_writers [properties] [writes_per_property] [rooms]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import storage
+
+DAY = "2026-01-01"
+
+
+def _mark(conn, day, room_no):
+    conn.cache.invalidate(day)
+    with conn:
+        conn.execute("UPDATE plan SET status='Готово' WHERE day=? AND room_no=?", (day, room_no))
+
+
+async def writer(shard, day, writes, rooms, latencies):
+    for i in range(writes):
+        t0 = time.perf_counter()
+        await storage.store(shard).acall(_mark, day, 100 + i % rooms)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+
+async def run(mode, properties, writes, rooms):
+    plan = [(100 + i, f"Горничная {i % 10}", "Текущая") for i in range(rooms)]
+    targets = []
+    for p in range(properties):
+        # single: объект = свой день в общем файле; sharded: объект = свой файл
+        shard, day = (storage.DEFAULT_SHARD, f"2026-01-{p + 1:02d}") if mode == "single" else (f"p{p}", DAY)
+        await storage.replace_day(day, plan, shard=shard)
+        targets.append((shard, day))
+    latencies = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*[writer(shard, day, writes, rooms, latencies) for shard, day in targets])
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return properties * writes / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+def main(properties=8, writes=300, rooms=200):
+    print(f"properties={properties} writes/property={writes} rooms={rooms}")
+    for mode in ("single", "sharded"):
+        with tempfile.TemporaryDirectory() as tmp:
+            storage.DB_PATH = os.path.join(tmp, "asal.db")
+            storage.MAX_OPEN_SHARDS = max(storage.MAX_OPEN_SHARDS, properties + 1)
+            storage.init_db()
+            rate, p50, p95 = asyncio.run(run(mode, properties, writes, rooms))
+            storage.close()
+        print(f"{mode:<8} {rate:9.0f} writes/s   p50 {p50:7.2f}ms   p95 {p95:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:4]])
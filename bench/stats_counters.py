@@ -0,0 +1,87 @@
+"""
+Статистика дня: пересчёт строк (исходные db.stats и SUM(CASE…) по plan)
+против счётчиков room_stats/plan_stats, которые ведут триггеры.
+Кэш снимков дня отключён — меряем сами запросы.
+
+    python -m bench.stats_counters [rooms_per_day ...]   # по умолчанию 10k 50k
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+
+import db
+import storage
+from daycache import DayCache
+
+DAY = "2026-01-01"
+HISTORY_DAYS = 30
+SQL_SCAN_STATS = (
+    "SELECT COUNT(*) as total, "
+    "SUM(CASE WHEN status='Готово' THEN 1 ELSE 0 END) as done, "
+    "SUM(CASE WHEN status!='Готово' THEN 1 ELSE 0 END) as left "
+    "FROM plan WHERE day=?"
+)
+
+
+def legacy_db_stats(date_str):
+    with closing(sqlite3.connect(db.DB_PATH)) as con:
+        rooms = con.execute("SELECT id, room_no, maid, maid_tg_id, cleaning_type, status, COALESCE(comment,'') "
+                            "FROM rooms WHERE work_date=? ORDER BY room_no;", (date_str,)).fetchall()
+    total = len(rooms)
+    cleaned = sum(1 for r in rooms if r[5] == 'Убрано')
+    full_total = sum(1 for r in rooms if r[4] == 'Полная')
+    full_cleaned = sum(1 for r in rooms if r[4] == 'Полная' and r[5] == 'Убрано')
+    return total, cleaned, total - cleaned, full_total, full_cleaned
+
+
+def timeit(fn, repeat=30):
+    t = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t) / repeat * 1000
+
+
+def fill(rooms):
+    days = [f"2025-12-{d:02d}" for d in range(1, HISTORY_DAYS)] + [DAY]
+    for day in days:
+        db.add_plan_rows([{'work_date': day, 'room_no': str(1000 + i), 'maid': f"maid{i % 40}",
+                           'cleaning_type': 'Полная' if i % 4 == 0 else 'Текущая'} for i in range(rooms)])
+        asyncio.run(storage.insert_rows(day, [(1000 + i, f"maid{i % 40}", "Текущая") for i in range(rooms)]))
+    with closing(sqlite3.connect(db.DB_PATH)) as con:
+        con.execute("UPDATE rooms SET status='Убрано' WHERE id % 3 = 0")
+        con.commit()
+
+
+def main(sizes):
+    print(f"{'rooms':>7} {'db.stats old':>13} {'db.stats new':>13} {'plan scan':>10} {'plan_stats':>11}  (ms)")
+    for rooms in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db.DB_PATH = os.path.join(tmp, "data.db")
+            storage.DB_PATH = os.path.join(tmp, "asal.db")
+            db.init_db()
+            storage.init_db()
+            fill(rooms)
+            conn = sqlite3.connect(storage.DB_PATH, factory=storage.ShardConnection)
+            conn.row_factory = sqlite3.Row
+            conn.cache = DayCache()
+            conn.archive_path = storage.archive_path(storage.DB_PATH)
+
+            def db_new():
+                db.rooms_cache.invalidate()
+                return db.stats(DAY)
+
+            old_rooms = timeit(lambda: legacy_db_stats(DAY))
+            new_rooms = timeit(db_new)
+            old_plan = timeit(lambda: conn.execute(SQL_SCAN_STATS, (DAY,)).fetchone())
+            new_plan = timeit(lambda: storage._get_stats(conn, DAY))
+            print(f"{rooms:>7} {old_rooms:>13.3f} {new_rooms:>13.3f} {old_plan:>10.3f} {new_plan:>11.3f}")
+            conn.close()
+            storage.close()
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [10_000, 50_000])
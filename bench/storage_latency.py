@@ -0,0 +1,100 @@
+"""
+Сравнение задержки: соединение на каждый вызов (старый путь main.db())
+против долгоживущего соединения storage.py на выделенном потоке.
+
+Помимо задержки одного запроса меряем «залипание» event loop: фоновая
+корутина тикает раз в 1 мс и записывает максимальное опоздание, пока
+обработчики параллельно ходят в БД.
+
+    python -m bench.storage_latency [rooms] [calls]
+"""
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import storage
+
+DAY = "2026-01-01"
+
+
+def legacy_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def legacy_get_rooms(path, day):
+    conn = legacy_db(path)
+    rows = conn.execute(storage.SQL_GET_ROOMS, (day,)).fetchall()
+    conn.close()
+    return rows
+
+
+def legacy_get_stats(path, day):
+    conn = legacy_db(path)
+    row = conn.execute(storage.SQL_GET_STATS, (day, day)).fetchone()
+    conn.close()
+    return row["total"], row["done"], row["total"] - row["done"]
+
+
+async def _ticker(stop, lags):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - t - 0.001)
+
+
+def _fmt(name, samples, lags):
+    samples = sorted(samples)
+    p50 = statistics.median(samples) * 1000
+    p95 = samples[int(len(samples) * 0.95) - 1] * 1000
+    lag = max(lags) * 1000 if lags else 0.0
+    print(f"{name:<24} p50={p50:7.3f} ms  p95={p95:7.3f} ms  max loop lag={lag:7.3f} ms")
+
+
+async def _run_legacy(path, calls):
+    stop, lags, samples = asyncio.Event(), [], []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    for _ in range(calls):
+        t = time.perf_counter()
+        legacy_get_stats(path, DAY)
+        legacy_get_rooms(path, DAY)
+        samples.append(time.perf_counter() - t)
+        await asyncio.sleep(0)
+    stop.set()
+    await ticker
+    _fmt("per-call connection", samples, lags)
+
+
+async def _run_storage(calls):
+    stop, lags, samples = asyncio.Event(), [], []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    for _ in range(calls):
+        t = time.perf_counter()
+        await storage.get_stats(DAY)
+        await storage.get_rooms(DAY)
+        samples.append(time.perf_counter() - t)
+    stop.set()
+    await ticker
+    _fmt("long-lived (storage)", samples, lags)
+
+
+def main(rooms=300, calls=500):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        storage.DB_PATH = path
+        storage.init_db()
+        asyncio.run(storage.insert_rows(DAY, [(100 + i, f"maid{i % 12}", "Текущая") for i in range(rooms)]))
+        print(f"rooms={rooms} calls={calls} (get_stats + get_rooms на вызов)")
+        asyncio.run(_run_legacy(path, calls))
+        asyncio.run(_run_storage(calls))
+        storage.close()
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
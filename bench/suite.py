@@ -0,0 +1,209 @@
+"""
+Воспроизводимый набор замеров горячих путей на синтетическом отеле
+(bench/hotel.py) — без сети, через поддельные Update/Bot (bench/fakes.py).
+
+Замеры:
+  upload[<кодировка>,<разделитель>]  документ → ответ (document_handler)
+  upload[xlsx]                        то же для книги XLSX
+  report, report_cold                 /report из кэша и после сброса кэша
+  db.stats, db.get_rooms_for_maid     data.db (db.py)
+  export_csv, export_xlsx             выгрузка всей истории (D дней)
+
+Результаты пишутся в JSON (медиана, p95, минимум в мс). С --baseline
+результаты сравниваются с прошлым прогоном: замедление медианы больше
+порога (THRESHOLDS, по умолчанию ×1.25) — регрессия, код выхода 1.
+
+    python -m bench.suite [--rooms 300] [--maids 12] [--days 30] [--repeat 20]
+                          [--out bench_results.json] [--baseline base.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import db
+import storage
+from bench.fakes import FakeContext, FakeDocument, FakeMessage, FakeUpdate
+from bench.hotel import CSV_VARIANTS, Hotel
+
+DEFAULT_THRESHOLD = 1.25
+# допустимое замедление по замерам; у тяжёлых выгрузок дрожание больше
+THRESHOLDS = {
+    "export_csv": 1.4,
+    "export_xlsx": 1.4,
+}
+NOISE_FLOOR_MS = 0.5   # разница меньше этого — шум, не регрессия
+
+
+async def measure(fn, repeat: int, warmup: int = 2):
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "min_ms": round(samples[0], 3),
+        "runs": repeat,
+    }
+
+
+async def run_cases(hotel: Hotel, repeat: int):
+    import main   # здесь, а не наверху: тянет telegram; хранилище main при импорте не открывает
+
+    today = hotel.today
+    main.day_str = lambda dt=None: today
+    results = {}
+
+    # документ → ответ; планы чередуются, чтобы каждая загрузка применяла разницу
+    for encoding, delimiter, header in CSV_VARIANTS:
+        files = [hotel.csv_bytes(today, encoding, delimiter, header, variant=v) for v in (0, 1)]
+        turn = [0]
+
+        async def upload():
+            data = files[turn[0] % 2]
+            turn[0] += 1
+            msg = FakeMessage(document=FakeDocument("plan.csv", data))
+            ctx = FakeContext()
+            ctx.user_data["await_csv"] = True
+            await main.document_handler(FakeUpdate(msg), ctx)
+            assert msg.replies and msg.replies[-1].startswith("Загружено"), msg.replies
+
+        name = f"upload[{encoding},{'semicolon' if delimiter == ';' else 'comma'}]"
+        results[name] = await measure(upload, repeat)
+
+    files = [hotel.xlsx_bytes([today], variant=v) for v in (0, 1)]
+    turn = [0]
+
+    async def upload_xlsx():
+        msg = FakeMessage(document=FakeDocument("plan.xlsx", files[turn[0] % 2]))
+        turn[0] += 1
+        await main.document_handler(FakeUpdate(msg), FakeContext())
+        assert msg.replies and msg.replies[-1].startswith("Загружено"), msg.replies
+
+    results["upload[xlsx]"] = await measure(upload_xlsx, repeat)
+
+    async def report():
+        msg = FakeMessage()
+        await main.report(FakeUpdate(msg), FakeContext())
+
+    async def report_cold():
+        storage.plan_cache.invalidate(today)
+        await report()
+
+    results["report"] = await measure(report, repeat)
+    results["report_cold"] = await measure(report_cold, repeat)
+
+    # db.py синхронный — в боте его вызывают как есть, так и меряем
+    maid = hotel.maid_names[0]
+
+    async def db_stats():
+        db.rooms_cache.invalidate(today)
+        db.stats(today)
+
+    async def rooms_for_maid():
+        db.get_rooms_for_maid(today, maid_tg_id=hotel.maid_tg_ids[maid])
+
+    async def rooms_for_maid_name():
+        db.get_rooms_for_maid(today, maid_name=maid)
+
+    results["db.stats"] = await measure(db_stats, repeat)
+    results["db.get_rooms_for_maid"] = await measure(rooms_for_maid, repeat)
+    results["db.get_rooms_for_maid[name]"] = await measure(rooms_for_maid_name, repeat)
+
+    span = [hotel.day_list[0], today]
+    for kind, handler in (("csv", main.export_csv), ("xlsx", main.export_xlsx)):
+        async def export_all(handler=handler):
+            msg = FakeMessage()
+            await handler(FakeUpdate(msg), FakeContext(args=span))
+            assert msg.documents, msg.replies
+
+        results[f"export_{kind}"] = await measure(export_all, max(3, repeat // 5), warmup=1)
+    return results
+
+
+def compare(results, baseline):
+    """[(замер, было, стало, отношение, порог)] для замеров хуже порога."""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        was, now = base["median_ms"], cur["median_ms"]
+        limit = THRESHOLDS.get(name, DEFAULT_THRESHOLD)
+        ratio = now / was if was else float("inf")
+        if ratio > limit and now - was > NOISE_FLOOR_MS:
+            regressions.append((name, was, now, ratio, limit))
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rooms", type=int, default=300)
+    ap.add_argument("--maids", type=int, default=12)
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline")
+    args = ap.parse_args(argv)
+
+    hotel = Hotel(args.rooms, args.maids, args.days, seed=args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "asal.db")
+        db.DB_PATH = os.path.join(tmp, "data.db")
+        storage.init_db()
+
+        async def run():
+            await hotel.populate_storage()
+            return await run_cases(hotel, args.repeat)
+
+        hotel.populate_db()
+        results = asyncio.run(run())
+        db.updates.close()
+        storage.close()
+
+    report = {
+        "meta": {
+            "rooms": args.rooms, "maids": args.maids, "days": args.days,
+            "repeat": args.repeat, "seed": args.seed,
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+
+    width = max(len(n) for n in results)
+    print(f"{'case':<{width}}  {'median':>9}  {'p95':>9}")
+    for name, r in results.items():
+        print(f"{name:<{width}}  {r['median_ms']:>7.2f}ms  {r['p95_ms']:>7.2f}ms")
+    print(f"-> {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        if baseline.get("meta", {}).get("rooms") != args.rooms or baseline["meta"].get("days") != args.days:
+            print("warning: baseline was recorded with a different hotel size")
+        regressions = compare(results, baseline)
+        for name, was, now, ratio, limit in regressions:
+            print(f"REGRESSION {name}: {was:.2f}ms -> {now:.2f}ms (x{ratio:.2f} > x{limit})")
+        if regressions:
+            return 1
+        print(f"no regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Пропускная способность и задержка «апдейт → ответ»: long polling с
+последовательной обработкой (как было) против webhook с параллельной
+обработкой по чатам (ChatOrderedProcessor).
+
+Настоящее приложение из main.build_app() работает целиком, но вместо сети —
+FakeTelegram: отвечает на getMe/setWebhook/getUpdates/sendMessage/… локально
+с заданной задержкой (RTT до Telegram). В webhook-режиме апдейты в виде
+JSON, как их шлёт Telegram, POST-ятся на локальный эндпоинт; можно подать
+свои записанные апдейты (--updates file.json, список объектов Update).
+
+Нагрузка: горничные в личных чатах жмут /report, а админ в это время
+запрашивает /export_xlsx за месяц — долгий обработчик.
+
+    python -m bench.webhook_load [--chats 20] [--per-chat 10] [--rtt 0.05]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+
+import httpx
+from telegram import Update
+from telegram.ext import TypeHandler
+from telegram.request import BaseRequest
+
+import storage
+from bench.hotel import Hotel
+
+BOT_ID = 123456
+TOKEN = f"{BOT_ID}:bench"
+PORT = 18443
+SECRET = "bench-secret"
+ADMIN_ID = 1
+
+
+def make_update(update_id, chat_id, text, message_id):
+    """Апдейт в том виде, в каком его присылает Telegram."""
+    entities = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}] \
+        if text.startswith("/") else []
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": f"user{chat_id}"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+            "text": text,
+            "entities": entities,
+        },
+    }
+
+
+def workload(chats, per_chat, export_span):
+    ids = itertools.count(1)
+    updates = [make_update(next(ids), ADMIN_ID, "/export_xlsx " + " ".join(export_span), 1)]
+    for k in range(per_chat):
+        for c in range(chats):
+            uid = next(ids)
+            updates.append(make_update(uid, 1000 + c, "/report", uid))
+    return updates
+
+
+class FakeTelegram(BaseRequest):
+    """HTTP-клиент бота без сети: каждый вызов API «стоит» rtt секунд."""
+
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.pending = []            # апдейты для getUpdates
+        self.arrived = asyncio.Event()
+        self.sent_at = {}            # message_id апдейта -> время поступления
+        self.replied = {}            # message_id апдейта -> время ответа
+        self.waiting = defaultdict(deque)      # chat_id -> message_id без ответа
+        self.handled = defaultdict(list)       # chat_id -> [message_id в порядке обработки]
+        self.msg_ids = itertools.count(10 ** 6)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def arrive(self, update):
+        msg = update["message"]
+        self.sent_at[msg["message_id"]] = time.perf_counter()
+        self.waiting[msg["chat"]["id"]].append(msg["message_id"])
+
+    def feed(self, update):
+        self.arrive(update)
+        self.pending.append(update)
+        self.arrived.set()
+
+    async def record(self, update, context):
+        # группа -1: вызывается перед основными обработчиками — фиксирует порядок обработки
+        self.handled[update.effective_chat.id].append(update.effective_message.message_id)
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        api = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        if api == "getUpdates":
+            return await self._get_updates(params)
+        await asyncio.sleep(self.rtt)
+        if api == "getMe":
+            result = {"id": BOT_ID, "is_bot": True, "first_name": "bench", "username": "bench_bot",
+                      "can_join_groups": True, "can_read_all_group_messages": False,
+                      "supports_inline_queries": False}
+        elif api in ("sendMessage", "sendDocument"):
+            chat_id = int(params["chat_id"])
+            # на каждую команду бот отвечает одним сообщением — ответ закрывает самую старую
+            if self.waiting[chat_id]:
+                self.replied[self.waiting[chat_id].popleft()] = time.perf_counter()
+            result = {"message_id": next(self.msg_ids), "date": int(time.time()),
+                      "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")}
+        else:   # setWebhook, deleteWebhook, pinChatMessage, …
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        self.pending = [u for u in self.pending if u["update_id"] >= offset]
+        if not self.pending:
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(self.arrived.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        await asyncio.sleep(self.rtt)   # ответ long poll идёт от Telegram
+        batch = self.pending[:100]
+        return 200, json.dumps({"ok": True, "result": batch}).encode()
+
+
+async def run_mode(main, mode, updates, rtt, rate):
+    main.CONCURRENT_UPDATES = 1 if mode == "polling" else main.CONCURRENT_UPDATES
+    fake = FakeTelegram(rtt)
+    app = main.build_app(request=fake, updates_request=fake)
+    app.add_handler(TypeHandler(Update, fake.record), group=-1)
+    await app.initialize()
+    await app.post_init(app)
+    if mode == "polling":
+        await app.updater.start_polling(poll_interval=0, timeout=10)
+    else:
+        await app.updater.start_webhook(listen="127.0.0.1", port=PORT, url_path="tg",
+                                        webhook_url="https://bench.invalid/tg", secret_token=SECRET)
+    await app.start()
+
+    t0 = time.perf_counter()
+    async with httpx.AsyncClient() as client:
+        async def post(u):
+            fake.arrive(u)
+            r = await client.post(f"http://127.0.0.1:{PORT}/tg", json=u,
+                                  headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+            r.raise_for_status()
+
+        posts = []
+        for u in updates:
+            if mode == "polling":
+                fake.feed(u)
+            else:
+                posts.append(asyncio.create_task(post(u)))
+            await asyncio.sleep(1 / rate)
+        await asyncio.gather(*posts)
+    while len(fake.replied) < len(updates):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - t0
+
+    # штатная остановка: updater → приложение (дожидается начатых апдейтов) → post_stop
+    await app.updater.stop()
+    await app.stop()
+    await app.post_stop(app)
+    await app.shutdown()
+
+    lat = sorted((fake.replied[m] - fake.sent_at[m]) * 1000 for m in fake.replied)
+    report_lat = sorted((fake.replied[m] - fake.sent_at[m]) * 1000 for m in fake.replied if m != 1)
+    in_order = all(seq == sorted(seq) for seq in fake.handled.values())
+    return {
+        "mode": mode,
+        "throughput": len(updates) / elapsed,
+        "p50": statistics.median(lat),
+        "p95": lat[int(len(lat) * 0.95) - 1],
+        "report_p95": report_lat[int(len(report_lat) * 0.95) - 1],
+        "export_ms": (fake.replied[1] - fake.sent_at[1]) * 1000,
+        "in_order": in_order,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chats", type=int, default=20)
+    ap.add_argument("--per-chat", type=int, default=10)
+    ap.add_argument("--rtt", type=float, default=0.05)
+    ap.add_argument("--rate", type=float, default=200, help="апдейтов в секунду на входе")
+    ap.add_argument("--rooms", type=int, default=300)
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--updates", help="JSON-файл с записанными апдейтами вместо синтетики")
+    args = ap.parse_args(argv)
+
+    hotel = Hotel(rooms=args.rooms, days=args.days)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "asal.db")
+        os.environ["BOT_TOKEN"] = TOKEN
+        os.environ.setdefault("ADMIN_IDS", str(ADMIN_ID))
+        import main   # здесь, а не наверху: тянет telegram; хранилище main при импорте не открывает
+        main.BOT_TOKEN = TOKEN
+        main.ADMIN_IDS = [ADMIN_ID]
+        main.day_str = lambda dt=None: hotel.today
+        asyncio.run(hotel.populate_storage())
+
+        if args.updates:
+            with open(args.updates, encoding="utf-8") as fh:
+                updates = json.load(fh)
+        else:
+            updates = workload(args.chats, args.per_chat, [hotel.day_list[0], hotel.today])
+
+        print(f"updates={len(updates)} rtt={args.rtt * 1000:.0f}ms rate={args.rate:g}/s "
+              f"concurrency={main.CONCURRENT_UPDATES}")
+        concurrency = main.CONCURRENT_UPDATES
+        for mode in ("polling", "webhook"):
+            main.CONCURRENT_UPDATES = concurrency
+            r = asyncio.run(run_mode(main, mode, updates, args.rtt, args.rate))
+            print(f"{mode:<8} {r['throughput']:7.1f} upd/s  p50 {r['p50']:7.1f}ms  p95 {r['p95']:7.1f}ms  "
+                  f"/report p95 {r['report_p95']:7.1f}ms  export {r['export_ms']:7.1f}ms  "
+                  f"per-chat order kept: {r['in_order']}")
+        storage.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Обновления статуса в секунду: исходный set_status (соединение + UPDATE +
+commit на каждый вызов) против отложенной записи db.set_status.
+
+    python -m bench.writebehind [updates] [rooms] [threads]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+
+import db
+
+
+def legacy_set_status(room_id, status, user):
+    with closing(sqlite3.connect(db.DB_PATH)) as con:
+        cur = con.cursor()
+        cur.execute("UPDATE rooms SET status=?, updated_by=?, updated_at=? WHERE id=?",
+                    (status, user, datetime.utcnow().isoformat(), room_id))
+        con.commit()
+
+
+def run(fn, ids, updates, threads):
+    per_thread = updates // threads
+
+    def worker(k):
+        for j in range(per_thread):
+            fn(ids[(k * 7 + j) % len(ids)], 'Убрано' if j % 2 else 'Не убрано', f"maid{k}")
+
+    ts = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+    t = time.perf_counter()
+    for th in ts:
+        th.start()
+    for th in ts:
+        th.join()
+    db.flush()   # учитываем и запись на диск
+    return per_thread * threads / (time.perf_counter() - t)
+
+
+def main(updates=5000, rooms=300, threads=8):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "data.db")
+        db.init_db()
+        db.add_plan_rows([{'work_date': '2026-01-01', 'room_no': str(100 + i), 'maid': f"maid{i % 10}"}
+                          for i in range(rooms)])
+        ids = [r[0] for r in db.get_rooms('2026-01-01')]
+        legacy = run(legacy_set_status, ids, updates, threads)
+        batched = run(db.set_status, ids, updates, threads)
+        print(f"updates={updates} rooms={rooms} threads={threads}")
+        print(f"per-call commit  {legacy:12,.0f} upd/s")
+        print(f"write-behind     {batched:12,.0f} upd/s  (flushes: {db.updates.flushes})")
+        db.updates.close()
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:4]])
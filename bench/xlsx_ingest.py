@@ -0,0 +1,117 @@
+"""
+Загрузка плана из XLSX: разбор книги потоково (XlsxPlanReader, openpyxl
+read_only) против того же плана в CSV и против «сначала сконвертировать
+книгу в CSV, потом загрузить». Время до записи в базу и пиковая память
+(tracemalloc) на один лист из N строк и на книгу из S листов.
+
+    python -m bench.xlsx_ingest [rows ...]      # по умолчанию 1k 10k 100k
+"""
+import asyncio
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import storage
+from plan_import import PlanReader, XlsxPlanReader
+
+DAY = "2026-01-01"
+SHEETS = 7
+
+
+def plan_rows(n):
+    return [(1000 + i, f"Горничная {i % 40}", "Полная" if i % 5 == 0 else "Текущая") for i in range(n)]
+
+
+def write_files(tmp, rows, sheets):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    per_sheet = rows // sheets
+    for s in range(sheets):
+        ws = wb.create_sheet(f"2026-01-{s + 1:02d}" if sheets > 1 else "План")
+        ws.append(["Номер", "Горничная", "Тип уборки"])
+        for r in plan_rows(per_sheet):
+            ws.append(list(r))
+    xlsx = os.path.join(tmp, "plan.xlsx")
+    wb.save(xlsx)
+    path_csv = os.path.join(tmp, "plan.csv")
+    with open(path_csv, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["room_no", "maid", "cleaning_type"])
+        w.writerows(plan_rows(per_sheet * sheets if sheets == 1 else per_sheet))
+    return xlsx, path_csv
+
+
+async def load(reader):
+    n = 0
+    for day, rows in reader.plans(DAY):
+        n += await storage.replace_day(day, rows)
+    return n
+
+
+def run_csv(xlsx, path_csv):
+    with open(path_csv, "rb") as f:
+        return asyncio.run(load(PlanReader(f)))
+
+
+def run_xlsx(xlsx, path_csv):
+    with open(xlsx, "rb") as f:
+        reader = XlsxPlanReader(f)
+        try:
+            return asyncio.run(load(reader))
+        finally:
+            reader.close()
+
+
+def run_convert(xlsx, path_csv):
+    # книга → CSV (по файлу на лист) → обычная загрузка CSV
+    from openpyxl import load_workbook
+
+    wb = load_workbook(xlsx, read_only=True, data_only=True)
+    n = 0
+    try:
+        for ws in wb.worksheets:
+            buf = io.StringIO()
+            csv.writer(buf).writerows(ws.iter_rows(values_only=True))
+            reader = PlanReader(io.BytesIO(buf.getvalue().encode("utf-8")))
+            n += asyncio.run(storage.replace_day(ws.title, reader)) if len(wb.sheetnames) > 1 \
+                else asyncio.run(storage.replace_day(DAY, reader))
+    finally:
+        wb.close()
+    return n
+
+
+def measure(fn, *args):
+    t = time.perf_counter()
+    n = fn(*args)
+    elapsed = time.perf_counter() - t
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return n, elapsed * 1000, peak / 1024 / 1024
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "bench.db")
+        storage.init_db()
+        print(f"{'rows':>8} {'sheets':>6} {'path':<12} {'ms':>10} {'rows/s':>10} {'peak MiB':>9}")
+        for size in sizes:
+            for sheets in (1, SHEETS):
+                xlsx, path_csv = write_files(tmp, size, sheets)
+                paths = [("xlsx", run_xlsx), ("xlsx→csv", run_convert)]
+                if sheets == 1:
+                    paths.insert(0, ("csv", run_csv))
+                for name, fn in paths:
+                    n, ms, peak = measure(fn, xlsx, path_csv)
+                    print(f"{n:>8} {sheets:>6} {name:<12} {ms:>10.0f} {n / ms * 1000:>10,.0f} {peak:>9.2f}")
+        storage.close()
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [1_000, 10_000, 100_000])
@@ -0,0 +1,99 @@
+import asyncio
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Параллельная обработка апдейтов с порядком внутри чата
+#
+# Апдейты разных чатов обрабатываются одновременно (долгая выгрузка XLSX
+# не держит нажатия остальных), а апдейты одного чата — строго по очереди,
+# в порядке поступления: смены статуса одного номера применяются по порядку.
+#
+# Базовый семафор PTB берётся раньше do_process_update, поэтому сам он здесь
+# ограничивает только число апдейтов «в работе» (max_pending, включая
+# ждущих свой чат). Реальный предел параллельности — свой семафор, который
+# берётся уже после замка чата: ждущие своей очереди апдейты одного чата
+# не занимают слоты остальных.
+# ───────────────────────────────────────────────────────────────────────────────
+DEFAULT_CONCURRENCY = 16
+DEFAULT_MAX_PENDING = 1024
+
+
+class _ChatLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class ChatOrderedProcessor(BaseUpdateProcessor):
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY,
+                 max_pending: int = DEFAULT_MAX_PENDING):
+        super().__init__(max(max_pending, concurrency, 2))
+        self.concurrency = concurrency
+        self.processed = 0
+        self._running = asyncio.BoundedSemaphore(concurrency)
+        self._chats: Dict[Any, _ChatLock] = {}
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @staticmethod
+    def chat_key(update: object) -> Optional[int]:
+        if isinstance(update, Update):
+            chat = update.effective_chat
+            if chat is not None:
+                return chat.id
+            if update.effective_user is not None:
+                return update.effective_user.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        self._inflight += 1
+        self._idle.clear()
+        key = self.chat_key(update)
+        entry = None
+        if key is not None:
+            entry = self._chats.get(key)
+            if entry is None:
+                entry = self._chats[key] = _ChatLock()
+            entry.users += 1
+        try:
+            if entry is None:
+                async with self._running:
+                    await coroutine
+            else:
+                # замок чата — первым (asyncio.Lock отдаётся в порядке ожидания)
+                async with entry.lock:
+                    async with self._running:
+                        await coroutine
+        finally:
+            if entry is not None:
+                entry.users -= 1
+                if not entry.users:
+                    del self._chats[key]
+            self.processed += 1
+            self._inflight -= 1
+            if not self._inflight:
+                self._idle.set()
+
+    def depth(self) -> int:
+        return self._inflight
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться окончания всех начатых апдейтов; False — не успели за timeout."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        if not await self.drain(timeout=30):
+            print(f"[updates] shutdown with {self._inflight} updates still running")
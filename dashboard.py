@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import json
+from typing import Callable, Dict, List, Optional
+
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+import storage
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Живая сводка дня: закреплённое сообщение, которое бот правит на месте
+#
+# /dashboard создаёт сообщение в чате и закрепляет его один раз. Дальше любое
+# изменение плана (сброс снимка дня в кэше) помечает сводку «грязной»; правка
+# уходит не чаще раза в DEBOUNCE секунд — пачка нажатий даёт одну правку.
+# Текст режется на страницы по горничным (лимит Telegram — 4096 символов);
+# у каждой страницы хранится хэш, и неизменённые страницы не трогаются.
+# Состояние (id сообщений, хэши) лежит в settings под ключом dashboard:<chat_id>.
+# Каждый чат видит план своего объекта (шарда хранилища).
+# ───────────────────────────────────────────────────────────────────────────────
+DEBOUNCE = 3.0
+MAX_LEN = 4096
+KEY_PREFIX = "dashboard:"
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def render(day: str, stats, rows) -> List[str]:
+    """Текст сводки, разбитый на страницы по горничным."""
+    total, done, left = stats
+    pct = round(done * 100 / total) if total else 0
+    header = f"📋 Сводка за {day}\nВсего: {total} | Готово: {done} ({pct}%) | Осталось: {left}"
+
+    by_maid: Dict[str, list] = {}
+    for r in rows:
+        by_maid.setdefault(r["maid"], []).append(r)
+    sections = []
+    for maid, lst in sorted(by_maid.items()):
+        ready = [str(r["room_no"]) for r in lst if r["status"] == "Готово"]
+        rest = [str(r["room_no"]) for r in lst if r["status"] != "Готово"]
+        lines = [f"— {maid}: {len(ready)}/{len(lst)}"]
+        if ready:
+            lines.append("✅ " + ", ".join(ready))
+        if rest:
+            lines.append("⏳ " + ", ".join(rest))
+        sections.append("\n".join(lines))
+
+    pages, current = [], header
+    for section in sections:
+        # секцию одной горничной, которая сама не влезает, режем по строкам/номерам
+        while len(section) > MAX_LEN - 2:
+            cut = section.rfind(", ", 0, MAX_LEN - 2)
+            if cut <= 0:
+                cut = MAX_LEN - 2
+            head, section = section[:cut], section[cut + 2:]
+            pages.append(current)
+            current = head
+        if len(current) + 2 + len(section) > MAX_LEN:
+            pages.append(current)
+            current = section
+        else:
+            current += "\n\n" + section
+    pages.append(current)
+    return pages
+
+
+class Dashboards:
+    def __init__(self, bot, day_fn: Callable[[], str], debounce: float = DEBOUNCE):
+        self.bot = bot
+        self.day_fn = day_fn
+        self.debounce = debounce
+        self.edits = 0
+        self.skipped = 0
+        self._state: Dict[int, dict] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        self._loop = asyncio.get_running_loop()
+        for key, value in await storage.get_settings(KEY_PREFIX):
+            self._state[int(key[len(KEY_PREFIX):])] = json.loads(value)
+
+    def watch(self):
+        storage.subscribe(self._on_change)
+
+    def _on_change(self, shard: str, day: Optional[str]):
+        # вызывается из потока шарда
+        if self._loop is not None and self._state and (day is None or day == self.day_fn()):
+            self._loop.call_soon_threadsafe(self.mark_dirty)
+
+    def mark_dirty(self, delay: Optional[float] = None):
+        if self._timer is None:
+            self._timer = self._loop.call_later(
+                self.debounce if delay is None else delay,
+                lambda: asyncio.ensure_future(self._fire()),
+            )
+
+    async def _fire(self):
+        self._timer = None
+        await self.refresh()
+
+    async def create(self, chat_id: int):
+        """Новая сводка в чате (старая, если была, перестаёт обновляться)."""
+        async with self._lock:
+            self._state[chat_id] = {"messages": [], "hashes": []}
+            await self._update_chat(chat_id, await self._pages(storage.shard_for(chat_id)), pin=True)
+
+    async def remove(self, chat_id: int) -> bool:
+        async with self._lock:
+            if self._state.pop(chat_id, None) is None:
+                return False
+            await storage.set_setting(KEY_PREFIX + str(chat_id), None)
+            return True
+
+    async def refresh(self):
+        if not self._state:
+            return
+        async with self._lock:
+            # одна выборка на объект: у чатов одного объекта сводка одинаковая
+            pages: Dict[str, List[str]] = {}
+            for chat_id in list(self._state):
+                shard = storage.shard_for(chat_id)
+                try:
+                    if shard not in pages:
+                        pages[shard] = await self._pages(shard)
+                    await self._update_chat(chat_id, pages[shard])
+                except RetryAfter as e:
+                    ra = e.retry_after
+                    self.mark_dirty(ra.total_seconds() if hasattr(ra, "total_seconds") else float(ra))
+                    return
+                except Forbidden:
+                    # бота убрали из чата — сводку там больше не ведём
+                    self._state.pop(chat_id, None)
+                    await storage.set_setting(KEY_PREFIX + str(chat_id), None)
+                except Exception as e:
+                    print(f"[dashboard] chat {chat_id}: {e!r}")
+
+    async def _pages(self, shard: str) -> List[str]:
+        day = self.day_fn()
+        rows = await storage.get_rooms(day, shard=shard)
+        stats = await storage.get_stats(day, shard=shard)
+        return render(day, stats, rows)
+
+    async def _update_chat(self, chat_id: int, pages: List[str], pin: bool = False):
+        state = self._state[chat_id]
+        messages, hashes = state["messages"], state["hashes"]
+        changed = False
+        for i, page in enumerate(pages):
+            h = _digest(page)
+            if i < len(messages):
+                if hashes[i] == h:
+                    self.skipped += 1
+                    continue
+                try:
+                    await self.bot.edit_message_text(chat_id=chat_id, message_id=messages[i], text=page)
+                    self.edits += 1
+                except BadRequest as e:
+                    if "not modified" not in str(e).lower():
+                        # сообщение удалили — публикуем страницу заново
+                        msg = await self.bot.send_message(chat_id=chat_id, text=page)
+                        messages[i] = msg.message_id
+                        pin = pin or i == 0
+                hashes[i] = h
+            else:
+                msg = await self.bot.send_message(chat_id=chat_id, text=page)
+                messages.append(msg.message_id)
+                hashes.append(h)
+            changed = True
+        # страниц стало меньше — лишние сообщения удаляем
+        while len(messages) > len(pages):
+            try:
+                await self.bot.delete_message(chat_id=chat_id, message_id=messages[-1])
+            except BadRequest:
+                pass
+            messages.pop()
+            hashes.pop()
+            changed = True
+        if pin and messages:
+            try:
+                await self.bot.pin_chat_message(chat_id=chat_id, message_id=messages[0],
+                                                disable_notification=True)
+            except BadRequest as e:
+                print(f"[dashboard] chat {chat_id}: cannot pin: {e}")
+        if changed:
+            await storage.set_setting(KEY_PREFIX + str(chat_id), json.dumps(state))
@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Кэш снимков дня в памяти процесса
+#
+# Для каждого дня храним несколько частей (строки плана, агрегаты); старые
+# дни вытесняются по LRU. Любая запись за день сбрасывает его снимок.
+# Чтобы чтение, начатое до записи, не положило в кэш устаревшие данные,
+# put принимает «жетон» — номер поколения на момент начала чтения.
+# Подписчики (subscribe) узнают о каждом сбросе — так, например, живая сводка
+# в чате понимает, что день изменился.
+# ───────────────────────────────────────────────────────────────────────────────
+DEFAULT_MAX_DAYS = 7
+
+
+class DayCache:
+    def __init__(self, max_days: int = DEFAULT_MAX_DAYS):
+        self.max_days = max_days
+        self.hits = 0
+        self.misses = 0
+        self._days: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Optional[str]], None]] = []
+
+    def subscribe(self, fn: Callable[[Optional[str]], None]):
+        """fn(day) вызывается после каждого сброса (day=None — сброшено всё), из потока писателя."""
+        self._listeners.append(fn)
+
+    def token(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def get(self, day: str, part: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._days.get(day)
+            if entry is None or part not in entry:
+                self.misses += 1
+                return None
+            self._days.move_to_end(day)
+            self.hits += 1
+            return entry[part]
+
+    def put(self, day: str, part: str, value: Any, token: Optional[int] = None):
+        with self._lock:
+            if token is not None and token != self._generation:
+                return   # между чтением и записью в кэш день могли изменить
+            self._days.setdefault(day, {})[part] = value
+            self._days.move_to_end(day)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+
+    def invalidate(self, day: Optional[str] = None):
+        """Сбросить снимок дня (или весь кэш, если day не указан)."""
+        with self._lock:
+            self._generation += 1
+            if day is None:
+                self._days.clear()
+            else:
+                self._days.pop(day, None)
+        for fn in self._listeners:
+            fn(day)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "days": len(self._days)}
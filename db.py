@@ -1,45 +1,91 @@
 
+import atexit
 import sqlite3
 from contextlib import closing
 from datetime import datetime
 
+import metrics
+import migrations
+from daycache import DayCache
+from roomboard import RoomBoard
+from writebehind import WriteBehind
+
 DB_PATH = "data.db"
 
-def init_db():
+# снимки агрегатов дня (stats); любая запись за дату сбрасывает её снимок
+rooms_cache = DayCache()
+
+# Нажатия кнопок (статус/тип/комментарий) пишутся отложенно: обновления одного
+# номера сливаются и уходят одной транзакцией раз в несколько миллисекунд.
+FLUSH_INTERVAL = 0.005
+FLUSH_MAX_OPS = 256
+
+@metrics.timed_fn("db")
+def _flush_updates(batch):
     with closing(sqlite3.connect(DB_PATH)) as con:
         cur = con.cursor()
-        cur.execute(
-            "CREATE TABLE IF NOT EXISTS rooms ("
-            "id INTEGER PRIMARY KEY AUTOINCREMENT,"
-            "work_date TEXT NOT NULL,"
-            "room_no TEXT NOT NULL,"
-            "maid TEXT,"
-            "maid_tg_id INTEGER,"
-            "cleaning_type TEXT CHECK(cleaning_type IN ('Полная','Текущая')) DEFAULT 'Текущая',"
-            "status TEXT CHECK(status IN ('Убрано','Не убрано')) DEFAULT 'Не убрано',"
-            "comment TEXT,"
-            "updated_by TEXT,"
-            "updated_at TEXT"
-            ");"
-        )
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_rooms_date ON rooms(work_date);")
-
-        cur.execute(
-            "CREATE TABLE IF NOT EXISTS users ("
-            "id INTEGER PRIMARY KEY AUTOINCREMENT,"
-            "tg_id INTEGER UNIQUE,"
-            "name TEXT,"
-            "role TEXT CHECK(role IN ('admin','maid','user')) DEFAULT 'user',"
-            "created_at TEXT"
-            ");"
-        )
-        cur.execute(
-            "CREATE TABLE IF NOT EXISTS settings ("
-            "key TEXT PRIMARY KEY,"
-            "value TEXT"
-            ");"
-        )
+        # одинаковый набор полей — один executemany
+        groups = {}
+        for room_id, fields in batch.items():
+            cols = tuple(sorted(fields))
+            groups.setdefault(cols, []).append(tuple(fields[c] for c in cols) + (room_id,))
+        for cols, params in groups.items():
+            cur.executemany("UPDATE rooms SET " + ", ".join(f"{c}=?" for c in cols) + " WHERE id=?",
+                            params)
+        ids = list(batch)
+        dates = set()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            cur.execute("SELECT DISTINCT work_date FROM rooms WHERE id IN (%s)" % ",".join("?" * len(chunk)),
+                        chunk)
+            dates.update(r[0] for r in cur.fetchall())
         con.commit()
+    metrics.inc("db_rows_written_total", len(batch), fn="flush_updates")
+    for work_date in dates:
+        rooms_cache.invalidate(work_date)
+
+updates = WriteBehind(_flush_updates, interval=FLUSH_INTERVAL, max_ops=FLUSH_MAX_OPS)
+atexit.register(updates.close)
+metrics.gauge("writebehind_queue_depth", updates.depth)
+
+def flush():
+    """Записать накопленные обновления немедленно."""
+    updates.flush()
+
+# порядок колонок в выборках rooms — для наложения ещё не записанных полей
+_ROOM_BOARD_COLS = ('id', 'room_no', 'maid', 'maid_tg_id', 'cleaning_type', 'status', 'comment', 'updated_by')
+_ROOM_FULL_COLS = ('id', 'work_date', 'room_no', 'maid', 'maid_tg_id', 'cleaning_type',
+                   'status', 'comment', 'updated_by')
+
+def _overlay(row, cols, pending):
+    # pending — незаписанные поля, снятые до SELECT (updates.snapshot/overlay)
+    if row is None:
+        return None
+    fields = pending.get(row[0])
+    if not fields:
+        return row
+    return tuple(fields.get(c, v) for c, v in zip(cols, row))
+
+@metrics.timed_fn("db")
+def _load_board(date_str):
+    # Незаписанные поля снимаются до SELECT: если сброс закоммитится между
+    # ними, SELECT уже увидит новые значения. Снятые после SELECT — могли бы
+    # опоздать: сброс успел очистить очередь, а SELECT прочёл старое.
+    pending = updates.snapshot()
+    with closing(sqlite3.connect(DB_PATH)) as con:
+        cur = con.cursor()
+        cur.execute("SELECT id, room_no, maid, maid_tg_id, cleaning_type, status, COALESCE(comment,''), updated_by "
+                    "FROM rooms WHERE work_date=? ORDER BY room_no;", (date_str,))
+        return [_overlay(r, _ROOM_BOARD_COLS, pending) for r in cur.fetchall()]
+
+# номера активных дней в памяти (roomboard.py): списки, «Мои номера» и
+# нажатия кнопок читают отсюда, запись идёт через write-behind
+board = RoomBoard(_load_board)
+metrics.gauge("room_board_rooms", board.size)
+
+def init_db():
+    with closing(sqlite3.connect(DB_PATH)) as con:
+        migrations.migrate(con, migrations.ROOMS_MIGRATIONS)
 
 def set_setting(key, value):
     with closing(sqlite3.connect(DB_PATH)) as con:
@@ -75,84 +121,154 @@ def get_user(tg_id):
         cur.execute("SELECT tg_id,name,role FROM users WHERE tg_id=?", (tg_id,))
         return cur.fetchone()
 
+@metrics.timed_fn("db")
 def add_plan_rows(rows):
+    flush()   # отложенные правки должны лечь раньше новой загрузки
     with closing(sqlite3.connect(DB_PATH)) as con:
         cur = con.cursor()
         for r in rows:
             cur.execute(
                 "INSERT INTO rooms (work_date, room_no, maid, maid_tg_id, cleaning_type, status, updated_at) "
-                "VALUES (?, ?, ?, ?, ?, 'Не убрано', ?)",
+                "VALUES (?, ?, ?, ?, ?, 'Не убрано', ?) "
+                "ON CONFLICT(work_date, room_no) DO UPDATE SET maid=excluded.maid, "
+                "maid_tg_id=excluded.maid_tg_id, cleaning_type=excluded.cleaning_type, "
+                "updated_at=excluded.updated_at",
                 (r['work_date'], r['room_no'], r.get('maid'), r.get('maid_tg_id'),
                  r.get('cleaning_type', 'Текущая'), datetime.utcnow().isoformat())
             )
         con.commit()
+    for work_date in {r['work_date'] for r in rows}:
+        rooms_cache.invalidate(work_date)
+        board.invalidate(work_date)
 
+@metrics.timed_fn("db")
 def get_rooms(date_str):
-    with closing(sqlite3.connect(DB_PATH)) as con:
-        cur = con.cursor()
-        cur.execute("SELECT id, room_no, maid, maid_tg_id, cleaning_type, status, COALESCE(comment,'') "
-                    "FROM rooms WHERE work_date=? ORDER BY room_no;", (date_str,))
-        return cur.fetchall()
+    return [room.row() for room in board.get(date_str).rooms]
 
+@metrics.timed_fn("db")
 def get_room(room_id):
+    found = board.find(room_id)
+    if found is not None:
+        day, room = found
+        return room.full_row(day)
+    # номер дня, которого нет на доске (старые карточки), — из БД;
+    # незаписанные поля — до SELECT, как в _load_board
+    pending = {room_id: updates.overlay(room_id)}
     with closing(sqlite3.connect(DB_PATH)) as con:
         cur = con.cursor()
         cur.execute("SELECT id, work_date, room_no, maid, maid_tg_id, cleaning_type, status, COALESCE(comment,''), updated_by "
                     "FROM rooms WHERE id=?", (room_id,))
-        return cur.fetchone()
+        return _overlay(cur.fetchone(), _ROOM_FULL_COLS, pending)
 
+@metrics.timed_fn("db")
 def get_rooms_for_maid(date_str, maid_name=None, maid_tg_id=None):
-    with closing(sqlite3.connect(DB_PATH)) as con:
-        cur = con.cursor()
-        if maid_tg_id:
-            cur.execute("SELECT id, room_no, maid, maid_tg_id, cleaning_type, status, COALESCE(comment,'') "
-                        "FROM rooms WHERE work_date=? AND maid_tg_id=? ORDER BY room_no;",
-                        (date_str, maid_tg_id))
-        else:
-            cur.execute("SELECT id, room_no, maid, maid_tg_id, cleaning_type, status, COALESCE(comment,'') "
-                        "FROM rooms WHERE work_date=? AND maid=? ORDER BY room_no;",
-                        (date_str, maid_name))
-        return cur.fetchall()
+    return [room.row() for room in board.get(date_str).for_maid(maid_name, maid_tg_id)]
+
+def _update(room_id, fields):
+    # сначала в очередь записи, потом на доску: загрузка доски между ними
+    # всё равно увидит поля через overlay
+    updates.put(room_id, fields)
+    board.update(room_id, fields)
 
 def set_status(room_id, status, user):
+    _update(room_id, {'status': status, 'updated_by': user,
+                      'updated_at': datetime.utcnow().isoformat()})
+
+def toggle_type(room_id):
+    room = get_room(room_id)
+    if not room:
+        return
+    new_type = 'Полная' if room[5] == 'Текущая' else 'Текущая'
+    _update(room_id, {'cleaning_type': new_type, 'updated_at': datetime.utcnow().isoformat()})
+    return new_type
+
+def set_comment(room_id, comment, user):
+    _update(room_id, {'comment': comment, 'updated_by': user,
+                      'updated_at': datetime.utcnow().isoformat()})
+
+@metrics.timed_fn("db")
+def clear_date(date_str):
+    flush()
     with closing(sqlite3.connect(DB_PATH)) as con:
         cur = con.cursor()
-        cur.execute("UPDATE rooms SET status=?, updated_by=?, updated_at=? WHERE id=?",
-                    (status, user, datetime.utcnow().isoformat(), room_id))
+        cur.execute("DELETE FROM rooms WHERE work_date=?", (date_str,))
         con.commit()
+    rooms_cache.invalidate(date_str)
+    board.invalidate(date_str)
 
-def toggle_type(room_id):
+@metrics.timed_fn("db")
+def stats(date_str):
+    cached = rooms_cache.get(date_str, "stats")
+    if cached is not None:
+        return dict(cached)
+    token = rooms_cache.token()
+    # счётчики room_stats ведут триггеры (migrations.py) — пересчёт строк не нужен
     with closing(sqlite3.connect(DB_PATH)) as con:
         cur = con.cursor()
-        cur.execute("SELECT cleaning_type FROM rooms WHERE id=?", (room_id,))
-        row = cur.fetchone()
-        if not row:
-            return
-        new_type = 'Полная' if row[0] == 'Текущая' else 'Текущая'
-        cur.execute("UPDATE rooms SET cleaning_type=?, updated_at=? WHERE id=?",
-                    (new_type, datetime.utcnow().isoformat(), room_id))
-        con.commit()
-        return new_type
+        cur.execute("SELECT COALESCE(SUM(total),0), COALESCE(SUM(cleaned),0), "
+                    "COALESCE(SUM(CASE WHEN cleaning_type='Полная' THEN total END),0), "
+                    "COALESCE(SUM(CASE WHEN cleaning_type='Полная' THEN cleaned END),0) "
+                    "FROM room_stats WHERE work_date=?", (date_str,))
+        total, cleaned, full_total, full_cleaned = cur.fetchone()
+    result = {'total': total, 'cleaned': cleaned, 'remaining': total - cleaned,
+              'full_total': full_total, 'full_cleaned': full_cleaned}
+    rooms_cache.put(date_str, "stats", dict(result), token)
+    return result
 
-def set_comment(room_id, comment, user):
+@metrics.timed_fn("db")
+def maid_stats(date_str):
     with closing(sqlite3.connect(DB_PATH)) as con:
         cur = con.cursor()
-        cur.execute("UPDATE rooms SET comment=?, updated_by=?, updated_at=? WHERE id=?",
-                    (comment, user, datetime.utcnow().isoformat(), room_id))
-        con.commit()
+        cur.execute("SELECT maid, SUM(total), SUM(cleaned) FROM room_stats "
+                    "WHERE work_date=? GROUP BY maid ORDER BY maid;", (date_str,))
+        return cur.fetchall()
 
-def clear_date(date_str):
+@metrics.timed_fn("db")
+def search_comments(text, date_from="0000-00-00", date_to="9999-12-31", limit=10, offset=0):
+    """Поиск по комментариям rooms (rooms_fts): (всего, [(id, work_date, room_no, maid, comment)])."""
+    query = migrations.fts_query(text)
+    if query is None:
+        return 0, []
+    flush()   # отложенные комментарии тоже должны находиться
     with closing(sqlite3.connect(DB_PATH)) as con:
         cur = con.cursor()
-        cur.execute("DELETE FROM rooms WHERE work_date=?", (date_str,))
-        con.commit()
+        cur.execute("SELECT COUNT(*) FROM rooms_fts JOIN rooms r ON r.id=rooms_fts.rowid "
+                    "WHERE rooms_fts MATCH ? AND r.work_date BETWEEN ? AND ?", (query, date_from, date_to))
+        total = cur.fetchone()[0]
+        cur.execute("SELECT r.id, r.work_date, r.room_no, r.maid, r.comment "
+                    "FROM rooms_fts JOIN rooms r ON r.id=rooms_fts.rowid "
+                    "WHERE rooms_fts MATCH ? AND r.work_date BETWEEN ? AND ? "
+                    "ORDER BY rank, r.work_date DESC LIMIT ? OFFSET ?", (query, date_from, date_to, limit, offset))
+        return total, cur.fetchall()
 
-def stats(date_str):
-    rooms = get_rooms(date_str)
-    total = len(rooms)
-    cleaned = sum(1 for r in rooms if r[5] == 'Убрано')
-    remaining = total - cleaned
-    full_total = sum(1 for r in rooms if r[4] == 'Полная')
-    full_cleaned = sum(1 for r in rooms if r[4] == 'Полная' and r[5] == 'Убрано')
-    return {'total': total, 'cleaned': cleaned, 'remaining': remaining,
-            'full_total': full_total, 'full_cleaned': full_cleaned}
+@metrics.timed_fn("db")
+def check_stats(repair=False):
+    """Сверить room_stats с rooms; при repair=True пересобрать счётчики."""
+    with closing(sqlite3.connect(DB_PATH)) as con:
+        cur = con.cursor()
+        cur.execute(
+            "SELECT work_date, maid, cleaning_type, SUM(lt), SUM(lc), SUM(ct), SUM(cc) FROM ("
+            " SELECT work_date, COALESCE(maid,'') maid, COALESCE(cleaning_type,'') cleaning_type,"
+            " COUNT(*) lt, SUM(status='Убрано') lc, 0 ct, 0 cc FROM rooms"
+            " GROUP BY work_date, COALESCE(maid,''), COALESCE(cleaning_type,'')"
+            " UNION ALL"
+            " SELECT work_date, maid, cleaning_type, 0, 0, total, cleaned FROM room_stats"
+            ") GROUP BY work_date, maid, cleaning_type HAVING SUM(lt)!=SUM(ct) OR SUM(lc)!=SUM(cc);"
+        )
+        mismatches = cur.fetchall()
+        if mismatches and repair:
+            cur.execute("DELETE FROM room_stats")
+            cur.execute(migrations.ROOM_STATS_REBUILD)
+            con.commit()
+            rooms_cache.invalidate()
+        return mismatches
+
+if __name__ == "__main__":
+    # python db.py check-stats [--fix]
+    import sys
+    if sys.argv[1:2] == ["check-stats"]:
+        init_db()
+        bad = check_stats(repair="--fix" in sys.argv)
+        for row in bad:
+            print(*row)
+        print(f"mismatches: {len(bad)}" + (" (rebuilt)" if bad and "--fix" in sys.argv else ""))
@@ -0,0 +1,133 @@
+import csv
+import gzip
+import io
+import os
+from datetime import date
+from typing import Iterable, List, Tuple
+
+import storage
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Потоковая выгрузка плана за диапазон дат
+#
+# Строки идут курсором из БД прямо в CSV-писатель или write-only книгу
+# openpyxl поверх временного файла — весь год в памяти не собирается.
+# Функции build_* синхронные и запускаются в отдельном потоке (см. main.py).
+# Если файл выходит больше лимита Telegram на документ, он режется на части.
+# ───────────────────────────────────────────────────────────────────────────────
+HEADER = ["Дата", "№ Номера", "Горничная", "Тип", "Статус", "Комментарий"]
+
+TELEGRAM_FILE_LIMIT = 50 * 1024 * 1024
+PART_LIMIT = TELEGRAM_FILE_LIMIT - 2 * 1024 * 1024   # запас на буферы gzip/zip
+XLSX_ROWS_PER_PART = 250_000   # размер xlsx заранее не известен — режем по строкам
+
+
+class RangeError(ValueError):
+    pass
+
+
+def parse_range(args: List[str], today: str) -> Tuple[str, str, List[str]]:
+    """
+    /export_csv                         → сегодня
+    /export_csv 2026-01-05              → один день
+    /export_csv 2026-01-01 2026-01-31   → диапазон (включительно)
+    Нераспознанные аргументы (например, gz) возвращаются как флаги.
+    """
+    days, flags = [], []
+    for a in args:
+        try:
+            days.append(date.fromisoformat(a).isoformat())
+        except ValueError:
+            flags.append(a.lower())
+    if len(days) > 2:
+        raise RangeError("Укажите не больше двух дат: YYYY-MM-DD [YYYY-MM-DD].")
+    if not days:
+        days = [today]
+    d_from, d_to = min(days), max(days)
+    return d_from, d_to, flags
+
+
+def _row(r) -> list:
+    return [r["day"], r["room_no"], r["maid"], r["ctype"], r["status"], r["comment"]]
+
+
+def _part_path(out_dir: str, base: str, part: int, ext: str) -> str:
+    suffix = f"_part{part}" if part > 1 else ""
+    return os.path.join(out_dir, f"{base}{suffix}{ext}")
+
+
+def build_csv(rows: Iterable, out_dir: str, base: str, compress: bool = False,
+              limit: int = PART_LIMIT) -> List[str]:
+    """Записать строки в CSV (опционально .csv.gz), разбивая по размеру. Возвращает пути."""
+    ext = ".csv.gz" if compress else ".csv"
+    paths: List[str] = []
+    raw = gz = text = writer = None
+
+    def open_part():
+        nonlocal raw, gz, text, writer
+        paths.append(_part_path(out_dir, base, len(paths) + 1, ext))
+        raw = open(paths[-1], "wb")
+        gz = gzip.GzipFile(fileobj=raw, mode="wb") if compress else None
+        text = io.TextIOWrapper(gz or raw, encoding="utf-8", newline="")
+        writer = csv.writer(text)
+        writer.writerow(HEADER)
+
+    def close_part():
+        text.close()   # закрывает и gzip, и сам файл
+        if gz is not None:
+            raw.close()
+
+    open_part()
+    for r in rows:
+        writer.writerow(_row(r))
+        # raw.tell() — уже записанные на диск байты (для gzip — сжатые)
+        if raw.tell() >= limit:
+            close_part()
+            open_part()
+    close_part()
+    return paths
+
+
+def build_xlsx(rows: Iterable, out_dir: str, base: str,
+               rows_per_part: int = XLSX_ROWS_PER_PART) -> List[str]:
+    """Записать строки в write-only книги по rows_per_part строк. Возвращает пути."""
+    from openpyxl import Workbook
+
+    paths: List[str] = []
+    wb = ws = None
+    count = 0
+
+    def open_part():
+        nonlocal wb, ws, count
+        paths.append(_part_path(out_dir, base, len(paths) + 1, ".xlsx"))
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Уборка")
+        ws.append(HEADER)
+        count = 0
+
+    open_part()
+    for r in rows:
+        if count >= rows_per_part:
+            wb.save(paths[-1])
+            open_part()
+        ws.append(_row(r))
+        count += 1
+    wb.save(paths[-1])
+    return paths
+
+
+def export_range(kind: str, d_from: str, d_to: str, out_dir: str,
+                 compress: bool = False, shard: str = storage.DEFAULT_SHARD) -> List[str]:
+    """Выгрузить план шарда за диапазон в out_dir; kind — 'csv' или 'xlsx'."""
+    base = f"cleaning_{d_from}" if d_from == d_to else f"cleaning_{d_from}_{d_to}"
+    if kind == "csv":
+        return build_csv(storage.iter_range(d_from, d_to, shard=shard), out_dir, base, compress=compress)
+    rows_per_part = XLSX_ROWS_PER_PART
+    while True:
+        paths = build_xlsx(storage.iter_range(d_from, d_to, shard=shard), out_dir, base, rows_per_part)
+        if all(os.path.getsize(p) <= TELEGRAM_FILE_LIMIT for p in paths) or rows_per_part < 1000:
+            return paths
+        # очень длинные комментарии — части всё равно великоваты, режем мельче
+        for p in paths:
+            os.remove(p)
+        rows_per_part //= 2
@@ -1,40 +1,108 @@
+import time
+_T0 = time.perf_counter()   # начало импорта main — отсчёт для разбивки старта
+
 import os
 import io
-import csv
-import re
-import sqlite3
+import asyncio
+import tempfile
 from datetime import datetime, timedelta, time as dtime
-from typing import List, Tuple, Optional
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
 
 import pytz
 from dotenv import load_dotenv
-from openpyxl import Workbook
 
-from telegram import Update, InputFile
+load_dotenv()
+
+import metrics
+import scheduler
+import storage
+from chatqueue import ChatOrderedProcessor
+from dashboard import Dashboards
+from outbox import Outbox
+
+# export (и openpyxl) и plan_import импортируются в обработчиках — при первом использовании
+from telegram import Update, InputFile, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.request import HTTPXRequest
 from telegram.ext import (
     ApplicationBuilder,
+    CallbackQueryHandler,
     CommandHandler,
     MessageHandler,
+    TypeHandler,
     ContextTypes,
     filters,
 )
 
 # ───────────────────────────────────────────────────────────────────────────────
-# Конфиг из окружения
+# Разбивка времени старта: этапы от импорта main до прогретой базы
+# ───────────────────────────────────────────────────────────────────────────────
+STARTUP: List[Tuple[str, float]] = []   # (этап, секунд с предыдущей отметки)
+_startup_last = _T0
+
+def startup_mark(phase: str):
+    global _startup_last
+    if any(p == phase for p, _ in STARTUP):
+        return   # только первый старт процесса (замеры пересобирают приложение)
+    now = time.perf_counter()
+    STARTUP.append((phase, now - _startup_last))
+    metrics.observe("startup", now - _startup_last, phase=phase)
+    _startup_last = now
+
+def startup_report() -> str:
+    total = sum(sec for _, sec in STARTUP)
+    return " · ".join(f"{phase} {sec * 1000:.0f}ms" for phase, sec in STARTUP) + f" = {total * 1000:.0f}ms"
+
+startup_mark("imports")
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Конфиг из окружения (.env уже загружен выше)
 # ───────────────────────────────────────────────────────────────────────────────
-load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN", "").strip()
 TIMEZONE = os.getenv("TIMEZONE", "Asia/Tashkent").strip() or "Asia/Tashkent"
 REPORT_CHAT_ID = int(os.getenv("REPORT_CHAT_ID", "0") or 0)
+# дополнительные чаты для автоотчёта (супервайзеры, другие объекты) через запятую
+REPORT_CHAT_IDS = [REPORT_CHAT_ID] * bool(REPORT_CHAT_ID) + [
+    int(x) for x in os.getenv("REPORT_CHAT_IDS", "").split(",") if x.strip().lstrip("-").isdigit()
+]
 REPORT_TIME = os.getenv("REPORT_TIME", "18:00").strip() or "18:00"
 AUTOCARRYOVER = os.getenv("AUTOCARRYOVER", "true").lower() == "true"
 ADMIN_IDS = [int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip().isdigit()]
+# Prometheus: файл для textfile-коллектора и/или локальный HTTP-порт (оба необязательны)
+METRICS_FILE = os.getenv("METRICS_FILE", "").strip()
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+METRICS_INTERVAL = 15   # секунд между записями METRICS_FILE
+# Webhook: если задан WEBHOOK_URL (публичный https-адрес, путь в нём — путь
+# эндпоинта), бот слушает локальный HTTP вместо long polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").strip()
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1").strip() or "127.0.0.1"
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080") or 8080)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "").strip() or None
+# сколько апдейтов разных чатов обрабатывается одновременно (1 — по одному)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "16") or 16)
+DRAIN_TIMEOUT = 30   # секунд на завершение начатых апдейтов при остановке
+# дни старше стольких дней уезжают в архив (0 — не архивировать)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90") or 0)
+
+@lru_cache(maxsize=None)
+def _zone(name: str) -> pytz.BaseTzInfo:
+    try:
+        return pytz.timezone(name)
+    except Exception:
+        return pytz.timezone("Asia/Tashkent")
 
 def tz() -> pytz.BaseTzInfo:
+    # таймзона разбирается один раз на значение TIMEZONE
+    return _zone(TIMEZONE)
+
+@lru_cache(maxsize=32)   # сюда попадает и ввод /report_time — кэш ограничен
+def parse_hhmm(value: str, default: Tuple[int, int] = (18, 0)) -> Tuple[int, int]:
     try:
-        return pytz.timezone(TIMEZONE)
+        hh, mm = [int(x) for x in value.split(":")]
+        return hh, mm
     except Exception:
-        return pytz.timezone("Asia/Tashkent")
+        return default
 
 def now_local() -> datetime:
     return datetime.now(tz())
@@ -43,126 +111,9 @@ def day_str(dt: Optional[datetime] = None) -> str:
     return (dt or now_local()).strftime("%Y-%m-%d")
 
 # ───────────────────────────────────────────────────────────────────────────────
-# БД (SQLite)
+# БД (SQLite) — см. storage.py. При импорте не открывается: хранилище
+# поднимается при первом обращении, а прогрев идёт после старта (warm_up_job).
 # ───────────────────────────────────────────────────────────────────────────────
-DB_PATH = "asal.db"
-
-def db() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    conn = db()
-    with conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS plan (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                day TEXT NOT NULL,
-                room_no INTEGER NOT NULL,
-                maid TEXT NOT NULL,
-                ctype TEXT NOT NULL,     -- Полная / Текущая
-                status TEXT NOT NULL DEFAULT 'Назначено', -- Назначено/В процессе/Готово/Не убрано
-                comment TEXT
-            )
-        """)
-    conn.close()
-
-init_db()
-
-# ───────────────────────────────────────────────────────────────────────────────
-# Утилиты БД
-# ───────────────────────────────────────────────────────────────────────────────
-def clear_day(day: str):
-    conn = db()
-    with conn:
-        conn.execute("DELETE FROM plan WHERE day=?", (day,))
-    conn.close()
-
-def insert_rows(day: str, rows: List[Tuple[int, str, str]]):
-    conn = db()
-    with conn:
-        conn.executemany(
-            "INSERT INTO plan(day, room_no, maid, ctype) VALUES (?,?,?,?)",
-            [(day, int(r), m, c) for r, m, c in rows],
-        )
-    conn.close()
-
-def get_rooms(day: str):
-    conn = db()
-    cur = conn.execute(
-        "SELECT room_no, maid, ctype, status, COALESCE(comment,'') comment "
-        "FROM plan WHERE day=? ORDER BY room_no", (day,)
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def get_stats(day: str):
-    conn = db()
-    cur = conn.execute(
-        "SELECT "
-        "COUNT(*) as total, "
-        "SUM(CASE WHEN status='Готово' THEN 1 ELSE 0 END) as done, "
-        "SUM(CASE WHEN status!='Готово' THEN 1 ELSE 0 END) as left "
-        "FROM plan WHERE day=?", (day,)
-    )
-    row = cur.fetchone()
-    conn.close()
-    total = row["total"] or 0
-    done = row["done"] or 0
-    left = row["left"] or 0
-    return total, done, left
-
-# ───────────────────────────────────────────────────────────────────────────────
-# Парсер CSV — «железобетонный»
-# ───────────────────────────────────────────────────────────────────────────────
-def _decode_bytes(b: bytes) -> str:
-    # 1) UTF-8 (включая BOM)
-    try:
-        return b.decode("utf-8-sig")
-    except UnicodeDecodeError:
-        pass
-    # 2) Windows-1251
-    try:
-        return b.decode("cp1251")
-    except UnicodeDecodeError:
-        # 3) На край — игнор битых символов
-        return b.decode("utf-8", errors="ignore")
-
-def parse_plan_csv_bytes(b: bytes) -> List[Tuple[int, str, str]]:
-    """
-    Возвращает список кортежей: (room_no, maid, ctype)
-    Поддерживает:
-    - кодировки: utf-8/utf-8-sig/cp1251
-    - разделители: запятая или точка с запятой
-    - наличие/отсутствие заголовка
-    - пробелы вокруг значений
-    """
-    txt = _decode_bytes(b)
-    rows: List[Tuple[int, str, str]] = []
-
-    for raw in txt.splitlines():
-        line = raw.strip()
-        if not line:
-            continue
-        parts = re.split(r"[;,]", line)
-        parts = [p.strip() for p in parts if p.strip() != ""]
-        if len(parts) < 3:
-            # возможно это заголовок или мусор
-            continue
-        room, maid, ctype = parts[0], parts[1], parts[2]
-        # пропустим строку, если это заголовок
-        if not room.isdigit():
-            # допускаем, что это строка заголовка — просто скипаем
-            continue
-        try:
-            rno = int(room)
-        except ValueError:
-            continue
-        rows.append((rno, maid, ctype))
-    return rows
 
 # ───────────────────────────────────────────────────────────────────────────────
 # Команды
@@ -170,11 +121,21 @@ def parse_plan_csv_bytes(b: bytes) -> List[Tuple[int, str, str]]:
 HELP_TEXT = (
     "Привет! Я бот учёта уборок.\n\n"
     "Доступные команды:\n"
-    "/upload_plan — загрузить план (CSV)\n"
-    "/report — отчёт за сегодня\n"
-    "/export_csv — выгрузить план в CSV\n"
-    "/export_xlsx — выгрузить план в XLSX\n"
-    "/clear_today — очистить сегодняшний план (админ)\n\n"
+    "/upload_plan — загрузить план (CSV или XLSX); `/upload_plan reset` — с нуля\n"
+    "/report — отчёт за сегодня; `/report all` — по всем объектам (админ)\n"
+    "/dashboard — живая сводка, закреплённая в чате (`off` — выключить, админ)\n"
+    "/export_csv [с] [по] [gz] — выгрузить план в CSV (даты YYYY-MM-DD)\n"
+    "/export_xlsx [с] [по] — выгрузить план в XLSX\n"
+    "/clear_today — очистить сегодняшний план (админ)\n"
+    "/carryover — перенести неубранные номера со вчера (админ)\n"
+    "/property [имя] — объект (отель) этого чата: у каждого свой план (админ)\n"
+    "/stats [с] [по] [горничная] — выработка горничных за период, по умолчанию 30 дней (админ)\n"
+    "/find <текст> [с] [по] — поиск по комментариям к номерам (админ)\n"
+    "/check_stats — сверить счётчики статистики с планом (админ)\n"
+    "/report_time [ЧЧ:ММ|off] — время автоотчёта в этом чате (админ)\n"
+    "/set_tz <TZ> — часовой пояс автоотчёта этого чата, например Asia/Tashkent (админ)\n"
+    "/archive — архив старых дней: `now` — перенести сейчас, `vacuum` — сжать файл (админ)\n"
+    "/metrics — время обработчиков, запросов к БД и Telegram, очереди (админ)\n\n"
     "Формат CSV (без заголовков):\n"
     "`101,Севара,Полная`\n"
     "`102,Гульноз,Текущая`\n"
@@ -190,87 +151,272 @@ async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 def _is_admin(user_id: int) -> bool:
     return user_id in ADMIN_IDS or (REPORT_CHAT_ID != 0 and user_id == REPORT_CHAT_ID)
 
+def _shard(update: Update) -> str:
+    # объект (отель), к которому привязан чат — см. /property
+    return storage.shard_for(update.effective_chat.id)
+
 async def clear_today(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not _is_admin(update.effective_user.id):
         await update.message.reply_text("Только админы могут очищать план.")
         return
     d = day_str()
-    clear_day(d)
+    await storage.clear_day(d, shard=_shard(update))
     await update.message.reply_text(f"План на {d} очищен.")
 
 async def report(update: Update, context: ContextTypes.DEFAULT_TYPE):
     d = day_str()
-    total, done, left = get_stats(d)
-    rows = get_rooms(d)
+    if context.args and context.args[0].lower() == "all" and _is_admin(update.effective_user.id):
+        await report_all(update, d)
+        return
+    shard = _shard(update)
+    total, done, left = await storage.get_stats(d, shard=shard)
+    by_maid = await storage.get_maid_counts(d, shard=shard)
     lines = [f"🧹 Отчёт за {d}\nВсего: {total} | Готово: {done} | Осталось: {left}", ""]
+    for maid, count, _ in by_maid:
+        lines.append(f"— {maid}: {count} номеров")
+    await update.message.reply_text("\n".join(lines))
+
+async def report_all(update: Update, d: str):
+    # сводка по всем объектам: шарды читаются параллельно
+    per_shard = await storage.get_stats_all(d)
+    lines = [f"🏨 Все объекты за {d}", ""]
+    grand = [0, 0, 0]
+    for shard, (total, done, left) in per_shard:
+        lines.append(f"— {storage.shard_title(shard)}: всего {total} | готово {done} | осталось {left}")
+        grand = [grand[0] + total, grand[1] + done, grand[2] + left]
+    lines.append(f"\nИтого: {grand[0]} | Готово: {grand[1]} | Осталось: {grand[2]}")
+    await update.message.reply_text("\n".join(lines))
+
+STATS_DEFAULT_DAYS = 30   # /stats без дат — последние 30 дней
+
+def _pct(done: int, total: int) -> str:
+    return f"{100 * done // total}%" if total else "—"
+
+def _split(rows) -> Tuple[int, int, int, int, int]:
+    # строки (ключ, тип, дней, номеров, готово) одного ключа → всего, готово, полных, текущих, дней
+    # (дни считает SQL на весь ключ — во всех строках одинаковые)
+    total = sum(r[3] for r in rows)
+    done = sum(r[4] for r in rows)
+    full = sum(r[3] for r in rows if r[1] == "Полная")
+    return total, done, full, total - full, rows[0][2]
+
+async def stats_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("Только админы могут смотреть выработку.")
+        return
+    args = context.args or []
+    import export
+    try:
+        d_from, d_to, words = export.parse_range(args, day_str())
+    except export.RangeError as e:
+        await update.message.reply_text(str(e))
+        return
+    if len(words) == len(args):
+        d_from, d_to = day_str(now_local() - timedelta(days=STATS_DEFAULT_DAYS - 1)), day_str()
+    shard = _shard(update)
+    rows = await storage.range_stats(d_from, d_to, shard=shard)
+    if not rows:
+        await update.message.reply_text(f"За {d_from} — {d_to} плана нет.")
+        return
     by_maid = {}
     for r in rows:
-        by_maid.setdefault(r["maid"], []).append(r)
-    for maid, lst in sorted(by_maid.items()):
-        lines.append(f"— {maid}: {len(lst)} номеров")
+        by_maid.setdefault(r[0], []).append(r)
+    maid_q = " ".join(a for a in args if a.lower() in words)
+    if maid_q:
+        maid = next((m for m in by_maid if m.casefold() == maid_q.casefold()), None)
+        if maid is None:
+            await update.message.reply_text(
+                f"Горничная «{maid_q}» за {d_from} — {d_to} не найдена.\nЕсть: {', '.join(by_maid)}")
+            return
+        weeks = {}
+        for r in await storage.range_stats(d_from, d_to, maid, shard=shard):
+            weeks.setdefault(r[0], []).append(r)
+        total, done, full, cur, _ = _split(by_maid[maid])
+        lines = [f"📊 {maid}, {d_from} — {d_to}",
+                 f"Номеров: {total} (полных {full}, текущих {cur}), готово {_pct(done, total)}", ""]
+        for week, wr in weeks.items():
+            total, done, full, cur, days = _split(wr)
+            lines.append(f"нед. с {week}: {total} (П {full} / Т {cur}) за {days} дн., "
+                         f"готово {_pct(done, total)}")
+    else:
+        grand = _split(rows)
+        lines = [f"📊 Выработка {d_from} — {d_to}",
+                 f"Номеров: {grand[0]} (полных {grand[2]}, текущих {grand[3]}), "
+                 f"готово {_pct(grand[1], grand[0])}", ""]
+        for maid, mr in by_maid.items():
+            total, done, full, cur, days = _split(mr)
+            lines.append(f"— {maid}: {total} (П {full} / Т {cur}), готово {_pct(done, total)}, "
+                         f"~{total / days:.0f} в день за {days} дн.")
+        lines.append("\n/stats <с> <по> <горничная> — по неделям.")
+    await update.message.reply_text("\n".join(lines)[:4096])
+
+FIND_PAGE_SIZE = 10
+FIND_SNIPPET = 160   # символов комментария в выдаче
+
+async def _find_page(query: dict, offset: int) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    total, rows = await storage.find_comments(query["text"], query["from"], query["to"],
+                                              FIND_PAGE_SIZE, offset, shard=query["shard"])
+    if not total:
+        return f"По «{query['text']}» ничего не нашёл.", None
+    if not rows:   # совпадений стало меньше, чем было на момент кнопки
+        return await _find_page(query, (min(total, storage.FIND_WINDOW) - 1) // FIND_PAGE_SIZE * FIND_PAGE_SIZE)
+    found = f"больше {storage.FIND_WINDOW}, показаны свежие" if total > storage.FIND_WINDOW else total
+    lines = [f"🔎 «{query['text']}»: {found} совп., {offset + 1}–{offset + len(rows)}", ""]
+    for r in rows:
+        lines.append(f"{r['day']} · №{r['room_no']} · {r['maid']}\n   {r['comment'][:FIND_SNIPPET]}")
+    buttons = []
+    if offset > 0:
+        buttons.append(InlineKeyboardButton("◀ Назад", callback_data=f"find:{max(offset - FIND_PAGE_SIZE, 0)}"))
+    if offset + len(rows) < min(total, storage.FIND_WINDOW):
+        buttons.append(InlineKeyboardButton("Дальше ▶", callback_data=f"find:{offset + FIND_PAGE_SIZE}"))
+    return "\n".join(lines)[:4096], InlineKeyboardMarkup([buttons]) if buttons else None
+
+async def find_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("Только админы могут искать по комментариям.")
+        return
+    args = context.args or []
+    import export
+    try:
+        d_from, d_to, words = export.parse_range(args, day_str())
+    except export.RangeError as e:
+        await update.message.reply_text(str(e))
+        return
+    if len(words) == len(args):   # без дат — вся история
+        d_from, d_to = "0000-00-00", "9999-12-31"
+    text = " ".join(a for a in args if a.lower() in words)
+    if not text:
+        await update.message.reply_text("Использование: /find <текст> [с] [по], например /find чайник 2026-01-01")
+        return
+    # запрос помним в чате — кнопки листают его страницы
+    query = context.chat_data["find"] = {"text": text, "from": d_from, "to": d_to, "shard": _shard(update)}
+    page, markup = await _find_page(query, 0)
+    await update.message.reply_text(page, reply_markup=markup)
+
+async def find_page_cb(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    cq = update.callback_query
+    query = context.chat_data.get("find")
+    if query is None:
+        await cq.answer("Поиск устарел — повторите /find.")
+        return
+    await cq.answer()
+    page, markup = await _find_page(query, int(cq.data.split(":", 1)[1]))
+    await cq.edit_message_text(page, reply_markup=markup)
+
+async def check_stats_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("Только админы могут проверять счётчики.")
+        return
+    repair = bool(context.args) and context.args[0].lower() == "fix"
+    bad = await storage.check_stats(repair=repair, shard=_shard(update))
+    if not bad:
+        await update.message.reply_text("Счётчики статистики сходятся с планом ✅")
+        return
+    lines = [f"Расхождений: {len(bad)}" + (" — счётчики пересобраны ✅" if repair else "")]
+    for r in bad[:10]:
+        lines.append(f"{r['day']} {r['maid']} {r['ctype']}: "
+                     f"план {r['live_total']}/{r['live_done']}, счётчик {r['total']}/{r['done']}")
+    if not repair:
+        lines.append("\n/check_stats fix — пересобрать счётчики.")
     await update.message.reply_text("\n".join(lines))
 
+async def _export(update: Update, context: ContextTypes.DEFAULT_TYPE, kind: str):
+    import export
+    try:
+        d_from, d_to, flags = export.parse_range(context.args or [], day_str())
+    except export.RangeError as e:
+        await update.message.reply_text(str(e))
+        return
+    compress = kind == "csv" and "gz" in flags
+    with tempfile.TemporaryDirectory() as tmp:
+        # выборка и запись файла — в отдельном потоке, event loop свободен
+        with metrics.timed("export", kind=kind):
+            paths = await asyncio.to_thread(export.export_range, kind, d_from, d_to, tmp, compress,
+                                            _shard(update))
+        for path in paths:
+            with open(path, "rb") as fh:
+                await update.message.reply_document(
+                    document=InputFile(fh, filename=os.path.basename(path))
+                )
+
 async def export_csv(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    d = day_str()
-    rows = get_rooms(d)
-    buff = io.StringIO()
-    w = csv.writer(buff)
-    # заголовок — можно убрать, если не нужно
-    w.writerow(["Дата", "№ Номера", "Горничная", "Тип", "Статус", "Комментарий"])
-    for r in rows:
-        w.writerow([d, r["room_no"], r["maid"], r["ctype"], r["status"], r["comment"]])
-    buff.seek(0)
-    await update.message.reply_document(
-        document=InputFile(io.BytesIO(buff.getvalue().encode("utf-8")), filename=f"cleaning_{d}.csv")
-    )
+    await _export(update, context, "csv")
 
 async def export_xlsx(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    d = day_str()
-    rows = get_rooms(d)
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Уборка"
-    ws.append(["Дата", "№ Номера", "Горничная", "Тип", "Статус", "Комментарий"])
-    for r in rows:
-        ws.append([d, r["room_no"], r["maid"], r["ctype"], r["status"], r["comment"]])
-
-    bio = io.BytesIO()
-    wb.save(bio)
-    bio.seek(0)
-    await update.message.reply_document(
-        document=InputFile(bio, filename=f"cleaning_{d}.xlsx")
-    )
+    await _export(update, context, "xlsx")
 
 # ───────────────────────────────────────────────────────────────────────────────
 # Загрузка плана
 # ───────────────────────────────────────────────────────────────────────────────
 UPLOAD_PROMPT = (
-    "Пришлите CSV-файл плана.\n"
+    "Пришлите CSV- или XLSX-файл плана.\n"
     "Формат строк: `room_no,maid,cleaning_type` (например: `101,Севара,Полная`).\n"
     "Допускаются кодировки UTF-8 / UTF-8-BOM / cp1251, разделители `,` или `;`.\n"
+    "В XLSX лист с датой в названии (`2026-01-05`) — план этого дня, остальные листы — на сегодня.\n"
+    "Повторная загрузка обновляет только изменённые номера — статусы и комментарии "
+    "остальных сохраняются. `/upload_plan reset` — залить план заново с нуля.\n"
 )
 
+UPLOAD_SPOOL_SIZE = 1024 * 1024
+
 async def upload_plan_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["await_csv"] = True
+    context.user_data["upload_reset"] = bool(context.args) and context.args[0].lower() == "reset"
     await update.message.reply_text(UPLOAD_PROMPT, parse_mode="Markdown")
 
 async def document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # принимаем файл либо после /upload_plan, либо если это CSV
+    # принимаем файл либо после /upload_plan, либо если это CSV/XLSX
     doc = update.message.document
     if not doc:
         return
 
     filename = (doc.file_name or "").lower()
     expecting = context.user_data.get("await_csv", False)
-    if not expecting and not filename.endswith(".csv"):
+    if not expecting and not filename.endswith((".csv", ".xlsx")):
         return
+    from plan_import import PlanReader, XlsxPlanReader, MAX_REJECTS, is_xlsx
 
+    # файл качаем во временный (в памяти до 1 МБ, дальше — на диск) и читаем потоково
     f = await doc.get_file()
-    b = await f.download_as_bytearray()
-    rows = parse_plan_csv_bytes(bytes(b))
-
-    if not rows:
-        preview = _decode_bytes(bytes(b))[:160].replace("\n", "\\n")
+    buf = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+    reader = None
+    try:
+        await f.download_to_memory(out=buf)
+        buf.seek(0)
+        xlsx = is_xlsx(filename, buf.read(4))
+        buf.seek(0)
+        try:
+            # книгу открываем вне event loop; строки разбираются на потоке хранилища
+            reader = await asyncio.to_thread(XlsxPlanReader, buf) if xlsx else PlanReader(buf)
+        except Exception as e:
+            await update.message.reply_text(f"Не удалось открыть XLSX: {e}")
+            return
+        d = day_str()
+        shard = _shard(update)
+        reset = context.user_data.get("upload_reset", False)
+        results = []   # (день, загружено, (добавлено, изменено, удалено) | None)
+        for day, rows in reader.plans(d):
+            with metrics.timed("plan_import", kind="xlsx" if xlsx else "csv"):
+                if reset:
+                    loaded, changes = await storage.replace_day(day, rows, shard=shard), None
+                else:
+                    loaded, *changes = await storage.sync_day(day, rows, shard=shard)
+            if loaded:
+                results.append((day, loaded, changes))
+    finally:
+        if isinstance(reader, XlsxPlanReader):
+            reader.close()
+        buf.close()
+
+    if not results:
+        preview = reader.preview.replace("\n", "\\n")
+        if xlsx:
+            await update.message.reply_text(
+                "В XLSX не нашёл строк.\n"
+                "Нужны колонки: номер, горничная, тип уборки (заголовок можно не делать).\n"
+                f"Найдены {preview}"
+            )
+            return
         await update.message.reply_text(
             "В CSV не нашёл строк.\n"
             "Проверьте: разделители (`,` или `;`), кодировку (UTF-8/UTF-8-BOM/cp1251), "
@@ -280,48 +426,308 @@ async def document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    d = day_str()
-    # Если включён автоперенос — очищаем сегодняшний план и заливаем заново
-    clear_day(d)
-    insert_rows(d, rows)
-    total, done, left = get_stats(d)
+    metrics.inc("plan_rows_loaded_total", reader.accepted)
+    metrics.inc("plan_rows_rejected_total", reader.rejected_count)
     context.user_data["await_csv"] = False
-    await update.message.reply_text(
-        f"Загружено строк: {len(rows)} ✅\n"
-        f"Всего: {total} | Готово: {done} | Осталось: {left}"
-    )
+    context.user_data["upload_reset"] = False
+    parts = []
+    for day, loaded, changes in results:
+        total, done, left = await storage.get_stats(day, shard=shard)
+        text = f"Загружено строк: {loaded} ✅\n" if day == d else f"📅 {day}: загружено строк {loaded}\n"
+        if changes is not None:
+            inserted, updated, deleted = changes
+            text += f"Добавлено: {inserted} | Изменено: {updated} | Удалено: {deleted}\n"
+        text += f"Всего: {total} | Готово: {done} | Осталось: {left}"
+        parts.append(text)
+    text = "\n\n".join(parts)
+    if reader.rejected_count:
+        text += f"\n\nПропущено строк: {reader.rejected_count}\n{reader.report()}"
+    await update.message.reply_text(text[:4096])
+    if reader.rejected_count > 10:
+        # полный отчёт по отброшенным строкам — файлом
+        full = reader.report(limit=MAX_REJECTS).encode("utf-8")
+        await update.message.reply_document(
+            document=InputFile(io.BytesIO(full), filename=f"rejected_{d}.txt")
+        )
 
 # ───────────────────────────────────────────────────────────────────────────────
-# Автоотчёт по расписанию (без параметра timezone)
+# Автоотчёт по расписанию: у каждого чата своё время и часовой пояс
+# (settings report_time:<chat> / tz:<chat>, по умолчанию REPORT_TIME и
+# TIMEZONE для REPORT_CHAT_IDS). Все чаты — в одной куче DailyScheduler.
 # ───────────────────────────────────────────────────────────────────────────────
-def next_run_utc() -> datetime:
-    """Вычисляем следующий запуск в UTC, исходя из локальной таймзоны и REPORT_TIME."""
-    hh, mm = 18, 0
+REPORT_TIME_KEY = "report_time:"
+TZ_KEY = "tz:"
+
+def _valid_hhmm(value: str) -> Optional[Tuple[int, int]]:
+    hh, mm = parse_hhmm(value, (-1, -1))
+    return (hh, mm) if 0 <= hh < 24 and 0 <= mm < 60 else None
+
+def _valid_tz(name: str) -> bool:
     try:
-        hh, mm = [int(x) for x in REPORT_TIME.split(":")]
-    except Exception:
-        pass
+        scheduler.zone(name)
+        return True
+    except pytz.UnknownTimeZoneError:
+        return False
+
+def _schedule_chat(reports, chat_id: int, time_value: str, tz_name: str):
+    """Поставить автоотчёт чата в расписание (time_value="off" — снять)."""
+    hhmm = _valid_hhmm(time_value) if time_value != "off" else None
+    if hhmm is None:
+        reports.remove(chat_id)
+        return
+    reports.set(chat_id, *hhmm, tz_name if _valid_tz(tz_name) else _zone(TIMEZONE).zone)
+
+def _default_report_time() -> str:
+    if REPORT_TIME == "off" or _valid_hhmm(REPORT_TIME) is not None:
+        return REPORT_TIME
+    print(f"[reports] WARNING: REPORT_TIME='{REPORT_TIME}' не в формате ЧЧ:ММ — используется 18:00")
+    return "18:00"
+
+async def load_report_schedule(reports):
+    # чаты из окружения — по умолчанию, настройки чатов — поверх них
+    default_time = _default_report_time()
+    times = dict(await storage.get_settings(REPORT_TIME_KEY))
+    zones = dict(await storage.get_settings(TZ_KEY))
+    chats = dict.fromkeys(REPORT_CHAT_IDS)
+    chats.update(dict.fromkeys(int(k[len(REPORT_TIME_KEY):]) for k in times))
+    for chat_id in chats:
+        _schedule_chat(reports, chat_id,
+                       times.get(f"{REPORT_TIME_KEY}{chat_id}", default_time),
+                       zones.get(f"{TZ_KEY}{chat_id}", TIMEZONE))
+    print(f"[reports] {len(reports)} chats scheduled")
+
+async def send_reports(bot_data, chat_ids: List[int]):
+    """Один тик расписания: отчёты всем наступившим чатам, каждому — за его местный день."""
+    # через общую очередь: лимиты Telegram, RetryAfter и повторы — на ней
+    out = bot_data["outbox"]
+    reports = bot_data["reports"]
+    stats = {}
+    for chat_id in chat_ids:
+        entry = reports.get(chat_id)
+        d = day_str(datetime.now(scheduler.zone(entry[2]))) if entry else day_str()
+        # каждый чат получает отчёт по своему объекту; один объект и день — один запрос
+        key = (storage.shard_for(chat_id), d)
+        if key not in stats:
+            stats[key] = await storage.get_stats(d, shard=key[0])
+        total, done, left = stats[key]
+        out.send(chat_id, f"🧹 Ежедневный отчёт {d}\nВсего: {total} | Готово: {done} | Осталось: {left}")
+
+def start_reports(app):
+    reports = scheduler.DailyScheduler(lambda chat_ids: send_reports(app.bot_data, chat_ids))
+    app.bot_data["reports"] = reports
+    metrics.gauge("report_chats", lambda: len(reports))
+    reports.start()
+
+async def set_tz_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("Только админы могут менять часовой пояс.")
+        return
+    chat_id = update.effective_chat.id
+    reports = context.bot_data["reports"]
+    if not context.args:
+        entry = reports.get(chat_id)
+        current = entry[2] if entry else dict(await storage.get_settings(f"{TZ_KEY}{chat_id}")).get(
+            f"{TZ_KEY}{chat_id}", TIMEZONE)
+        await update.message.reply_text(f"Часовой пояс автоотчёта: {current}\nПример: /set_tz Asia/Tashkent")
+        return
+    name = context.args[0]
+    if not _valid_tz(name):
+        await update.message.reply_text(f"Неизвестный часовой пояс: {name}. Пример: Asia/Tashkent, Europe/Moscow")
+        return
+    await storage.set_setting(f"{TZ_KEY}{chat_id}", name)
+    entry = reports.get(chat_id)
+    if entry:
+        reports.set(chat_id, entry[0], entry[1], name)
+    await update.message.reply_text(f"Часовой пояс автоотчёта: {name}")
 
-    local_today = now_local().replace(hour=hh, minute=mm, second=0, microsecond=0)
-    if local_today <= now_local():
-        local_today += timedelta(days=1)
-    return local_today.astimezone(pytz.UTC)
+async def report_time_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("Только админы могут менять время автоотчёта.")
+        return
+    chat_id = update.effective_chat.id
+    reports = context.bot_data["reports"]
+    if not context.args:
+        entry = reports.get(chat_id)
+        if entry:
+            nxt = datetime.fromtimestamp(reports.next_at(chat_id), scheduler.zone(entry[2]))
+            text = f"Автоотчёт в {entry[0]:02d}:{entry[1]:02d} ({entry[2]}), следующий — {nxt:%Y-%m-%d %H:%M}"
+        else:
+            text = "Автоотчёт в этом чате выключен."
+        await update.message.reply_text(text + "\n/report_time <ЧЧ:ММ> — включить, /report_time off — выключить.")
+        return
+    value = context.args[0].lower()
+    if value != "off" and _valid_hhmm(value) is None:
+        await update.message.reply_text("Время в формате ЧЧ:ММ, например 18:00, или off.")
+        return
+    await storage.set_setting(f"{REPORT_TIME_KEY}{chat_id}", value)
+    tz_name = dict(await storage.get_settings(f"{TZ_KEY}{chat_id}")).get(f"{TZ_KEY}{chat_id}", TIMEZONE)
+    _schedule_chat(reports, chat_id, value, tz_name)
+    if value == "off":
+        await update.message.reply_text("Автоотчёт в этом чате выключен.")
+    else:
+        hh, mm, tz_name = reports.get(chat_id)
+        await update.message.reply_text(f"Автоотчёт каждый день в {hh:02d}:{mm:02d} ({tz_name}).")
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Перенос неубранных номеров на следующий день
+# ───────────────────────────────────────────────────────────────────────────────
+CARRYOVER_TIME = dtime(0, 5)   # местное время, сразу после смены дня
 
-async def send_report(context: ContextTypes.DEFAULT_TYPE):
-    if not REPORT_CHAT_ID:
+async def carryover_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("Только админы могут переносить план.")
         return
     d = day_str()
-    total, done, left = get_stats(d)
-    msg = f"🧹 Ежедневный отчёт {d}\nВсего: {total} | Готово: {done} | Осталось: {left}"
+    src = day_str(now_local() - timedelta(days=1))
+    moved = await storage.carry_over(src, d, shard=_shard(update))
+    await update.message.reply_text(f"Перенесено неубранных номеров с {src} на {d}: {moved}")
+
+async def carryover_job(context: ContextTypes.DEFAULT_TYPE):
+    d = day_str()
+    src = day_str(now_local() - timedelta(days=1))
+    out = context.bot_data["outbox"]
+    await storage.load_shard_map()
+    for shard in storage.shards():
+        moved = await storage.carry_over(src, d, shard=shard)
+        if moved:
+            for chat_id in dict.fromkeys(REPORT_CHAT_IDS):
+                if storage.shard_for(chat_id) == shard:
+                    out.send(chat_id, f"⤴️ Перенесено неубранных номеров с {src}: {moved}")
+
+def schedule_carryover(app):
+    if AUTOCARRYOVER:
+        # время с таймзоной — APScheduler сам учитывает переходы на летнее время
+        app.job_queue.run_daily(carryover_job, time=CARRYOVER_TIME.replace(tzinfo=tz()))
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Архив старых дней
+# ───────────────────────────────────────────────────────────────────────────────
+ARCHIVE_TIME = dtime(3, 30)   # местное время, ночью — когда бот почти не нагружен
+
+def archive_cutoff() -> str:
+    return day_str(now_local() - timedelta(days=ARCHIVE_AFTER_DAYS))
+
+async def archive_all() -> List[Tuple[str, int, int, int]]:
+    """Архивировать старые дни во всех объектах: [(шард, дней, строк, страниц освобождено)]."""
+    cutoff = archive_cutoff()
+    results = []
+    await storage.load_shard_map()
+    for shard in storage.shards():
+        days, rows = await storage.archive_before(cutoff, shard=shard)
+        freed = await storage.incremental_vacuum(shard) if days else 0
+        results.append((shard, days, rows, freed))
+    return results
+
+async def archive_job(context: ContextTypes.DEFAULT_TYPE):
+    for shard, days, rows, freed in await archive_all():
+        if days:
+            print(f"[archive] {storage.shard_title(shard)}: дней {days}, строк {rows}, страниц освобождено {freed}")
+
+def schedule_archive(app):
+    if ARCHIVE_AFTER_DAYS > 0:
+        app.job_queue.run_daily(archive_job, time=ARCHIVE_TIME.replace(tzinfo=tz()))
+
+async def archive_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("Только админы могут управлять архивом.")
+        return
+    shard = _shard(update)
+    action = context.args[0].lower() if context.args else ""
+    if action == "now":
+        if ARCHIVE_AFTER_DAYS <= 0:
+            await update.message.reply_text("Архив отключён (ARCHIVE_AFTER_DAYS=0).")
+            return
+        lines = [f"Архив: дни раньше {archive_cutoff()}"]
+        for name, days, rows, freed in await archive_all():
+            lines.append(f"{storage.shard_title(name)}: дней {days}, строк {rows}, страниц освобождено {freed}")
+        await update.message.reply_text("\n".join(lines))
+        return
+    if action == "vacuum":
+        await update.message.reply_text("Сжимаю файл базы… (полный VACUUM, может занять время)")
+        await storage.convert_incremental(shard)
+    st = await storage.archive_status(shard)
+    await update.message.reply_text(
+        f"В плане: дней {st['hot_days']}, строк {st['hot_rows']}\n"
+        f"В архиве: дней {st['archived_days']}, файл {st.get('archive_bytes', 0) // 1024} КБ\n"
+        f"Свободных страниц: {st['free_pages']}, инкрементальный VACUUM: "
+        f"{'да' if st['incremental'] else 'нет — /archive vacuum'}\n"
+        f"Срок хранения в плане: {ARCHIVE_AFTER_DAYS or '∞'} дн.\n"
+        "/archive now — перенести старые дни сейчас."
+    )
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Объекты (шарды хранилища)
+# ───────────────────────────────────────────────────────────────────────────────
+async def property_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("Только админы могут менять объект чата.")
+        return
+    chat_id = update.effective_chat.id
+    if not context.args:
+        current = storage.shard_title(storage.shard_for(chat_id))
+        await update.message.reply_text(
+            f"Объект этого чата: {current}\n"
+            f"Все объекты: {', '.join(storage.shard_title(s) for s in storage.shards())}\n"
+            "/property <имя> — привязать чат к объекту, /property - — вернуть в основной."
+        )
+        return
+    name = "" if context.args[0] == "-" else " ".join(context.args)
     try:
-        await context.bot.send_message(chat_id=REPORT_CHAT_ID, text=msg)
-    except Exception:
-        pass
+        shard = await storage.assign_shard(chat_id, name)
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}")
+        return
+    await update.message.reply_text(f"Чат привязан к объекту: {storage.shard_title(shard)}")
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Живая сводка (закреплённое сообщение)
+# ───────────────────────────────────────────────────────────────────────────────
+async def dashboard_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("Только админы могут включать сводку.")
+        return
+    boards = context.bot_data["dashboards"]
+    chat_id = update.effective_chat.id
+    if context.args and context.args[0].lower() == "off":
+        removed = await boards.remove(chat_id)
+        await update.message.reply_text("Сводка отключена." if removed else "Сводки в этом чате нет.")
+        return
+    await boards.create(chat_id)
+
+async def dashboard_rollover_job(context: ContextTypes.DEFAULT_TYPE):
+    # новый день — сводки переключаются на него, даже если план ещё не менялся
+    await context.bot_data["dashboards"].refresh()
+
+def schedule_dashboards(app):
+    app.job_queue.run_daily(dashboard_rollover_job, time=dtime(0, 0, 30).replace(tzinfo=tz()))
 
-def schedule_daily_job(app):
-    # Первое срабатывание — в рассчитанное время, дальше — каждые 24 часа
-    first_run = next_run_utc()
-    app.job_queue.run_repeating(send_report, interval=24*60*60, first=first_run)
+# ───────────────────────────────────────────────────────────────────────────────
+# Метрики (см. metrics.py)
+# ───────────────────────────────────────────────────────────────────────────────
+class TimedRequest(HTTPXRequest):
+    """HTTP-клиент бота, который меряет каждый запрос к Telegram API по методу."""
+
+    async def do_request(self, url, method, *args, **kwargs):
+        with metrics.timed("telegram_api", method=url.rsplit("/", 1)[-1]):
+            return await super().do_request(url, method, *args, **kwargs)
+
+async def metrics_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("Только админы могут смотреть метрики.")
+        return
+    if context.args and context.args[0].lower() == "reset":
+        metrics.REGISTRY.reset()
+        await update.message.reply_text("Метрики сброшены.")
+        return
+    text = metrics.REGISTRY.summary()
+    await update.message.reply_text(text[:4096])
+
+async def metrics_file_job(context: ContextTypes.DEFAULT_TYPE):
+    await asyncio.to_thread(metrics.write_file, METRICS_FILE)
+
+def schedule_metrics(app):
+    if METRICS_FILE:
+        app.job_queue.run_repeating(metrics_file_job, interval=METRICS_INTERVAL, first=METRICS_INTERVAL)
 
 # ───────────────────────────────────────────────────────────────────────────────
 # Main
@@ -329,14 +735,78 @@ def schedule_daily_job(app):
 def validate_env():
     print(f"[ENV] BOT_TOKEN set? {'yes' if BOT_TOKEN else 'no'}; length={len(BOT_TOKEN)}")
     print(f"[ENV] TIMEZONE='{TIMEZONE}' REPORT_TIME='{REPORT_TIME}' AUTOCARRYOVER={AUTOCARRYOVER}")
-    print(f"[ENV] REPORT_CHAT_ID={REPORT_CHAT_ID} ADMIN_IDS={ADMIN_IDS}")
+    print(f"[ENV] REPORT_CHAT_ID={REPORT_CHAT_ID} REPORT_CHAT_IDS={REPORT_CHAT_IDS} ADMIN_IDS={ADMIN_IDS}")
+    print(f"[ENV] METRICS_FILE='{METRICS_FILE}' METRICS_PORT={METRICS_PORT}")
+    print(f"[ENV] WEBHOOK_URL='{WEBHOOK_URL}' WEBHOOK_LISTEN={WEBHOOK_LISTEN}:{WEBHOOK_PORT} "
+          f"secret={'yes' if WEBHOOK_SECRET else 'no'} CONCURRENT_UPDATES={CONCURRENT_UPDATES}")
+    print(f"[ENV] ARCHIVE_AFTER_DAYS={ARCHIVE_AFTER_DAYS}")
     if not BOT_TOKEN:
         raise ValueError("❌ BOT_TOKEN не найден. Задайте его в Render → Environment → BOT_TOKEN=<токен от @BotFather>.")
 
-def main():
-    validate_env()
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+async def ensure_shard_map(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await storage.load_shard_map()
+
+async def on_startup(app):
+    startup_mark("initialize")   # build_app → app.initialize() (getMe)
+    # очередь исходящих сообщений живёт всё время работы бота
+    app.bot_data["outbox"] = Outbox(app.bot)
+    app.bot_data["outbox"].start()
+    metrics.gauge("outbox_queue_depth", app.bot_data["outbox"].depth)
+    # расписание автоотчётов заполняется в warm_up_job (нужна БД)
+    start_reports(app)
+    if METRICS_PORT:
+        app.bot_data["metrics_http"] = metrics.serve_http(METRICS_PORT)
+    # живые сводки обновляются по сбросам снимка дня в кэше плана
+    boards = Dashboards(app.bot, day_str)
+    await boards.load()
+    boards.watch()
+    app.bot_data["dashboards"] = boards
+    startup_mark("post_init")
+
+async def warm_up_job(context: ContextTypes.DEFAULT_TYPE):
+    # JobQueue запускается последним — бот уже принимает апдейты (polling/webhook)
+    startup_mark("listening")
+    await storage.load_shard_map()
+    # сегодняшний план и счётчики каждого объекта — в кэш дней
+    d = day_str()
+    for shard in storage.shards()[:storage.MAX_OPEN_SHARDS]:
+        await storage.get_rooms(d, shard=shard)
+        await storage.get_maid_counts(d, shard=shard)
+    await load_report_schedule(context.bot_data["reports"])
+    startup_mark("warm_up")
+    print(f"[startup] {startup_report()}")
+
+async def on_stop(app):
+    # новые апдейты уже не принимаются; дожидаемся начатых, затем досылаем очередь
+    processor = app.update_processor
+    if isinstance(processor, ChatOrderedProcessor) and not await processor.drain(DRAIN_TIMEOUT):
+        print(f"[updates] {processor.depth()} updates still running after {DRAIN_TIMEOUT}s")
+    await app.bot_data["reports"].stop()
+    await app.bot_data["outbox"].stop(drain=True, timeout=DRAIN_TIMEOUT)
+
+async def on_shutdown(app):
+    # закрываем долгоживущее соединение с БД
+    storage.close()
+    if "metrics_http" in app.bot_data:
+        app.bot_data["metrics_http"].shutdown()
+
+def build_app(request=None, updates_request=None):
+    """Приложение со всеми обработчиками и задачами (request — свой HTTP-клиент, например для замеров)."""
+    builder = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .request(request or TimedRequest())
+        .concurrent_updates(ChatOrderedProcessor(CONCURRENT_UPDATES) if CONCURRENT_UPDATES > 1 else False)
+        .post_init(on_startup)
+        .post_stop(on_stop)
+        .post_shutdown(on_shutdown)
+    )
+    if updates_request is not None:
+        builder = builder.get_updates_request(updates_request)
+    app = builder.build()
 
+    # карта чат → объект грузится до первого обработчика (shard_for не ходит в БД)
+    app.add_handler(TypeHandler(Update, ensure_shard_map), group=-1)
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("help", help_cmd))
     app.add_handler(CommandHandler("upload_plan", upload_plan_cmd))
@@ -344,14 +814,46 @@ def main():
     app.add_handler(CommandHandler("export_csv", export_csv))
     app.add_handler(CommandHandler("export_xlsx", export_xlsx))
     app.add_handler(CommandHandler("clear_today", clear_today))
+    app.add_handler(CommandHandler("stats", stats_cmd))
+    app.add_handler(CommandHandler("find", find_cmd))
+    app.add_handler(CallbackQueryHandler(find_page_cb, pattern=r"^find:\d+$"))
+    app.add_handler(CommandHandler("check_stats", check_stats_cmd))
+    app.add_handler(CommandHandler("carryover", carryover_cmd))
+    app.add_handler(CommandHandler("dashboard", dashboard_cmd))
+    app.add_handler(CommandHandler("property", property_cmd))
+    app.add_handler(CommandHandler("archive", archive_cmd))
+    app.add_handler(CommandHandler("set_tz", set_tz_cmd))
+    app.add_handler(CommandHandler("report_time", report_time_cmd))
+    app.add_handler(CommandHandler("metrics", metrics_cmd))
 
     app.add_handler(MessageHandler(filters.Document.ALL, document_handler))
+    # время каждого обработчика — в метриках
+    metrics.instrument_handlers(app)
+
+    # Автоперенос и ночные задачи (автоотчёты — в DailyScheduler, см. start_reports)
+    schedule_carryover(app)
+    schedule_dashboards(app)
+    schedule_metrics(app)
+    schedule_archive(app)
+    app.job_queue.run_once(warm_up_job, 0)
+    startup_mark("build_app")
+    return app
 
-    # Автоотчёт
-    schedule_daily_job(app)
-
-    print("Bot is running...")
-    app.run_polling()
+def main():
+    validate_env()
+    app = build_app()
+    if WEBHOOK_URL:
+        print(f"Bot is running (webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT})...")
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=urlparse(WEBHOOK_URL).path.lstrip("/"),
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+        )
+    else:
+        print("Bot is running...")
+        app.run_polling()
 
 if __name__ == "__main__":
     main()
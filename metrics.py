@@ -0,0 +1,255 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Встроенные метрики: гистограммы времени, счётчики и «датчики» глубины очередей
+#
+# Обработчики команд, функции хранилища, экспорт и запросы к Telegram API
+# меряются в одном реестре (REGISTRY). Посмотреть — /metrics (админ), а для
+# внешнего мониторинга есть текстовый формат Prometheus: файл (METRICS_FILE)
+# и/или локальный HTTP (METRICS_PORT, слушает только 127.0.0.1).
+# Датчики могут быть с меткой (например, кэш дня — по шардам).
+# Всё потокобезопасно: хранилище и write-behind пишут метрики из своих потоков.
+# ───────────────────────────────────────────────────────────────────────────────
+# верхние границы корзин, секунды
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # последняя — +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по корзинам (верхняя граница корзины)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hist: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[str, Tuple[Callable[[], Any], Optional[str]]] = {}
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._hist.get(key)
+            if h is None:
+                h = self._hist[key] = Histogram()
+            h.observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge(self, name: str, fn: Callable[[], Any], label: Optional[str] = None):
+        """
+        Датчик: fn() вызывается при каждом снятии метрик. С label fn()
+        возвращает {значение метки: число} — по ряду на каждое значение.
+        """
+        self._gauges[name] = (fn, label)
+
+    def reset(self):
+        with self._lock:
+            self._hist.clear()
+            self._counters.clear()
+
+    @contextmanager
+    def timed(self, name: str, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc(name + "_errors_total", **labels)
+            raise
+        finally:
+            self.observe(name + "_seconds", time.perf_counter() - t0, **labels)
+
+    # ── снятие ────────────────────────────────────────────────────────────────
+    def _read_gauges(self) -> Dict[Tuple[str, Labels], float]:
+        values = {}
+        for name, (fn, label) in list(self._gauges.items()):
+            try:
+                if label is None:
+                    values[(name, ())] = float(fn())
+                else:
+                    for key, value in fn().items():
+                        values[(name, ((label, str(key)),))] = float(value)
+            except Exception:
+                pass
+        return values
+
+    def snapshot(self):
+        with self._lock:
+            hist = {k: (h.count, h.sum, h.quantile(0.5), h.quantile(0.95), list(h.counts))
+                    for k, h in self._hist.items()}
+            counters = dict(self._counters)
+        return hist, counters, self._read_gauges()
+
+    def prometheus(self) -> str:
+        """Текстовый формат экспозиции Prometheus."""
+        hist, counters, gauges = self.snapshot()
+        out: List[str] = []
+        typed = set()
+
+        def fmt(labels: Labels, extra: Tuple = ()) -> str:
+            items = labels + extra
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in items) + "}"
+
+        for (name, labels), (count, total, _, _, counts) in sorted(hist.items()):
+            if name not in typed:
+                out.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for le, c in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += c
+                le_s = "+Inf" if le == float("inf") else repr(le)
+                out.append(f"{name}_bucket{fmt(labels, (('le', le_s),))} {cumulative}")
+            out.append(f"{name}_sum{fmt(labels)} {total:.6f}")
+            out.append(f"{name}_count{fmt(labels)} {count}")
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                out.append(f"# TYPE {name} counter")
+                typed.add(name)
+            out.append(f"{name}{fmt(labels)} {value:g}")
+        for (name, labels), value in sorted(gauges.items()):
+            if name not in typed:
+                out.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            out.append(f"{name}{fmt(labels)} {value:g}")
+        return "\n".join(out) + "\n"
+
+    def summary(self, limit: int = 40) -> str:
+        """Краткая сводка для /metrics: самые «дорогие» по суммарному времени."""
+        hist, counters, gauges = self.snapshot()
+        lines = ["⏱ Время (вызовов | p50 | p95 | всего):"]
+        top = sorted(hist.items(), key=lambda kv: kv[1][1], reverse=True)[:limit]
+        for (name, labels), (count, total, p50, p95, _) in top:
+            label = ",".join(v for _, v in labels)
+            title = name[:-len("_seconds")] if name.endswith("_seconds") else name
+            lines.append(f"{title}{'[' + label + ']' if label else ''}: "
+                         f"{count} | {_ms(p50)} | {_ms(p95)} | {total:.2f}s")
+        if counters:
+            lines.append("\n🔢 Счётчики:")
+            for (name, labels), value in sorted(counters.items()):
+                label = ",".join(v for _, v in labels)
+                lines.append(f"{name}{'[' + label + ']' if label else ''}: {value:g}")
+        if gauges:
+            lines.append("\n📥 Очереди и кэши:")
+            for (name, labels), value in sorted(gauges.items()):
+                label = ",".join(v for _, v in labels)
+                lines.append(f"{name}{'[' + label + ']' if label else ''}: {value:g}")
+        return "\n".join(lines)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _ms(seconds: float) -> str:
+    if seconds == float("inf"):
+        return f">{BUCKETS[-1]:g}s"
+    return f"≤{seconds * 1000:g}ms"
+
+
+REGISTRY = Registry()
+observe = REGISTRY.observe
+inc = REGISTRY.inc
+gauge = REGISTRY.gauge
+timed = REGISTRY.timed
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Обёртки
+# ───────────────────────────────────────────────────────────────────────────────
+def wrap_handler(callback):
+    """Асинхронный обработчик PTB с замером времени (метка — имя функции)."""
+    name = getattr(callback, "__name__", "handler")
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        with timed("handler", handler=name):
+            return await callback(update, context)
+    return wrapper
+
+
+def timed_fn(name: str):
+    """Декоратор для синхронных функций: timed(name, fn=<имя функции>)."""
+    def decorate(fn):
+        label = fn.__name__.lstrip("_")
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(name, fn=label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instrument_handlers(app):
+    """Обернуть все уже зарегистрированные обработчики приложения."""
+    for group in app.handlers.values():
+        for handler in group:
+            if not getattr(handler.callback, "_timed", False):
+                handler.callback = wrap_handler(handler.callback)
+                handler.callback._timed = True
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Экспорт в Prometheus: файл и/или локальный HTTP
+# ───────────────────────────────────────────────────────────────────────────────
+def write_file(path: str):
+    # через временный файл — node_exporter (textfile collector) не увидит половину
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(REGISTRY.prometheus())
+    os.replace(tmp, path)
+
+
+def serve_http(port: int, host: str = "127.0.0.1"):
+    # http.server тянет за собой email/html/mimetypes — импортируем, только если порт задан
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = REGISTRY.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,320 @@
+import re
+import sqlite3
+from typing import Callable, List, Optional, Sequence, Union
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Версионные миграции схемы
+#
+# Текущая версия хранится в settings под ключом schema_version. Каждая
+# миграция — список SQL или функция(conn); выполняется в своей транзакции
+# вместе с записью новой версии, так что существующие asal.db / data.db
+# обновляются на месте и повторный запуск ничего не ломает.
+# ───────────────────────────────────────────────────────────────────────────────
+VERSION_KEY = "schema_version"
+
+Step = Union[Sequence[str], Callable[[sqlite3.Connection], None]]
+
+SQL_CREATE_SETTINGS = "CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)"
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    conn.execute(SQL_CREATE_SETTINGS)
+    row = conn.execute("SELECT value FROM settings WHERE key=?", (VERSION_KEY,)).fetchone()
+    return int(row[0]) if row else 0
+
+
+def migrate(conn: sqlite3.Connection, steps: List[Step], target: Optional[int] = None) -> int:
+    """Довести схему до версии target (по умолчанию — последней). Возвращает версию."""
+    target = len(steps) if target is None else target
+    version = schema_version(conn)
+    while version < target:
+        step = steps[version]
+        conn.execute("BEGIN")
+        try:
+            if callable(step):
+                step(conn)
+            else:
+                for sql in step:
+                    conn.execute(sql)
+            version += 1
+            conn.execute(
+                "INSERT INTO settings(key,value) VALUES(?,?) "
+                "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (VERSION_KEY, str(version)),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return version
+
+# ───────────────────────────────────────────────────────────────────────────────
+# asal.db — таблица plan (storage.py)
+# ───────────────────────────────────────────────────────────────────────────────
+# Полный пересчёт счётчиков (миграция и восстановление после проверки)
+PLAN_STATS_REBUILD = (
+    "INSERT INTO plan_stats(day, maid, ctype, total, done) "
+    "SELECT day, maid, ctype, COUNT(*), SUM(status='Готово') FROM plan GROUP BY day, maid, ctype"
+)
+
+# Токенизатор поиска: слова по Unicode, регистр не важен (и для кириллицы)
+FTS_TOKENIZE = "unicode61 remove_diacritics 2"
+
+
+def fts_query(text: str) -> Optional[str]:
+    """Текст пользователя → запрос FTS5: все слова, каждое — как начало слова."""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{w}"*' for w in words) if words else None
+
+
+PLAN_NOTES_UPSERT = (
+    "INSERT INTO plan_notes(day, room_no, maid, comment) "
+    "SELECT NEW.day, NEW.room_no, NEW.maid, NEW.comment WHERE COALESCE(NEW.comment,'') <> '' "
+    "ON CONFLICT(day, room_no) DO UPDATE SET maid=excluded.maid, comment=excluded.comment"
+)
+
+PLAN_MIGRATIONS: List[Step] = [
+    # 1: исходная схема
+    [
+        """
+        CREATE TABLE IF NOT EXISTS plan (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            day TEXT NOT NULL,
+            room_no INTEGER NOT NULL,
+            maid TEXT NOT NULL,
+            ctype TEXT NOT NULL,     -- Полная / Текущая
+            status TEXT NOT NULL DEFAULT 'Назначено', -- Назначено/В процессе/Готово/Не убрано
+            comment TEXT
+        )
+        """,
+    ],
+    # 2: один номер на день + индексы под выборки по дню и горничной.
+    # Дубликаты, накопившиеся до уникального индекса, схлопываем в последнюю строку.
+    [
+        "DELETE FROM plan WHERE id NOT IN (SELECT MAX(id) FROM plan GROUP BY day, room_no)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_plan_day_room ON plan(day, room_no)",
+        "CREATE INDEX IF NOT EXISTS idx_plan_day_maid ON plan(day, maid, status)",
+    ],
+    # 3: счётчики по дню/горничной/типу уборки, которые триггеры ведут в той же
+    # транзакции, что и сама запись в plan — статистика дня читается без пересчёта.
+    [
+        """
+        CREATE TABLE IF NOT EXISTS plan_stats (
+            day TEXT NOT NULL,
+            maid TEXT NOT NULL,
+            ctype TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, maid, ctype)
+        ) WITHOUT ROWID
+        """,
+        "DELETE FROM plan_stats",
+        PLAN_STATS_REBUILD,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_plan_stats_ins AFTER INSERT ON plan BEGIN
+            INSERT INTO plan_stats(day, maid, ctype, total, done)
+            VALUES (NEW.day, NEW.maid, NEW.ctype, 1, NEW.status='Готово')
+            ON CONFLICT(day, maid, ctype) DO UPDATE
+            SET total=total+1, done=done+excluded.done;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_plan_stats_del AFTER DELETE ON plan BEGIN
+            UPDATE plan_stats SET total=total-1, done=done-(OLD.status='Готово')
+            WHERE day=OLD.day AND maid=OLD.maid AND ctype=OLD.ctype;
+            DELETE FROM plan_stats
+            WHERE day=OLD.day AND maid=OLD.maid AND ctype=OLD.ctype AND total<=0;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_plan_stats_upd
+        AFTER UPDATE OF day, maid, ctype, status ON plan BEGIN
+            UPDATE plan_stats SET total=total-1, done=done-(OLD.status='Готово')
+            WHERE day=OLD.day AND maid=OLD.maid AND ctype=OLD.ctype;
+            DELETE FROM plan_stats
+            WHERE day=OLD.day AND maid=OLD.maid AND ctype=OLD.ctype AND total<=0;
+            INSERT INTO plan_stats(day, maid, ctype, total, done)
+            VALUES (NEW.day, NEW.maid, NEW.ctype, 1, NEW.status='Готово')
+            ON CONFLICT(day, maid, ctype) DO UPDATE
+            SET total=total+1, done=done+excluded.done;
+        END
+        """,
+    ],
+    # 4: перенос неубранных номеров — день, из которого строка перенесена
+    [
+        "ALTER TABLE plan ADD COLUMN carried_from TEXT",
+    ],
+    # 5: итоги дней, строки которых уехали в архив (см. storage.archive_before):
+    # статистика старых дней читается отсюда, plan и plan_stats остаются маленькими
+    [
+        """
+        CREATE TABLE IF NOT EXISTS plan_rollup (
+            day TEXT NOT NULL,
+            maid TEXT NOT NULL,
+            ctype TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, maid, ctype)
+        ) WITHOUT ROWID
+        """,
+    ],
+    # 6: полнотекстовый поиск по комментариям. plan_notes — только строки
+    # с комментарием (ведут триггеры plan; архив возвращает туда комментарии
+    # уехавших дней), plan_fts — индекс FTS5 поверх plan_notes.
+    [
+        """
+        CREATE TABLE IF NOT EXISTS plan_notes (
+            id INTEGER PRIMARY KEY,
+            day TEXT NOT NULL,
+            room_no INTEGER NOT NULL,
+            maid TEXT NOT NULL,
+            comment TEXT NOT NULL,
+            UNIQUE (day, room_no)
+        )
+        """,
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS plan_fts USING fts5("
+        f"comment, content='plan_notes', content_rowid='id', tokenize='{FTS_TOKENIZE}')",
+        # plan_notes → plan_fts
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_plan_notes_ins AFTER INSERT ON plan_notes BEGIN
+            INSERT INTO plan_fts(rowid, comment) VALUES (NEW.id, NEW.comment);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_plan_notes_del AFTER DELETE ON plan_notes BEGIN
+            INSERT INTO plan_fts(plan_fts, rowid, comment) VALUES ('delete', OLD.id, OLD.comment);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_plan_notes_upd AFTER UPDATE ON plan_notes BEGIN
+            INSERT INTO plan_fts(plan_fts, rowid, comment) VALUES ('delete', OLD.id, OLD.comment);
+            INSERT INTO plan_fts(rowid, comment) VALUES (NEW.id, NEW.comment);
+        END
+        """,
+        # plan → plan_notes
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_plan_notes_plan_ins AFTER INSERT ON plan BEGIN
+            {PLAN_NOTES_UPSERT};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_plan_notes_plan_upd AFTER UPDATE OF day, room_no, maid, comment ON plan
+        BEGIN
+            DELETE FROM plan_notes WHERE day=OLD.day AND room_no=OLD.room_no
+                AND (OLD.day<>NEW.day OR OLD.room_no<>NEW.room_no OR COALESCE(NEW.comment,'')='');
+            {PLAN_NOTES_UPSERT};
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_plan_notes_plan_del AFTER DELETE ON plan BEGIN
+            DELETE FROM plan_notes WHERE day=OLD.day AND room_no=OLD.room_no;
+        END
+        """,
+        "INSERT OR IGNORE INTO plan_notes(day, room_no, maid, comment) "
+        "SELECT day, room_no, maid, comment FROM plan WHERE COALESCE(comment,'') <> ''",
+    ],
+]
+
+# ───────────────────────────────────────────────────────────────────────────────
+# data.db — таблицы rooms/users/settings (db.py)
+# ───────────────────────────────────────────────────────────────────────────────
+ROOM_STATS_REBUILD = (
+    "INSERT INTO room_stats(work_date, maid, cleaning_type, total, cleaned) "
+    "SELECT work_date, COALESCE(maid,''), COALESCE(cleaning_type,''), COUNT(*), SUM(status='Убрано') "
+    "FROM rooms GROUP BY work_date, COALESCE(maid,''), COALESCE(cleaning_type,'')"
+)
+
+ROOMS_MIGRATIONS: List[Step] = [
+    # 1: исходная схема
+    [
+        "CREATE TABLE IF NOT EXISTS rooms ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        "work_date TEXT NOT NULL,"
+        "room_no TEXT NOT NULL,"
+        "maid TEXT,"
+        "maid_tg_id INTEGER,"
+        "cleaning_type TEXT CHECK(cleaning_type IN ('Полная','Текущая')) DEFAULT 'Текущая',"
+        "status TEXT CHECK(status IN ('Убрано','Не убрано')) DEFAULT 'Не убрано',"
+        "comment TEXT,"
+        "updated_by TEXT,"
+        "updated_at TEXT"
+        ");",
+        "CREATE INDEX IF NOT EXISTS idx_rooms_date ON rooms(work_date);",
+        "CREATE TABLE IF NOT EXISTS users ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        "tg_id INTEGER UNIQUE,"
+        "name TEXT,"
+        "role TEXT CHECK(role IN ('admin','maid','user')) DEFAULT 'user',"
+        "created_at TEXT"
+        ");",
+    ],
+    # 2: один номер на дату; выборки горничной идут по индексу и сразу
+    # в порядке room_no. idx_rooms_date перекрывается уникальным индексом.
+    [
+        "DELETE FROM rooms WHERE id NOT IN (SELECT MAX(id) FROM rooms GROUP BY work_date, room_no)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_rooms_date_room ON rooms(work_date, room_no)",
+        "CREATE INDEX IF NOT EXISTS idx_rooms_date_tg ON rooms(work_date, maid_tg_id, room_no)",
+        "CREATE INDEX IF NOT EXISTS idx_rooms_date_maid ON rooms(work_date, maid, room_no)",
+        "DROP INDEX IF EXISTS idx_rooms_date",
+    ],
+    # 3: счётчики rooms по дате/горничной/типу уборки (ведутся триггерами)
+    [
+        "CREATE TABLE IF NOT EXISTS room_stats ("
+        "work_date TEXT NOT NULL,"
+        "maid TEXT NOT NULL,"
+        "cleaning_type TEXT NOT NULL,"
+        "total INTEGER NOT NULL DEFAULT 0,"
+        "cleaned INTEGER NOT NULL DEFAULT 0,"
+        "PRIMARY KEY (work_date, maid, cleaning_type)"
+        ") WITHOUT ROWID;",
+        "DELETE FROM room_stats",
+        ROOM_STATS_REBUILD,
+        "CREATE TRIGGER IF NOT EXISTS trg_room_stats_ins AFTER INSERT ON rooms BEGIN "
+        "INSERT INTO room_stats(work_date, maid, cleaning_type, total, cleaned) "
+        "VALUES (NEW.work_date, COALESCE(NEW.maid,''), COALESCE(NEW.cleaning_type,''), 1, NEW.status='Убрано') "
+        "ON CONFLICT(work_date, maid, cleaning_type) DO UPDATE "
+        "SET total=total+1, cleaned=cleaned+excluded.cleaned; "
+        "END;",
+        "CREATE TRIGGER IF NOT EXISTS trg_room_stats_del AFTER DELETE ON rooms BEGIN "
+        "UPDATE room_stats SET total=total-1, cleaned=cleaned-(OLD.status='Убрано') "
+        "WHERE work_date=OLD.work_date AND maid=COALESCE(OLD.maid,'') "
+        "AND cleaning_type=COALESCE(OLD.cleaning_type,''); "
+        "DELETE FROM room_stats WHERE work_date=OLD.work_date AND maid=COALESCE(OLD.maid,'') "
+        "AND cleaning_type=COALESCE(OLD.cleaning_type,'') AND total<=0; "
+        "END;",
+        "CREATE TRIGGER IF NOT EXISTS trg_room_stats_upd "
+        "AFTER UPDATE OF work_date, maid, cleaning_type, status ON rooms BEGIN "
+        "UPDATE room_stats SET total=total-1, cleaned=cleaned-(OLD.status='Убрано') "
+        "WHERE work_date=OLD.work_date AND maid=COALESCE(OLD.maid,'') "
+        "AND cleaning_type=COALESCE(OLD.cleaning_type,''); "
+        "DELETE FROM room_stats WHERE work_date=OLD.work_date AND maid=COALESCE(OLD.maid,'') "
+        "AND cleaning_type=COALESCE(OLD.cleaning_type,'') AND total<=0; "
+        "INSERT INTO room_stats(work_date, maid, cleaning_type, total, cleaned) "
+        "VALUES (NEW.work_date, COALESCE(NEW.maid,''), COALESCE(NEW.cleaning_type,''), 1, NEW.status='Убрано') "
+        "ON CONFLICT(work_date, maid, cleaning_type) DO UPDATE "
+        "SET total=total+1, cleaned=cleaned+excluded.cleaned; "
+        "END;",
+    ],
+    # 4: полнотекстовый поиск по комментариям rooms (db.set_comment):
+    # внешний контент — сама таблица rooms, индекс ведут триггеры
+    [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS rooms_fts USING fts5("
+        f"comment, content='rooms', content_rowid='id', tokenize='{FTS_TOKENIZE}')",
+        "CREATE TRIGGER IF NOT EXISTS trg_rooms_fts_ins AFTER INSERT ON rooms "
+        "WHEN COALESCE(NEW.comment,'') <> '' BEGIN "
+        "INSERT INTO rooms_fts(rowid, comment) VALUES (NEW.id, NEW.comment); "
+        "END;",
+        "CREATE TRIGGER IF NOT EXISTS trg_rooms_fts_del AFTER DELETE ON rooms "
+        "WHEN COALESCE(OLD.comment,'') <> '' BEGIN "
+        "INSERT INTO rooms_fts(rooms_fts, rowid, comment) VALUES ('delete', OLD.id, OLD.comment); "
+        "END;",
+        "CREATE TRIGGER IF NOT EXISTS trg_rooms_fts_upd AFTER UPDATE OF comment ON rooms BEGIN "
+        "INSERT INTO rooms_fts(rooms_fts, rowid, comment) "
+        "SELECT 'delete', OLD.id, OLD.comment WHERE COALESCE(OLD.comment,'') <> ''; "
+        "INSERT INTO rooms_fts(rowid, comment) "
+        "SELECT NEW.id, NEW.comment WHERE COALESCE(NEW.comment,'') <> ''; "
+        "END;",
+        "INSERT INTO rooms_fts(rowid, comment) "
+        "SELECT id, comment FROM rooms WHERE COALESCE(comment,'') <> ''",
+    ],
+]
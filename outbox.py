@@ -0,0 +1,207 @@
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional, Set
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Очередь исходящих сообщений с учётом лимитов Telegram
+#
+# - общий лимит бота: ~30 сообщений/сек;
+# - в один чат: ~1 сообщение/сек, в группу: ~20 сообщений/мин;
+# - RetryAfter (429) — чат ставится на паузу на указанное время, текст
+#   возвращается в начало очереди; сетевые ошибки — повтор с backoff;
+#   и то и другое — не больше max_retries попыток подряд, дальше текст
+#   считается неотправленным;
+# - несколько ожидающих текстов для одного чата склеиваются в одно сообщение.
+# В один чат одновременно летит не больше одного сообщения — порядок сохраняется.
+# Ничего не теряется молча: неотправленное пишется в лог и в счётчик failed.
+# ───────────────────────────────────────────────────────────────────────────────
+GLOBAL_RATE = 30.0
+CHAT_RATE = 1.0
+GROUP_RATE = 20 / 60
+MAX_MESSAGE_LEN = 4096
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+DRAIN_TIMEOUT = 30.0   # секунд на досылку очереди при остановке
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated: Optional[float] = None
+
+    def _refill(self, now: float):
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько ждать до появления жетона (0 — можно сейчас)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+
+def _seconds(retry_after) -> float:
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+class Outbox:
+    def __init__(self, bot, global_rate: float = GLOBAL_RATE, chat_rate: float = CHAT_RATE,
+                 group_rate: float = GROUP_RATE, max_retries: int = MAX_RETRIES,
+                 backoff: float = BACKOFF_BASE):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.sent = 0
+        self.merged = 0
+        self.retried = 0
+        self.failed = 0
+        self._global = TokenBucket(global_rate)
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._queues: Dict[int, Deque[str]] = {}
+        self._blocked_until: Dict[int, float] = {}
+        self._attempts: Dict[int, int] = {}
+        self._inflight: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._runner: Optional[asyncio.Task] = None
+
+    # ── публичное API ─────────────────────────────────────────────────────────
+    def send(self, chat_id: int, text: str):
+        """Поставить сообщение в очередь (не ждёт отправки)."""
+        self._queues.setdefault(chat_id, deque()).append(text)
+        self._idle.clear()
+        self._wakeup.set()
+
+    def depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться, пока очередь опустеет и все отправки завершатся (False — не успели за timeout)."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self, drain: bool = True, timeout: Optional[float] = DRAIN_TIMEOUT):
+        """Остановить очередь; drain — сначала досылать, но не дольше timeout секунд (None — без предела)."""
+        if drain and not await self.drain(timeout):
+            print(f"[outbox] drain timed out after {timeout}s")
+        if self.depth() or self._inflight:
+            # что осталось неотправленным — в лог до отмены (отменённые отправки тоже)
+            chats = sorted(set(self._queues) | self._inflight)
+            print(f"[outbox] stopped with {self.depth()} unsent messages "
+                  f"(+{len(self._inflight)} in flight) for chats {chats[:20]}")
+        for task in (self._runner, *self._tasks):
+            if task is not None:
+                task.cancel()
+        for task in (self._runner, *self._tasks):
+            if task is not None:
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._runner = None
+
+    # ── внутреннее ────────────────────────────────────────────────────────────
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        b = self._buckets.get(chat_id)
+        if b is None:
+            b = self._buckets[chat_id] = TokenBucket(self.group_rate if chat_id < 0 else self.chat_rate)
+        return b
+
+    def _take(self, chat_id: int) -> str:
+        q = self._queues[chat_id]
+        text = q.popleft()
+        while q and len(text) + 2 + len(q[0]) <= MAX_MESSAGE_LEN:
+            text += "\n\n" + q.popleft()
+            self.merged += 1
+        if not q:
+            del self._queues[chat_id]
+        return text
+
+    def _requeue(self, chat_id: int, text: str):
+        self._queues.setdefault(chat_id, deque()).appendleft(text)
+
+    def _check_idle(self):
+        if not self._queues and not self._inflight:
+            self._idle.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            wait = None
+            for chat_id in list(self._queues):
+                if chat_id in self._inflight:
+                    continue
+                delay = max(self._blocked_until.get(chat_id, 0) - now, self._bucket(chat_id).delay(now))
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                global_delay = self._global.delay(now)
+                if global_delay > 0:
+                    wait = global_delay if wait is None else min(wait, global_delay)
+                    break
+                self._global.take(now)
+                self._bucket(chat_id).take(now)
+                self._inflight.add(chat_id)
+                task = asyncio.create_task(self._deliver(chat_id, self._take(chat_id)))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _retry(self, chat_id: int, text: str, pause: float, error: Exception):
+        # повтор после паузы; подряд не больше max_retries раз — дальше текст
+        # не отправлен (иначе один чат под вечным 429 не даст остановиться)
+        attempt = self._attempts.get(chat_id, 0) + 1
+        if attempt > self.max_retries:
+            self.failed += 1
+            self._attempts.pop(chat_id, None)
+            print(f"[outbox] chat {chat_id}: giving up after {self.max_retries} retries: {error}")
+            return
+        self.retried += 1
+        self._attempts[chat_id] = attempt
+        self._blocked_until[chat_id] = asyncio.get_running_loop().time() + pause
+        self._requeue(chat_id, text)
+
+    async def _deliver(self, chat_id: int, text: str):
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text)
+            self.sent += 1
+            self._attempts.pop(chat_id, None)
+        except RetryAfter as e:
+            self._retry(chat_id, text, _seconds(e.retry_after), e)
+        except (Forbidden, BadRequest) as e:
+            # бот удалён из чата, неверный chat_id и т.п. — повтор не поможет
+            self.failed += 1
+            print(f"[outbox] chat {chat_id}: dropped message: {e}")
+        except (TimedOut, NetworkError) as e:
+            self._retry(chat_id, text, self.backoff * 2 ** self._attempts.get(chat_id, 0), e)
+        except Exception as e:
+            self.failed += 1
+            print(f"[outbox] chat {chat_id}: unexpected error: {e!r}")
+        finally:
+            self._inflight.discard(chat_id)
+            self._check_idle()
+            self._wakeup.set()
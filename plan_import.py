@@ -0,0 +1,212 @@
+import codecs
+import csv
+import io
+from datetime import datetime
+from itertools import chain
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Потоковый разбор CSV плана
+#
+# Кодировка и разделитель определяются один раз по префиксу файла, дальше
+# строки читаются и отдаются по одной — файл целиком в память не попадает.
+# Отброшенные строки не теряются молча: они попадают в отчёт reader.rejected.
+#
+# XLSX читается openpyxl в режиме read_only: листы разбираются потоково по
+# строкам, в памяти — только общая таблица строк книги. Лист, названный датой,
+# — план этого дня; остальные листы (корпуса) складываются в план сегодня.
+# Строки и CSV, и XLSX проходят одну проверку (_PlanRows) и уходят в тот же
+# пакетный путь storage.replace_day / sync_day.
+# ───────────────────────────────────────────────────────────────────────────────
+PREFIX_SIZE = 64 * 1024
+MAX_REJECTS = 1000   # подробности храним только по первым строкам, дальше — счётчик
+
+Row = Tuple[int, str, str]
+
+# заголовки колонок (в нижнем регистре, по началу слова) → поле строки плана
+HEADER_WORDS = {
+    "room": 0, "номер": 0, "комн": 0, "№": 0,
+    "maid": 1, "горнич": 1, "сотруд": 1, "фио": 1,
+    "clean": 2, "type": 2, "тип": 2, "уборк": 2, "вид": 2,
+}
+SHEET_DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d.%m.%y")
+
+
+def detect_encoding(prefix: bytes) -> str:
+    # 1) UTF-8 (включая BOM); обрезанный на границе префикса символ — не ошибка
+    try:
+        codecs.getincrementaldecoder("utf-8-sig")().decode(prefix, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        pass
+    # 2) Windows-1251 (битые байты при чтении заменяются)
+    return "cp1251"
+
+
+def detect_delimiter(text: str) -> str:
+    lines = [ln for ln in text.splitlines()[:50] if ln.strip()]
+    semi = sum(ln.count(";") for ln in lines)
+    comma = sum(ln.count(",") for ln in lines)
+    return ";" if semi > comma else ","
+
+
+def header_columns(cells: Sequence[str]) -> Optional[Tuple[int, int, int]]:
+    """Позиции (номер, горничная, тип уборки) по строке заголовка; None — не распознан."""
+    found: Dict[int, int] = {}
+    for pos, cell in enumerate(cells):
+        low = cell.lower()
+        for word, field in HEADER_WORDS.items():
+            if low.startswith(word) and field not in found:
+                found[field] = pos
+                break
+    if len(found) < 3:
+        return None
+    return found[0], found[1], found[2]
+
+
+def sheet_day(title: str) -> Optional[str]:
+    for fmt in SHEET_DATE_FORMATS:
+        try:
+            return datetime.strptime(title.strip(), fmt).date().isoformat()
+        except ValueError:
+            pass
+    return None
+
+
+class _PlanRows:
+    """Общая проверка строк плана и отчёт об отброшенных строках."""
+
+    delimiter = ","
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected_count = 0
+        self.rejected: List[Tuple[object, str, str]] = []   # (где, причина, текст)
+
+    def _reject(self, where, reason: str, parts: List[str]):
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REJECTS:
+            self.rejected.append((where, reason, self.delimiter.join(parts)[:80]))
+
+    def _rows(self, lines: Iterable[Tuple[object, List[str]]]) -> Iterator[Row]:
+        # lines — (где, ячейки) одного источника (файла или листа): у каждого свой заголовок
+        header_seen = False
+        columns = None
+        accepted = 0
+        for where, cells in lines:
+            if columns is not None:
+                parts = [cells[i] if i < len(cells) else "" for i in columns]
+                if not all(parts):
+                    if any(cells):
+                        self._reject(where, "меньше 3 полей", [c for c in cells if c])
+                    continue
+            else:
+                parts = [c for c in cells if c]
+                if not parts:
+                    continue
+                if len(parts) < 3:
+                    self._reject(where, "меньше 3 полей", parts)
+                    continue
+            room, maid, ctype = parts[0], parts[1], parts[2]
+            if not room.isdigit():
+                # первая нечисловая строка — заголовок, остальные — мусор
+                if not header_seen and accepted == 0:
+                    header_seen = True
+                    columns = header_columns(cells)
+                    continue
+                self._reject(where, "номер комнаты не число", parts)
+                continue
+            accepted += 1
+            self.accepted += 1
+            yield int(room), maid, ctype
+
+    def report(self, limit: int = 10) -> str:
+        lines = [f"строка {n}: {reason} — «{raw}»" for n, reason, raw in self.rejected[:limit]]
+        if self.rejected_count > limit:
+            lines.append(f"… и ещё {self.rejected_count - limit}")
+        return "\n".join(lines)
+
+
+class PlanReader(_PlanRows):
+    """
+    Итератор по строкам плана: (room_no, maid, ctype).
+    Поддерживает:
+    - кодировки: utf-8/utf-8-sig/cp1251
+    - разделители: запятая или точка с запятой
+    - наличие/отсутствие заголовка (по заголовку находятся нужные колонки)
+    - пробелы вокруг значений
+    Файл должен поддерживать seek (BytesIO, временный файл).
+    """
+
+    def __init__(self, fobj: BinaryIO):
+        super().__init__()
+        self.fobj = fobj
+        prefix = fobj.read(PREFIX_SIZE)
+        fobj.seek(0)
+        self.encoding = detect_encoding(prefix)
+        head = prefix.decode(self.encoding, errors="ignore")
+        self.preview = head[:160]
+        self.delimiter = detect_delimiter(head)
+
+    def plans(self, today: str) -> List[Tuple[str, Iterator[Row]]]:
+        """CSV — всегда план одного дня."""
+        return [(today, iter(self))]
+
+    def __iter__(self) -> Iterator[Row]:
+        text = io.TextIOWrapper(self.fobj, encoding=self.encoding, errors="replace", newline="")
+        try:
+            reader = csv.reader(text, delimiter=self.delimiter)
+            yield from self._rows((reader.line_num, [p.strip() for p in parts]) for parts in reader)
+        finally:
+            text.detach()
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))   # номер 101 Excel хранит как 101.0
+    return str(value).strip()
+
+
+class XlsxPlanReader(_PlanRows):
+    """
+    Строки плана из книги XLSX (openpyxl, read_only). Листы с датой в
+    названии (2026-01-05, 05.01.2026) — план своего дня, остальные —
+    план сегодня. Конструктор читает только оглавление книги; сами строки
+    разбираются при итерации — вызывайте его и итерацию вне event loop.
+    """
+
+    def __init__(self, fobj: BinaryIO):
+        from openpyxl import load_workbook
+
+        super().__init__()
+        self.wb = load_workbook(fobj, read_only=True, data_only=True)
+        self.sheets = list(self.wb.sheetnames)
+        self.preview = "листы: " + ", ".join(self.sheets)[:150]
+
+    def _sheet_rows(self, title: str) -> Iterator[Row]:
+        ws = self.wb[title]
+        where = title if len(self.sheets) > 1 else ""
+        lines = ((f"{n} ({where})" if where else n, [_cell(v) for v in values])
+                 for n, values in enumerate(ws.iter_rows(values_only=True), start=1))
+        yield from self._rows(lines)
+
+    def plans(self, today: str) -> List[Tuple[str, Iterator[Row]]]:
+        """[(день, строки)]: листы-даты по своим дням, остальные листы — вместе на today."""
+        by_day: Dict[str, List[str]] = {}
+        for title in self.sheets:
+            by_day.setdefault(sheet_day(title) or today, []).append(title)
+        return [(day, chain.from_iterable(self._sheet_rows(t) for t in titles))
+                for day, titles in sorted(by_day.items())]
+
+    def __iter__(self) -> Iterator[Row]:
+        return chain.from_iterable(self._sheet_rows(t) for t in self.sheets)
+
+    def close(self):
+        self.wb.close()
+
+
+def is_xlsx(filename: str, prefix: bytes) -> bool:
+    # .xlsx — zip-архив; без расширения узнаём по сигнатуре
+    return filename.lower().endswith(".xlsx") or prefix.startswith(b"PK\x03\x04")
@@ -0,0 +1,129 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Доска номеров активного дня в памяти процесса (data.db, db.py)
+#
+# Номера дня загружаются одним запросом и дальше живут компактными объектами
+# (__slots__) с индексами по id, имени горничной и maid_tg_id: «Мои номера»
+# и нажатия кнопок не ходят в SQLite. Нажатия (статус, тип, комментарий)
+# меняют объект на месте — в БД их отдельно пишет write-behind; загрузка
+# плана и очистка дня сбрасывают доску дня, следующая выборка читает её заново.
+# Повторяющиеся строки (горничные, типы, статусы) интернируются — у десяти
+# тысяч номеров одна копия «Не убрано».
+# ───────────────────────────────────────────────────────────────────────────────
+DEFAULT_MAX_DAYS = 2   # сегодня и вчера (перенос, поздние отметки)
+
+_INTERNED = ("maid", "cleaning_type", "status", "updated_by")
+
+
+class Room:
+    __slots__ = ("id", "room_no", "maid", "maid_tg_id", "cleaning_type", "status", "comment", "updated_by")
+
+    def __init__(self, id, room_no, maid, maid_tg_id, cleaning_type, status, comment, updated_by):
+        self.id = id
+        self.room_no = room_no
+        self.maid = maid and sys.intern(maid)
+        self.maid_tg_id = maid_tg_id
+        self.cleaning_type = cleaning_type and sys.intern(cleaning_type)
+        self.status = status and sys.intern(status)
+        self.comment = comment or ""
+        self.updated_by = updated_by and sys.intern(updated_by)
+
+    def row(self) -> tuple:
+        """(id, room_no, maid, maid_tg_id, cleaning_type, status, comment) — как выборки rooms в db.py."""
+        return (self.id, self.room_no, self.maid, self.maid_tg_id, self.cleaning_type, self.status, self.comment)
+
+    def full_row(self, day: str) -> tuple:
+        """То же с work_date и updated_by — как db.get_room."""
+        return (self.id, day, self.room_no, self.maid, self.maid_tg_id, self.cleaning_type,
+                self.status, self.comment, self.updated_by)
+
+    def update(self, fields: Dict[str, Any]):
+        for name, value in fields.items():
+            if name in _INTERNED and value:
+                value = sys.intern(value)
+            elif name == "comment":
+                value = value or ""
+            if name in Room.__slots__:
+                setattr(self, name, value)
+
+
+class DayBoard:
+    """Номера одного дня в порядке room_no и индексы к ним."""
+
+    def __init__(self, day: str, rows: Iterable[Sequence]):
+        self.day = day
+        self.rooms: List[Room] = [Room(*r) for r in rows]
+        self.by_id: Dict[int, Room] = {}
+        self.by_maid: Dict[str, List[Room]] = {}
+        self.by_tg: Dict[int, List[Room]] = {}
+        for room in self.rooms:
+            self.by_id[room.id] = room
+            self.by_maid.setdefault(room.maid, []).append(room)
+            if room.maid_tg_id:
+                self.by_tg.setdefault(room.maid_tg_id, []).append(room)
+
+    def for_maid(self, maid_name: Optional[str] = None, maid_tg_id: Optional[int] = None) -> List[Room]:
+        if maid_tg_id:
+            return self.by_tg.get(maid_tg_id, [])
+        return self.by_maid.get(maid_name, [])
+
+
+class RoomBoard:
+    """
+    Доски последних max_days дней. load(day) возвращает строки дня
+    (id, room_no, maid, maid_tg_id, cleaning_type, status, comment, updated_by)
+    в порядке room_no — с учётом ещё не записанных изменений.
+    """
+
+    def __init__(self, load: Callable[[str], Iterable[Sequence]], max_days: int = DEFAULT_MAX_DAYS):
+        self.load = load
+        self.max_days = max_days
+        self.loads = 0
+        self._days: "OrderedDict[str, DayBoard]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, day: str) -> DayBoard:
+        with self._lock:
+            board = self._days.get(day)
+            if board is None:
+                # чтение под блокировкой: сброс дня (после записи) не перепутается с загрузкой
+                board = DayBoard(day, self.load(day))
+                self.loads += 1
+                self._days[day] = board
+                while len(self._days) > self.max_days:
+                    self._days.popitem(last=False)
+            else:
+                self._days.move_to_end(day)
+            return board
+
+    def find(self, room_id: int) -> Optional[Tuple[str, Room]]:
+        """Номер по id среди загруженных дней: (день, номер) или None."""
+        with self._lock:
+            for day, board in self._days.items():
+                room = board.by_id.get(room_id)
+                if room is not None:
+                    return day, room
+        return None
+
+    def update(self, room_id: int, fields: Dict[str, Any]):
+        with self._lock:
+            for board in self._days.values():
+                room = board.by_id.get(room_id)
+                if room is not None:
+                    room.update(fields)
+                    return
+
+    def invalidate(self, day: Optional[str] = None):
+        with self._lock:
+            if day is None:
+                self._days.clear()
+            else:
+                self._days.pop(day, None)
+
+    def size(self) -> int:
+        with self._lock:
+            return sum(len(board.rooms) for board in self._days.values())
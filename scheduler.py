@@ -0,0 +1,146 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import pytz
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Ежедневные события по местному времени многих получателей (автоотчёты чатов)
+#
+# У каждого ключа (чата) — своё время HH:MM и своя таймзона. Ближайшие
+# срабатывания лежат в одной min-куче (unix-время, ключ); таймер один —
+# до вершины кучи. На тике снимаются все наступившие ключи, уходят одним
+# пакетом в fire(), а следующее время каждого пересчитывается заново в его
+# местном времени: переходы на летнее/зимнее время не сдвигают отчёт.
+# Изменение расписания не ищет старую запись в куче: она помечается
+# устаревшей по версии и выбрасывается, когда доходит до вершины.
+# ───────────────────────────────────────────────────────────────────────────────
+MAX_SLEEP = 60.0   # секунд; таймер перепроверяет кучу хотя бы так часто (смена часов, сон)
+
+Key = Hashable
+
+
+@lru_cache(maxsize=None)
+def zone(name: str) -> pytz.BaseTzInfo:
+    return pytz.timezone(name)
+
+
+def next_fire(hh: int, mm: int, tz_name: str, after: float) -> float:
+    """Ближайшее unix-время строго после after, когда в tz_name на часах hh:mm."""
+    tz = zone(tz_name)
+    day = datetime.fromtimestamp(after, tz).date()
+    for add in range(3):
+        d = day + timedelta(days=add)
+        naive = datetime(d.year, d.month, d.day, hh, mm)
+        try:
+            local = tz.localize(naive, is_dst=None)
+        except pytz.NonExistentTimeError:
+            # весенний перевод: этих часов в этот день нет — сразу после скачка
+            local = tz.localize(naive + timedelta(hours=1), is_dst=True)
+        except pytz.AmbiguousTimeError:
+            # осенний перевод: час повторяется — первое из двух
+            local = tz.localize(naive, is_dst=True)
+        ts = local.timestamp()
+        if ts > after:
+            return ts
+    raise AssertionError("next_fire: no occurrence within 3 days")
+
+
+class DailyScheduler:
+    def __init__(self, fire: Callable[[List[Key]], Awaitable[None]],
+                 clock: Callable[[], float] = time.time):
+        self.fire = fire
+        self.clock = clock
+        self.fired = 0
+        self.ticks = 0
+        self._entries: Dict[Key, Tuple[int, int, str, int]] = {}   # ключ -> (hh, mm, tz, версия)
+        self._heap: List[Tuple[float, int, Key]] = []               # (время, версия, ключ)
+        self._version = 0
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self._entries
+
+    def get(self, key: Key) -> Optional[Tuple[int, int, str]]:
+        entry = self._entries.get(key)
+        return entry[:3] if entry else None
+
+    def set(self, key: Key, hh: int, mm: int, tz_name: str):
+        """Запланировать (или перепланировать) ключ на hh:mm ежедневно в tz_name."""
+        zone(tz_name)   # неизвестная таймзона — ошибка здесь, а не на тике
+        self._version += 1
+        self._entries[key] = (hh, mm, tz_name, self._version)
+        heapq.heappush(self._heap, (next_fire(hh, mm, tz_name, self.clock()), self._version, key))
+        self._changed.set()
+
+    def remove(self, key: Key) -> bool:
+        # запись в куче останется и будет выброшена как устаревшая
+        return self._entries.pop(key, None) is not None
+
+    def next_at(self, key: Key) -> Optional[float]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return min((ts for ts, ver, k in self._heap if k == key and ver == entry[3]), default=None)
+
+    def due(self, now: float) -> List[Key]:
+        """Снять с кучи все наступившие ключи и поставить каждый на следующий день."""
+        keys = []
+        while self._heap and self._heap[0][0] <= now:
+            ts, ver, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is None or entry[3] != ver:
+                continue   # удалён или перепланирован
+            keys.append(key)
+            hh, mm, tz_name, _ = entry
+            heapq.heappush(self._heap, (next_fire(hh, mm, tz_name, max(ts, now)), ver, key))
+        # куча не разрастается устаревшими записями при частых перепланированиях
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [item for item in self._heap
+                          if item[2] in self._entries and self._entries[item[2]][3] == item[1]]
+            heapq.heapify(self._heap)
+        return keys
+
+    async def tick(self) -> int:
+        keys = self.due(self.clock())
+        self.ticks += 1
+        if keys:
+            self.fired += len(keys)
+            try:
+                await self.fire(keys)
+            except Exception as e:
+                print(f"[scheduler] fire failed for {len(keys)} keys: {e}")
+        return len(keys)
+
+    async def _run(self):
+        while True:
+            delay = MAX_SLEEP
+            if self._heap:
+                delay = min(max(self._heap[0][0] - self.clock(), 0.0), MAX_SLEEP)
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), delay)
+                continue   # расписание изменилось — пересчитать сон
+            except asyncio.TimeoutError:
+                pass
+            await self.tick()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
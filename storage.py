@@ -0,0 +1,939 @@
+import asyncio
+import heapq
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import metrics
+import migrations
+from daycache import DayCache
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Асинхронный слой хранения плана (таблица plan в asal.db)
+#
+# Одно долгоживущее соединение живёт на выделенном потоке: все запросы
+# выполняются строго последовательно в этом потоке, а обработчики бота лишь
+# ждут результат через run_in_executor и не блокируют event loop.
+# sqlite3 сам кэширует подготовленные выражения на соединении (по тексту SQL),
+# поэтому тексты запросов — константы модуля и соединение не пересоздаётся.
+#
+# Шарды: у каждого объекта (отеля) может быть свой файл БД — asal_<объект>.db
+# рядом с asal.db, со своим потоком, соединением и кэшем дней, так что записи
+# одного объекта не ждут блокировку другого. Какой чат к какому объекту
+# относится, хранит карта shard:<chat_id> в settings основной asal.db;
+# чаты без записи работают с самой asal.db (шард по умолчанию, "").
+# Открытые шарды держатся в LRU; сводки по всем объектам читаются
+# параллельно на отдельном пуле потоков своими соединениями только для чтения.
+#
+# Архив: дни старше срока хранения переезжают из plan в присоединённую БД
+# <файл шарда>.archive.db (archive.plan), а их итоги — в plan_rollup. Горячие
+# таблицы и индексы остаются маленькими; статистика, выгрузки и get_rooms
+# читают архивные дни прозрачно. Освободившиеся страницы возвращаются
+# инкрементальным VACUUM небольшими шагами между запросами обработчиков.
+# ───────────────────────────────────────────────────────────────────────────────
+DB_PATH = "asal.db"
+STATEMENT_CACHE_SIZE = 128
+BATCH_SIZE = 2000   # строк в одной транзакции при потоковой загрузке
+DEFAULT_SHARD = ""
+MAX_OPEN_SHARDS = 16
+FANOUT_WORKERS = 8
+SHARD_KEY_PREFIX = "shard:"
+SHARD_NAME_PREFIX = "shard_name:"   # shard_name:<шард> — имя объекта, как его ввели
+VACUUM_STEP_PAGES = 256   # страниц за один шаг incremental_vacuum (~1 МБ)
+
+# Снимки дней для /report, экспорта и автоотчёта. Снимок кладётся только на
+# потоке хранилища, а все записи сбрасывают его до изменения данных — так что
+# перечитывание после записи встаёт в очередь за ней и не бывает устаревшим.
+# У каждого шарда свой кэш; plan_cache — кэш шарда по умолчанию.
+plan_cache = DayCache()
+
+
+class ShardConnection(sqlite3.Connection):
+    """Соединение шарда; cache — кэш дней этого шарда, archive_path — файл его архива."""
+    cache: DayCache
+    archive_path: str
+
+
+class Store:
+    def __init__(self, path: str, cache: Optional[DayCache] = None):
+        self.path = path
+        self.cache = cache if cache is not None else DayCache()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn: Optional[ShardConnection] = None
+        self.pending = 0   # вызовов в очереди потока хранилища (включая текущий) и закреплений
+        self._pending_lock = threading.Lock()
+
+    def _connection(self) -> ShardConnection:
+        # вызывается только из потока executor'а
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, cached_statements=STATEMENT_CACHE_SIZE,
+                                   factory=ShardConnection)
+            # действует только на новом файле (до первой таблицы); старые — см. convert_incremental
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            conn.cache = self.cache
+            conn.archive_path = archive_path(self.path)
+            # новый файл шарда получает схему при первом открытии
+            migrations.migrate(conn, migrations.PLAN_MIGRATIONS)
+            self._conn = conn
+        return self._conn
+
+    def _run(self, fn, args):
+        # каждая функция хранилища меряется здесь: время, записанные строки
+        # (по total_changes соединения) и прочитанные (длина списка-результата)
+        name = fn.__name__.lstrip("_")
+        try:
+            conn = self._connection()
+            changes = conn.total_changes
+            with metrics.timed("storage", fn=name):
+                try:
+                    result = fn(conn, *args)
+                finally:
+                    if conn.total_changes > changes:
+                        metrics.inc("storage_rows_written_total", conn.total_changes - changes, fn=name)
+        finally:
+            self._track(-1)
+        if isinstance(result, (list, tuple)) and result and isinstance(result[0], sqlite3.Row):
+            metrics.inc("storage_rows_read_total", len(result), fn=name)
+        return result
+
+    def _track(self, delta: int):
+        with self._pending_lock:
+            self.pending += delta
+
+    def call(self, fn, *args):
+        """Синхронный вызов (для старта и скриптов)."""
+        self._track(1)
+        return self._executor.submit(self._run, fn, args).result()
+
+    async def acall(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        self._track(1)
+        return await loop.run_in_executor(self._executor, self._run, fn, args)
+
+    @contextmanager
+    def pinned(self):
+        """Не вытеснять шард из LRU на время нескольких вызовов подряд (между await)."""
+        self._track(1)
+        try:
+            yield self
+        finally:
+            self._track(-1)
+
+    def close(self, wait: bool = True):
+        # wait=False — не ждать: закрытие встаёт в очередь потока шарда за
+        # начатыми вызовами, поток завершится сам (так закрываются вытесненные)
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        done = self._executor.submit(_close)
+        if wait:
+            done.result()
+        self._executor.shutdown(wait=wait)
+
+
+_stores: "OrderedDict[str, Store]" = OrderedDict()
+_stores_lock = threading.Lock()
+_shard_map: Dict[int, str] = {}       # chat_id -> объект (копия settings shard:*)
+_shard_names: Dict[str, str] = {}    # шард -> имя объекта для показа (settings shard_name:*)
+_shard_map_loaded = False
+_listeners: List[Callable[[str, Optional[str]], None]] = []
+_fanout: Optional[ThreadPoolExecutor] = None
+
+
+def shard_path(shard: str) -> str:
+    if shard == DEFAULT_SHARD:
+        return DB_PATH
+    base, ext = os.path.splitext(DB_PATH)
+    return f"{base}_{shard}{ext or '.db'}"
+
+
+def archive_path(path: str) -> str:
+    # «.archive» — с точкой, которой нет в именах шардов (normalize_shard):
+    # объект «archive» или «x_archive» не попадёт в чужой архив
+    base, ext = os.path.splitext(path)
+    return f"{base}.archive{ext or '.db'}"
+
+
+# кириллица (русская и узбекская) → латиница для имён файлов шардов
+_TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo", "ж": "zh", "з": "z",
+    "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r",
+    "с": "s", "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    "ў": "o", "қ": "q", "ғ": "g", "ҳ": "h",
+})
+
+
+def normalize_shard(name: str) -> str:
+    """
+    Имя объекта → имя шарда (безопасное для имени файла): кириллица
+    транслитерируется, остальное вне [0-9a-z_-] заменяется на «_».
+    Пустой результат — имя не годится (см. assign_shard).
+    """
+    name = name.strip().lower().translate(_TRANSLIT)
+    return re.sub(r"[^0-9a-z_-]+", "_", name).strip("_-")
+
+
+def store(shard: str = DEFAULT_SHARD) -> Store:
+    with _stores_lock:
+        st = _stores.get(shard)
+        if st is not None:
+            _stores.move_to_end(shard)
+            return st
+        if shard == DEFAULT_SHARD:
+            st = Store(DB_PATH, plan_cache)
+        else:
+            st = Store(shard_path(shard))
+            st.cache.subscribe(lambda day, shard=shard: _notify(shard, day))
+        _stores[shard] = st
+        evict = [name for name, s in _stores.items()
+                 if name != DEFAULT_SHARD and name != shard and not s.pending]
+        evict = evict[:max(0, len(_stores) - MAX_OPEN_SHARDS)]
+        closing = [_stores.pop(name) for name in evict]
+    # вытесняем только простаивающие шарды; закрытие — вне замка и без
+    # ожидания: store() зовут с event loop
+    for old in closing:
+        old.close(wait=False)
+    return st
+
+
+def open_shards() -> List[str]:
+    with _stores_lock:
+        return list(_stores)
+
+
+metrics.gauge("storage_queue_depth", lambda: sum(s.pending for s in list(_stores.values())))
+metrics.gauge("storage_open_shards", lambda: len(_stores))
+
+
+def _cache_gauge(part: str) -> Callable[[], Dict[str, int]]:
+    # пустая метка в Prometheus — то же, что её нет: основной шард — "default"
+    return lambda: {shard or "default": stats[part] for shard, stats in cache_stats().items()}
+
+
+# попадания/промахи кэша дня — по каждому открытому шарду
+metrics.gauge("storage_cache_hits", _cache_gauge("hits"), label="shard")
+metrics.gauge("storage_cache_misses", _cache_gauge("misses"), label="shard")
+
+
+def subscribe(fn: Callable[[str, Optional[str]], None]):
+    """fn(shard, day) — после каждого сброса кэша дня в любом шарде (из потока шарда)."""
+    _listeners.append(fn)
+
+
+def _notify(shard: str, day: Optional[str]):
+    for fn in _listeners:
+        fn(shard, day)
+
+
+plan_cache.subscribe(lambda day: _notify(DEFAULT_SHARD, day))
+
+
+def close():
+    global _fanout, _shard_map_loaded
+    _shard_map_loaded = False
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for st in stores:
+        st.close()
+    if _fanout is not None:
+        _fanout.shutdown(wait=True)
+        _fanout = None
+
+# ───────────────────────────────────────────────────────────────────────────────
+# SQL
+# ───────────────────────────────────────────────────────────────────────────────
+SQL_CLEAR_DAY = "DELETE FROM plan WHERE day=?"
+# повтор номера в файле — побеждает последняя строка (day+room_no уникальны)
+SQL_INSERT_ROW = (
+    "INSERT INTO plan(day, room_no, maid, ctype) VALUES (?,?,?,?) "
+    "ON CONFLICT(day, room_no) DO UPDATE SET maid=excluded.maid, ctype=excluded.ctype"
+)
+# Повторная загрузка: новый план сначала складывается во временную таблицу,
+# затем к plan применяется только разница — одним набором запросов.
+SQL_CREATE_UPLOAD = """
+    CREATE TEMP TABLE IF NOT EXISTS plan_upload (
+        room_no INTEGER PRIMARY KEY,
+        maid TEXT NOT NULL,
+        ctype TEXT NOT NULL
+    )
+"""
+SQL_UPLOAD_ROW = "INSERT OR REPLACE INTO plan_upload(room_no, maid, ctype) VALUES (?,?,?)"
+# новый файл — весь план дня: номера не из файла удаляются, в том числе
+# перенесённые со вчера (иначе план копил бы все когда-либо назначенные номера)
+SQL_DIFF_DELETE = (
+    "DELETE FROM plan WHERE day=? AND room_no NOT IN (SELECT room_no FROM plan_upload)"
+)
+SQL_DIFF_UPDATE = (
+    "UPDATE plan SET (maid, ctype) = "
+    "(SELECT u.maid, u.ctype FROM plan_upload u WHERE u.room_no=plan.room_no) "
+    "WHERE day=? AND EXISTS (SELECT 1 FROM plan_upload u WHERE u.room_no=plan.room_no "
+    "AND (u.maid!=plan.maid OR u.ctype!=plan.ctype))"
+)
+SQL_DIFF_INSERT = (
+    "INSERT INTO plan(day, room_no, maid, ctype) "
+    "SELECT ?, u.room_no, u.maid, u.ctype FROM plan_upload u "
+    "WHERE NOT EXISTS (SELECT 1 FROM plan p WHERE p.day=? AND p.room_no=u.room_no)"
+)
+SQL_GET_ROOMS = (
+    "SELECT room_no, maid, ctype, status, COALESCE(comment,'') comment "
+    "FROM plan WHERE day=? ORDER BY room_no"
+)
+# Перенос неубранного: одна вставка-выборка; уже перенесённые (или заново
+# запланированные) номера пропускаются по уникальному (day, room_no).
+# Статус переезжает как есть: номер, не убранный и второй день, перенесётся снова.
+SQL_CARRY_OVER = (
+    "INSERT INTO plan(day, room_no, maid, ctype, status, comment, carried_from) "
+    "SELECT ?, room_no, maid, ctype, status, comment, day FROM plan "
+    "WHERE day=? AND status!='Готово' "
+    "ON CONFLICT(day, room_no) DO NOTHING"
+)
+SQL_RANGE_ROWS = (
+    "SELECT day, room_no, maid, ctype, status, COALESCE(comment,'') comment "
+    "FROM plan WHERE day BETWEEN ? AND ? ORDER BY day, room_no"
+)
+SQL_ARCHIVE_RANGE_ROWS = SQL_RANGE_ROWS.replace("FROM plan", "FROM archive.plan")
+SQL_ARCHIVE_ROOMS = SQL_GET_ROOMS.replace("FROM plan", "FROM archive.plan")
+# статистика читается из счётчиков plan_stats (их ведут триггеры, см. migrations.py),
+# а по архивным дням — из plan_rollup; день бывает только в одной из них
+SQL_GET_STATS = (
+    "SELECT COALESCE(SUM(total),0) total, COALESCE(SUM(done),0) done FROM ("
+    " SELECT total, done FROM plan_stats WHERE day=?"
+    " UNION ALL SELECT total, done FROM plan_rollup WHERE day=?)"
+)
+SQL_MAID_COUNTS = (
+    "SELECT maid, SUM(total) total, SUM(done) done FROM ("
+    " SELECT maid, total, done FROM plan_stats WHERE day=?"
+    " UNION ALL SELECT maid, total, done FROM plan_rollup WHERE day=?"
+    ") GROUP BY maid ORDER BY maid"
+)
+# Аналитика за диапазон — только по счётчикам (plan_stats + plan_rollup):
+# строк в них — дни × горничные × типы уборки, без единого номера
+SQL_RANGE_COUNTERS = (
+    "SELECT day, maid, ctype, total, done FROM plan_stats WHERE day BETWEEN ? AND ?"
+    " UNION ALL SELECT day, maid, ctype, total, done FROM plan_rollup WHERE day BETWEEN ? AND ?"
+)
+# дней — сколько разных дней у горничной (недели) вообще, по всем типам
+# уборки: полные в одни дни и текущие в другие не должны делить дни
+SQL_RANGE_BY_MAID = (
+    f"WITH c AS ({SQL_RANGE_COUNTERS}), "
+    "d AS (SELECT maid, COUNT(DISTINCT day) days FROM c GROUP BY maid) "
+    "SELECT c.maid, c.ctype, d.days, SUM(c.total) total, SUM(c.done) done "
+    "FROM c JOIN d ON d.maid=c.maid GROUP BY c.maid, c.ctype ORDER BY c.maid, c.ctype"
+)
+# неделя — по понедельнику, в который она начинается
+SQL_RANGE_BY_WEEK = (
+    f"WITH c AS (SELECT date(day, '-6 days', 'weekday 1') week, * FROM ({SQL_RANGE_COUNTERS}) WHERE maid=?), "
+    "d AS (SELECT week, COUNT(DISTINCT day) days FROM c GROUP BY week) "
+    "SELECT c.week, c.ctype, d.days, SUM(c.total) total, SUM(c.done) done "
+    "FROM c JOIN d ON d.week=c.week GROUP BY c.week, c.ctype ORDER BY c.week, c.ctype"
+)
+# Поиск по комментариям (plan_fts, см. migrations.py). Частое слово за годы
+# даёт тысячи совпадений, а bm25 и COUNT по всем — линейны по истории.
+# Поэтому индекс обходится от новых записей к старым (rowid по убыванию —
+# родной порядок FTS5, без сортировки; архивирование id заметок сохраняет) и ранжируется только окно из
+# FIND_WINDOW последних совпадений: время поиска не растёт с историей.
+FIND_WINDOW = 1000
+SQL_FIND = (
+    "SELECT n.day, n.room_no, n.maid, n.comment, plan_fts.rank rank "
+    "FROM plan_fts JOIN plan_notes n ON n.id = plan_fts.rowid "
+    "WHERE plan_fts MATCH ? AND n.day BETWEEN ? AND ? ORDER BY plan_fts.rowid DESC LIMIT ?"
+)
+# Архив: та же строка плана, ключ (day, room_no) — выгрузка идёт без сортировки
+SQL_ARCHIVE_CREATE = """
+    CREATE TABLE IF NOT EXISTS archive.plan (
+        day TEXT NOT NULL,
+        room_no INTEGER NOT NULL,
+        maid TEXT NOT NULL,
+        ctype TEXT NOT NULL,
+        status TEXT NOT NULL,
+        comment TEXT,
+        carried_from TEXT,
+        PRIMARY KEY (day, room_no)
+    ) WITHOUT ROWID
+"""
+SQL_ARCHIVE_DAYS = "SELECT DISTINCT day FROM plan WHERE day < ? ORDER BY day LIMIT ?"
+SQL_ARCHIVE_ROLLUP = (
+    "INSERT INTO plan_rollup(day, maid, ctype, total, done) "
+    "SELECT day, maid, ctype, total, done FROM plan_stats WHERE day=? "
+    "ON CONFLICT(day, maid, ctype) DO UPDATE "
+    "SET total=total+excluded.total, done=done+excluded.done"
+)
+SQL_IS_ARCHIVED = "SELECT 1 FROM plan_rollup WHERE day=? LIMIT 1"
+SQL_UNARCHIVE_COPY = (
+    "INSERT OR IGNORE INTO plan(day, room_no, maid, ctype, status, comment, carried_from) "
+    "SELECT day, room_no, maid, ctype, status, comment, carried_from FROM archive.plan WHERE day=?"
+)
+# Комментарии архивного дня остаются в поиске: перед удалением из plan (его
+# триггер удаляет и заметки) они откладываются во временную таблицу и
+# возвращаются с прежними id — окно поиска идёт по id от новых к старым,
+# и новые id сделали бы старые архивные заметки «самыми свежими».
+SQL_CREATE_SAVED_NOTES = """
+    CREATE TEMP TABLE IF NOT EXISTS saved_notes (
+        id INTEGER PRIMARY KEY,
+        day TEXT NOT NULL,
+        room_no INTEGER NOT NULL,
+        maid TEXT NOT NULL,
+        comment TEXT NOT NULL
+    )
+"""
+SQL_SAVE_NOTES = (
+    "INSERT INTO saved_notes(id, day, room_no, maid, comment) "
+    "SELECT id, day, room_no, maid, comment FROM plan_notes WHERE day=?"
+)
+SQL_ARCHIVE_NOTES = (
+    "INSERT INTO plan_notes(id, day, room_no, maid, comment) "
+    "SELECT id, day, room_no, maid, comment FROM saved_notes"
+)
+SQL_ARCHIVE_COPY = (
+    "INSERT OR REPLACE INTO archive.plan(day, room_no, maid, ctype, status, comment, carried_from) "
+    "SELECT day, room_no, maid, ctype, status, comment, carried_from FROM plan WHERE day=?"
+)
+# расхождения счётчиков с живыми строками plan
+SQL_STATS_MISMATCH = (
+    "SELECT day, maid, ctype, SUM(lt) live_total, SUM(ld) live_done, SUM(ct) total, SUM(cd) done FROM ("
+    " SELECT day, maid, ctype, COUNT(*) lt, SUM(status='Готово') ld, 0 ct, 0 cd"
+    " FROM plan GROUP BY day, maid, ctype"
+    " UNION ALL"
+    " SELECT day, maid, ctype, 0, 0, total, done FROM plan_stats"
+    ") GROUP BY day, maid, ctype HAVING SUM(lt)!=SUM(ct) OR SUM(ld)!=SUM(cd)"
+)
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Синхронные реализации (выполняются на потоке хранилища)
+# ───────────────────────────────────────────────────────────────────────────────
+def _init_db(conn: ShardConnection) -> List[Tuple[str, str]]:
+    # схему накатывает Store._connection(); здесь — карта шардов и их имена
+    return _get_settings(conn, SHARD_KEY_PREFIX) + _get_settings(conn, SHARD_NAME_PREFIX)
+
+
+def _clear_day(conn: ShardConnection, day: str):
+    conn.cache.invalidate(day)
+    _unarchive(conn, day)
+    with conn:
+        conn.execute(SQL_CLEAR_DAY, (day,))
+
+
+def _insert_rows(conn: ShardConnection, day: str, rows: List[Tuple[int, str, str]]):
+    conn.cache.invalidate(day)
+    _unarchive(conn, day)
+    with conn:
+        conn.executemany(SQL_INSERT_ROW, [(day, int(r), m, c) for r, m, c in rows])
+
+
+def _replace_day(conn: ShardConnection, day: str, rows: Iterable[Tuple[int, str, str]],
+                 batch_size: int) -> int:
+    # Строки берутся из итератора порциями фиксированного размера: очистка дня
+    # идёт в одной транзакции с первой порцией, остальные — отдельными.
+    # Пустой файл план не трогает.
+    conn.cache.invalidate(day)
+    _unarchive(conn, day)
+    it = iter(rows)
+    total = 0
+    while True:
+        batch = [(day, int(r), m, c) for r, m, c in islice(it, batch_size)]
+        if not batch:
+            break
+        with conn:
+            if total == 0:
+                conn.execute(SQL_CLEAR_DAY, (day,))
+            conn.executemany(SQL_INSERT_ROW, batch)
+        total += len(batch)
+    return total
+
+
+def _sync_day(conn: ShardConnection, day: str, rows: Iterable[Tuple[int, str, str]],
+              batch_size: int) -> Tuple[int, int, int, int]:
+    # Всё — и наполнение plan_upload, и изменения plan — в одной транзакции:
+    # /report видит либо старый план, либо новый, статусы и комментарии
+    # у неизменённых номеров сохраняются.
+    conn.cache.invalidate(day)
+    _unarchive(conn, day)
+    conn.execute(SQL_CREATE_UPLOAD)
+    it = iter(rows)
+    with conn:
+        conn.execute("DELETE FROM plan_upload")
+        loaded = 0
+        while True:
+            batch = [(int(r), m, c) for r, m, c in islice(it, batch_size)]
+            if not batch:
+                break
+            conn.executemany(SQL_UPLOAD_ROW, batch)
+            loaded += len(batch)
+        if not loaded:
+            return 0, 0, 0, 0
+        deleted = conn.execute(SQL_DIFF_DELETE, (day,)).rowcount
+        updated = conn.execute(SQL_DIFF_UPDATE, (day,)).rowcount
+        inserted = conn.execute(SQL_DIFF_INSERT, (day, day)).rowcount
+        conn.execute("DELETE FROM plan_upload")
+    return loaded, inserted, updated, deleted
+
+
+def _carry_over(conn: ShardConnection, src_day: str, dst_day: str) -> int:
+    conn.cache.invalidate(dst_day)
+    _unarchive(conn, src_day)
+    _unarchive(conn, dst_day)
+    with conn:
+        return conn.execute(SQL_CARRY_OVER, (dst_day, src_day)).rowcount
+
+
+def _get_settings(conn: ShardConnection, prefix: str) -> List[Tuple[str, str]]:
+    return [tuple(r) for r in conn.execute(
+        "SELECT key, value FROM settings WHERE key LIKE ? ORDER BY key", (prefix + "%",))]
+
+
+def _set_setting(conn: ShardConnection, key: str, value: Optional[str]):
+    with conn:
+        if value is None:
+            conn.execute("DELETE FROM settings WHERE key=?", (key,))
+        else:
+            conn.execute("INSERT INTO settings(key,value) VALUES(?,?) "
+                         "ON CONFLICT(key) DO UPDATE SET value=excluded.value", (key, value))
+
+
+def _get_rooms(conn: ShardConnection, day: str):
+    rows = tuple(conn.execute(SQL_GET_ROOMS, (day,)).fetchall())
+    if not rows and _attach_archive(conn, create=False):
+        rows = tuple(conn.execute(SQL_ARCHIVE_ROOMS, (day,)).fetchall())
+    done = sum(1 for r in rows if r["status"] == "Готово")
+    conn.cache.put(day, "rows", rows)
+    conn.cache.put(day, "stats", (len(rows), done, len(rows) - done))
+    return rows
+
+
+def _get_stats(conn: ShardConnection, day: str) -> Tuple[int, int, int]:
+    row = conn.execute(SQL_GET_STATS, (day, day)).fetchone()
+    stats = row["total"], row["done"], row["total"] - row["done"]
+    conn.cache.put(day, "stats", stats)
+    return stats
+
+
+def _get_maid_counts(conn: ShardConnection, day: str) -> List[Tuple[str, int, int]]:
+    counts = [(r["maid"], r["total"], r["done"]) for r in conn.execute(SQL_MAID_COUNTS, (day, day))]
+    conn.cache.put(day, "by_maid", counts)
+    return counts
+
+
+def _range_stats(conn: ShardConnection, day_from: str, day_to: str,
+                 maid: Optional[str]) -> List[Tuple[str, str, int, int, int]]:
+    args = (day_from, day_to, day_from, day_to)
+    if maid is None:
+        cur = conn.execute(SQL_RANGE_BY_MAID, args)
+    else:
+        cur = conn.execute(SQL_RANGE_BY_WEEK, args + (maid,))
+    return [tuple(r) for r in cur]
+
+
+def _find(conn: ShardConnection, query: str, day_from: str, day_to: str,
+          limit: int, offset: int) -> Tuple[int, List[sqlite3.Row]]:
+    rows = conn.execute(SQL_FIND, (query, day_from, day_to, FIND_WINDOW + 1)).fetchall()
+    total = len(rows)
+    # лучшие (меньший rank bm25) — первыми, при равенстве — свежие дни
+    rows = sorted(rows[:FIND_WINDOW], key=lambda r: r["day"], reverse=True)
+    rows.sort(key=lambda r: r["rank"])
+    return total, rows[offset:offset + limit]
+
+
+def _check_stats(conn: ShardConnection, repair: bool) -> List[sqlite3.Row]:
+    mismatches = conn.execute(SQL_STATS_MISMATCH).fetchall()
+    if mismatches and repair:
+        conn.cache.invalidate()
+        with conn:
+            conn.execute("DELETE FROM plan_stats")
+            conn.execute(migrations.PLAN_STATS_REBUILD)
+    return mismatches
+
+def _attach_archive(conn: ShardConnection, create: bool) -> bool:
+    """Присоединить архив шарда как archive (create=False — только если файл уже есть)."""
+    if any(r[1] == "archive" for r in conn.execute("PRAGMA database_list")):
+        return True
+    if not create and not os.path.exists(conn.archive_path):
+        return False
+    conn.execute("ATTACH DATABASE ? AS archive", (conn.archive_path,))
+    conn.execute("PRAGMA archive.journal_mode=WAL")
+    conn.execute(SQL_ARCHIVE_CREATE)
+    return True
+
+
+def _unarchive(conn: ShardConnection, day: str):
+    # Запись в архивный день (повторная загрузка старого плана) сначала
+    # возвращает его строки в plan — день всегда живёт только в одном месте
+    # и итоги не задваиваются.
+    if conn.execute(SQL_IS_ARCHIVED, (day,)).fetchone() is None:
+        return
+    # Как и в _archive_day, файлы фиксируются по очереди: сначала строки
+    # возвращаются в plan, и только затем удаляются из архива.
+    _attach_archive(conn, create=True)
+    with conn:
+        conn.execute(SQL_UNARCHIVE_COPY, (day,))
+        conn.execute("DELETE FROM plan_rollup WHERE day=?", (day,))
+    with conn:
+        conn.execute("DELETE FROM archive.plan WHERE day=?", (day,))
+
+
+def _archive_days(conn: ShardConnection, before: str, limit: int) -> List[str]:
+    return [r[0] for r in conn.execute(SQL_ARCHIVE_DAYS, (before, limit))]
+
+
+def _archive_day(conn: ShardConnection, day: str) -> int:
+    # Архив — другой файл, а в WAL SQLite фиксирует файлы по отдельности, не
+    # атомарно вместе. Поэтому сначала строки копируются в архив и фиксируются,
+    # и только потом отдельной транзакцией основной БД итоги уходят в
+    # plan_rollup, а день удаляется из plan (триггеры уберут plan_stats).
+    # При сбое между ними день остаётся в plan, и следующий запуск перепишет
+    # его в архив заново (INSERT OR REPLACE).
+    _attach_archive(conn, create=True)
+    conn.cache.invalidate(day)
+    with conn:
+        moved = conn.execute(SQL_ARCHIVE_COPY, (day,)).rowcount
+    conn.execute(SQL_CREATE_SAVED_NOTES)
+    with conn:
+        conn.execute("DELETE FROM saved_notes")
+        conn.execute(SQL_SAVE_NOTES, (day,))
+        conn.execute(SQL_ARCHIVE_ROLLUP, (day,))
+        conn.execute(SQL_CLEAR_DAY, (day,))
+        conn.execute(SQL_ARCHIVE_NOTES)
+        conn.execute("DELETE FROM saved_notes")
+    return moved
+
+
+def _vacuum_step(conn: ShardConnection, pages: int) -> int:
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:   # не INCREMENTAL
+        return 0
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if before:
+        conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+    return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def _convert_incremental(conn: ShardConnection):
+    # смена auto_vacuum на существующем файле вступает в силу только после VACUUM
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+def _archive_status(conn: ShardConnection) -> dict:
+    status = {
+        "hot_days": conn.execute("SELECT COUNT(DISTINCT day) FROM plan_stats").fetchone()[0],
+        "hot_rows": conn.execute("SELECT COALESCE(SUM(total),0) FROM plan_stats").fetchone()[0],
+        "archived_days": conn.execute("SELECT COUNT(DISTINCT day) FROM plan_rollup").fetchone()[0],
+        "free_pages": conn.execute("PRAGMA freelist_count").fetchone()[0],
+        "incremental": conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2,
+    }
+    if os.path.exists(conn.archive_path):
+        status["archive_bytes"] = os.path.getsize(conn.archive_path)
+    return status
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Публичный API
+# ───────────────────────────────────────────────────────────────────────────────
+def _install_shard_map(settings: List[Tuple[str, str]]):
+    # карта собирается целиком и подменяется одним присваиванием: читатели
+    # на event loop никогда не видят её пустой или наполовину загруженной
+    global _shard_map, _shard_names, _shard_map_loaded
+    shard_map: Dict[int, str] = {}
+    names: Dict[str, str] = {}
+    for key, value in settings:
+        if key.startswith(SHARD_NAME_PREFIX):
+            names[key[len(SHARD_NAME_PREFIX):]] = value
+        else:
+            shard_map[int(key[len(SHARD_KEY_PREFIX):])] = value
+    _shard_map, _shard_names = shard_map, names
+    _shard_map_loaded = True
+
+
+async def load_shard_map():
+    """
+    Открыть основную asal.db (схема накатывается на потоке хранилища) и
+    загрузить карту объектов, если она ещё не загружена. Бот вызывает это
+    до обработчиков апдейтов, так что shard_for на event loop не ходит в БД.
+    """
+    if not _shard_map_loaded:
+        _install_shard_map(await store().acall(_init_db))
+
+
+def init_db():
+    """Синхронный вариант load_shard_map — для скриптов и замеров (не с event loop)."""
+    if not _shard_map_loaded:
+        _install_shard_map(store().call(_init_db))
+
+
+def _shards_loaded() -> Dict[int, str]:
+    # в боте карта уже загружена (load_shard_map); синхронная загрузка — для скриптов
+    if not _shard_map_loaded:
+        init_db()
+    return _shard_map
+
+
+def shard_for(chat_id: int) -> str:
+    """Шард (объект) чата; чаты без записи в карте — в шарде по умолчанию."""
+    return _shards_loaded().get(chat_id, DEFAULT_SHARD)
+
+
+def shards() -> List[str]:
+    """Все известные шарды: по умолчанию и упомянутые в карте."""
+    return [DEFAULT_SHARD] + sorted(set(_shards_loaded().values()) - {DEFAULT_SHARD})
+
+
+async def assign_shard(chat_id: int, name: str) -> str:
+    """
+    Привязать чат к объекту name (пустое имя — вернуть в шард по умолчанию).
+    Данные не переносятся: у нового объекта план начинается с чистого файла.
+    Имя, из которого не получается имя файла (одни знаки), — ValueError.
+    """
+    shard = normalize_shard(name)
+    if name.strip() and not shard:
+        raise ValueError(f"имя объекта «{name}» не годится: нужны буквы или цифры")
+    await load_shard_map()
+    await set_setting(SHARD_KEY_PREFIX + str(chat_id), shard or None)
+    if shard:
+        _shard_map[chat_id] = shard
+        if shard not in _shard_names:
+            await set_setting(SHARD_NAME_PREFIX + shard, name.strip())
+            _shard_names[shard] = name.strip()
+    else:
+        _shard_map.pop(chat_id, None)
+    return shard
+
+
+def shard_title(shard: str) -> str:
+    """Имя объекта для показа: как его ввели в /property (основной — «основной»)."""
+    if shard == DEFAULT_SHARD:
+        return "основной"
+    return _shard_names.get(shard, shard)
+
+
+async def clear_day(day: str, shard: str = DEFAULT_SHARD):
+    await store(shard).acall(_clear_day, day)
+
+
+async def insert_rows(day: str, rows: List[Tuple[int, str, str]], shard: str = DEFAULT_SHARD):
+    await store(shard).acall(_insert_rows, day, rows)
+
+
+async def replace_day(day: str, rows: Iterable[Tuple[int, str, str]],
+                      batch_size: int = BATCH_SIZE, shard: str = DEFAULT_SHARD) -> int:
+    """
+    Заменить план дня строками из (ленивого) итератора. Итератор
+    потребляется на потоке хранилища, поэтому разбор файла тоже уходит
+    с event loop. Возвращает число вставленных строк.
+    """
+    return await store(shard).acall(_replace_day, day, rows, batch_size)
+
+
+async def sync_day(day: str, rows: Iterable[Tuple[int, str, str]],
+                   batch_size: int = BATCH_SIZE,
+                   shard: str = DEFAULT_SHARD) -> Tuple[int, int, int, int]:
+    """
+    Повторная загрузка плана дня: применяет к plan только разницу с новым
+    файлом (новые номера, удалённые номера, смену горничной/типа) в одной
+    транзакции. Возвращает (строк в файле, добавлено, изменено, удалено).
+    """
+    return await store(shard).acall(_sync_day, day, rows, batch_size)
+
+
+async def carry_over(src_day: str, dst_day: str, shard: str = DEFAULT_SHARD) -> int:
+    """
+    Перенести все не «Готово» номера дня src_day в день dst_day (статус и
+    комментарий сохраняются, carried_from = src_day).
+    Повторный вызов ничего не дублирует. Возвращает число перенесённых номеров.
+    """
+    return await store(shard).acall(_carry_over, src_day, dst_day)
+
+
+async def get_rooms(day: str, shard: str = DEFAULT_SHARD):
+    rows = store(shard).cache.get(day, "rows")
+    if rows is None:
+        rows = await store(shard).acall(_get_rooms, day)
+    return rows
+
+
+async def get_stats(day: str, shard: str = DEFAULT_SHARD) -> Tuple[int, int, int]:
+    stats = store(shard).cache.get(day, "stats")
+    if stats is None:
+        stats = await store(shard).acall(_get_stats, day)
+    return stats
+
+
+async def get_maid_counts(day: str, shard: str = DEFAULT_SHARD) -> List[Tuple[str, int, int]]:
+    """[(горничная, всего номеров, готово)] за день — из счётчиков, без чтения plan."""
+    counts = store(shard).cache.get(day, "by_maid")
+    if counts is None:
+        counts = await store(shard).acall(_get_maid_counts, day)
+    return counts
+
+
+async def range_stats(day_from: str, day_to: str, maid: Optional[str] = None,
+                      shard: str = DEFAULT_SHARD) -> List[Tuple[str, str, int, int, int]]:
+    """
+    Выработка за диапазон дней по счётчикам, без чтения plan:
+    [(горничная, тип уборки, дней, номеров, готово)], а для одной горничной
+    (maid) — по неделям: [(понедельник недели, тип уборки, дней, номеров, готово)].
+    «Дней» — у горничной (недели) целиком, одинаково во всех её строках.
+    Архивные дни входят через plan_rollup.
+    """
+    return await store(shard).acall(_range_stats, day_from, day_to, maid)
+
+
+async def find_comments(text: str, day_from: str = "0000-00-00", day_to: str = "9999-12-31",
+                        limit: int = 10, offset: int = 0,
+                        shard: str = DEFAULT_SHARD) -> Tuple[int, List[sqlite3.Row]]:
+    """
+    Полнотекстовый поиск по комментариям плана (включая архивные дни):
+    (всего совпадений, страница строк day, room_no, maid, comment, rank),
+    лучшие совпадения первыми. Ранжируются FIND_WINDOW последних совпадений;
+    всего > FIND_WINDOW значит «больше, показаны самые свежие».
+    """
+    query = migrations.fts_query(text)
+    if query is None:
+        return 0, []
+    return await store(shard).acall(_find, query, day_from, day_to, limit, offset)
+
+
+async def check_stats(repair: bool = False, shard: str = DEFAULT_SHARD) -> List[sqlite3.Row]:
+    """
+    Сверить счётчики plan_stats с таблицей plan. Возвращает расхождения
+    (day, maid, ctype, live_total, live_done, total, done); при repair=True
+    счётчики пересобираются с нуля.
+    """
+    return await store(shard).acall(_check_stats, repair)
+
+
+async def archive_before(cutoff: str, shard: str = DEFAULT_SHARD,
+                         batch_days: int = 1) -> Tuple[int, int]:
+    """
+    Перенести дни раньше cutoff из plan в архив шарда, итоги — в plan_rollup.
+    Каждый день — отдельный вызов потока хранилища, так что запросы
+    обработчиков идут между ними. Возвращает (дней, строк).
+    """
+    days = rows = 0
+    with store(shard).pinned() as s:
+        while True:
+            batch = await s.acall(_archive_days, cutoff, batch_days)
+            if not batch:
+                break
+            for day in batch:
+                rows += await s.acall(_archive_day, day)
+                days += 1
+    return days, rows
+
+
+async def incremental_vacuum(shard: str = DEFAULT_SHARD,
+                             step_pages: int = VACUUM_STEP_PAGES) -> int:
+    """
+    Вернуть ОС свободные страницы шарда шагами по step_pages (только при
+    auto_vacuum=INCREMENTAL). Возвращает число освобождённых страниц.
+    """
+    freed = 0
+    with store(shard).pinned() as s:
+        while True:
+            step = await s.acall(_vacuum_step, step_pages)
+            if step <= 0:
+                return freed
+            freed += step
+
+
+async def convert_incremental(shard: str = DEFAULT_SHARD):
+    """Перевести существующий файл шарда на auto_vacuum=INCREMENTAL (полный VACUUM — долго)."""
+    await store(shard).acall(_convert_incremental)
+
+
+async def archive_status(shard: str = DEFAULT_SHARD) -> dict:
+    """Размер горячей части и архива шарда: дни/строки в plan, дни в архиве, свободные страницы."""
+    return await store(shard).acall(_archive_status)
+
+
+async def get_settings(prefix: str) -> List[Tuple[str, str]]:
+    """Все настройки основной asal.db (общие для всех шардов), ключ которых начинается с prefix: [(key, value)]."""
+    return await store().acall(_get_settings, prefix)
+
+
+async def set_setting(key: str, value: Optional[str]):
+    """Записать настройку (value=None — удалить)."""
+    await store().acall(_set_setting, key, value)
+
+
+def iter_range(day_from: str, day_to: str, arraysize: int = 1000,
+               shard: str = DEFAULT_SHARD) -> Iterator[sqlite3.Row]:
+    """
+    Построчно отдать план за диапазон дней (для экспорта). Работает на своём
+    соединении только для чтения, в потоке вызывающего, — длинная выгрузка
+    не занимает поток хранилища; WAL не мешает параллельным записям.
+    Архивные дни подмешиваются слиянием двух упорядоченных курсоров.
+    """
+    path = shard_path(shard)
+    if not os.path.exists(path):
+        return   # объект только что заведён — плана ещё нет
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    n = 0
+    try:
+        cursors = [_iter_chunks(conn.execute(SQL_RANGE_ROWS, (day_from, day_to)), arraysize)]
+        if os.path.exists(archive_path(path)):
+            conn.execute("ATTACH DATABASE ? AS archive", (f"file:{archive_path(path)}?mode=ro",))
+            cursors.insert(0, _iter_chunks(
+                conn.execute(SQL_ARCHIVE_RANGE_ROWS, (day_from, day_to)), arraysize))
+        rows = cursors[0] if len(cursors) == 1 else \
+            heapq.merge(*cursors, key=lambda r: (r["day"], r["room_no"]))
+        for row in rows:
+            n += 1
+            yield row
+    finally:
+        metrics.inc("storage_rows_read_total", n, fn="iter_range")
+        conn.close()
+
+
+def _iter_chunks(cur: sqlite3.Cursor, arraysize: int) -> Iterator[sqlite3.Row]:
+    while True:
+        chunk = cur.fetchmany(arraysize)
+        if not chunk:
+            return
+        yield from chunk
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """{шард: {"hits", "misses", "days"}} по открытым шардам."""
+    with _stores_lock:
+        stores = list(_stores.items())
+    return {shard: st.cache.stats() for shard, st in stores}
+
+
+def _read_stats(path: str, day: str) -> Tuple[int, int, int]:
+    if not os.path.exists(path):
+        return 0, 0, 0
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        total, done = conn.execute(SQL_GET_STATS, (day, day)).fetchone()
+    except sqlite3.OperationalError:
+        return 0, 0, 0   # файл шарда ещё без схемы
+    finally:
+        conn.close()
+    return total, done, total - done
+
+
+async def get_stats_all(day: str) -> List[Tuple[str, Tuple[int, int, int]]]:
+    """
+    Статистика дня по всем объектам: [(шард, (всего, готово, осталось))].
+    Шарды читаются параллельно на общем пуле своими соединениями только
+    для чтения — потоки шардов и их LRU это не трогает.
+    """
+    global _fanout
+    if _fanout is None:
+        _fanout = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+    loop = asyncio.get_running_loop()
+    names = shards()
+    with metrics.timed("storage_fanout"):
+        results = await asyncio.gather(*[
+            loop.run_in_executor(_fanout, _read_stats, shard_path(name), day) for name in names
+        ])
+    return list(zip(names, results))
@@ -0,0 +1,107 @@
+"""
+outbox.Outbox на FakeBot (bench/fakes.py), который бросает RetryAfter
+при превышении лимитов Telegram. Лимиты уменьшены в масштабе, чтобы
+тесты шли секунды, а не минуты.
+"""
+import asyncio
+
+from telegram.error import NetworkError, RetryAfter
+
+from bench.fakes import FakeBot
+from outbox import Outbox
+
+
+class FlakyBot(FakeBot):
+    """FakeBot, который на первых failures вызовах бросает error."""
+
+    def __init__(self, error, failures, **kwargs):
+        super().__init__(latency=0.001, **kwargs)
+        self.error = error
+        self.failures = failures
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            self.calls["send_message"] += 1
+            raise self.error
+        return await super().send_message(chat_id, text, **kwargs)
+
+
+async def _send_all(outbox, messages, timeout=10):
+    outbox.start()
+    for chat_id, text in messages:
+        outbox.send(chat_id, text)
+    drained = await outbox.drain(timeout)
+    await outbox.stop(drain=False)
+    return drained
+
+
+def test_no_flood_errors_under_fake_limits():
+    # 15 чатов при общем лимите 10/с — без очереди половина получила бы 429
+    bot = FakeBot(latency=0.001, global_rate=10, chat_interval=0.2)
+    outbox = Outbox(bot, global_rate=10, chat_rate=5)
+    messages = [(chat_id, f"отчёт {chat_id}") for chat_id in range(1, 16)]
+    assert asyncio.run(_send_all(outbox, messages))
+    assert bot.flood_errors == 0
+    assert outbox.sent == 15 and outbox.failed == 0
+    assert {chat_id: texts for chat_id, texts in bot.delivered.items()} == \
+        {chat_id: [text] for chat_id, text in messages}
+
+
+def test_pending_texts_for_one_chat_are_merged():
+    bot = FakeBot(latency=0.001)
+    outbox = Outbox(bot)
+
+    async def run():
+        # всё поставлено до старта — уходит одним сообщением, по порядку
+        for i in range(3):
+            outbox.send(42, f"строка {i}")
+        outbox.start()
+        assert await outbox.drain(5)
+        await outbox.stop(drain=False)
+
+    asyncio.run(run())
+    assert bot.delivered[42] == ["строка 0\n\nстрока 1\n\nстрока 2"]
+    assert outbox.merged == 2 and outbox.sent == 1
+
+
+def test_retry_after_requeues_and_delivers():
+    bot = FlakyBot(RetryAfter(1), failures=1)
+    outbox = Outbox(bot)
+    assert asyncio.run(_send_all(outbox, [(7, "отчёт")]))
+    assert bot.delivered[7] == ["отчёт"]
+    assert outbox.retried == 1 and outbox.sent == 1 and outbox.failed == 0
+    assert bot.calls["send_message"] == 2
+
+
+def test_gives_up_after_max_retries():
+    bot = FlakyBot(NetworkError("connection reset"), failures=100)
+    outbox = Outbox(bot, max_retries=2, backoff=0.01)
+    assert asyncio.run(_send_all(outbox, [(7, "отчёт")]))
+    assert bot.calls["send_message"] == 3   # первая попытка + 2 повтора
+    assert outbox.failed == 1 and outbox.sent == 0 and outbox.depth() == 0
+
+
+def test_endless_retry_after_also_gives_up():
+    bot = FlakyBot(RetryAfter(0), failures=100)
+    outbox = Outbox(bot, max_retries=3)
+    assert asyncio.run(_send_all(outbox, [(7, "отчёт")]))
+    assert bot.calls["send_message"] == 4
+    assert outbox.failed == 1 and outbox.depth() == 0
+
+
+def test_stop_does_not_hang_on_throttled_chat(capsys):
+    bot = FlakyBot(RetryAfter(30), failures=100)
+    outbox = Outbox(bot)
+
+    async def run():
+        outbox.start()
+        outbox.send(7, "отчёт")
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        await outbox.stop(drain=True, timeout=0.3)
+        return loop.time() - t0
+
+    assert asyncio.run(run()) < 2
+    assert outbox.depth() == 1
+    assert "1 unsent messages" in capsys.readouterr().out
@@ -0,0 +1,115 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Отложенная запись (write-behind) частых обновлений
+#
+# Изменения копятся в памяти и сливаются по ключу (id номера): из десяти
+# нажатий на одну карточку в БД уходит одно UPDATE. Фоновый поток сбрасывает
+# очередь одной транзакцией раз в interval секунд или как только набралось
+# max_ops операций. Пока изменения не записаны, их видно через overlay() —
+# чтение сразу после записи возвращает новое значение.
+# ───────────────────────────────────────────────────────────────────────────────
+Fields = Dict[str, Any]
+
+
+class WriteBehind:
+    def __init__(self, flush_fn: Callable[[Dict[Any, Fields]], None],
+                 interval: float = 0.005, max_ops: int = 256):
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self.max_ops = max_ops
+        self.flushes = 0
+        self.flushed_ops = 0
+        self._pending: Dict[Any, Fields] = {}
+        self._inflight: Dict[Any, Fields] = {}   # уже отданы в flush_fn, ещё не закоммичены
+        self._ops = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()      # сбросы строго по очереди
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def put(self, key, fields: Fields):
+        with self._cond:
+            self._pending.setdefault(key, {}).update(fields)
+            self._ops += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def overlay(self, key) -> Fields:
+        """Ещё не записанные в БД поля по ключу (пустой dict, если их нет)."""
+        with self._cond:
+            merged = dict(self._inflight.get(key, {}))
+            merged.update(self._pending.get(key, {}))
+            return merged
+
+    def snapshot(self) -> Dict[Any, Fields]:
+        """overlay() для всех ключей сразу: {ключ: ещё не записанные поля}."""
+        with self._cond:
+            merged = {key: dict(fields) for key, fields in self._inflight.items()}
+            for key, fields in self._pending.items():
+                merged.setdefault(key, {}).update(fields)
+            return merged
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._pending) + len(self._inflight)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._cond:
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, {}
+                ops, self._ops = self._ops, 0
+                self._inflight = batch
+            try:
+                self.flush_fn(batch)
+            except Exception:
+                # вернуть в очередь; более свежие значения из _pending важнее
+                with self._cond:
+                    for key, fields in batch.items():
+                        self._pending[key] = {**fields, **self._pending.get(key, {})}
+                    self._ops += ops
+                    self._inflight = {}
+                raise
+            with self._cond:
+                self._inflight = {}
+                self.flushes += 1
+                self.flushed_ops += ops
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # даём пачке набраться: до interval или до max_ops операций
+                deadline = time.monotonic() + self.interval
+                while self._ops < self.max_ops and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[write-behind] flush failed: {e}")
+                with self._cond:
+                    if self._stopping:
+                        return   # последнюю попытку сделает close()
+                    self._cond.wait(1.0)
+
+    def close(self):
+        """Дописать всё накопленное и остановить поток (вызывается при выходе)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()